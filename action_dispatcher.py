@@ -0,0 +1,172 @@
+# action_dispatcher.py - Queue robot actions so listening continues while deliveries run
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# Lower numbers run first
+PRIORITY_DELIVER = 1
+PRIORITY_ORGANIZE = 5
+
+# Words that ask for the tools to be tidied, alone or alongside a delivery
+ORGANIZE_WORDS = ['organize', 'organise', 'arrange', 'clean up', 'put in order']
+
+
+class Action:
+    def __init__(self, kind, target=None, priority=PRIORITY_DELIVER):
+        self.kind = kind
+        self.target = target
+        self.priority = priority
+        self.callbacks = []
+        self.status = "pending"
+        self.error = None
+
+    @property
+    def key(self):
+        return (self.kind, self.target)
+
+    def __repr__(self):
+        return f"Action({self.kind!r}, {self.target!r}, priority={self.priority})"
+
+
+def parse_actions(command, tool_classes):
+    """Turn an utterance into an ordered list of actions, e.g. 'the wrench and the screwdriver'"""
+    actions = []
+    found = []
+    for tool in tool_classes:
+        # Word boundaries so 'bolt' does not match inside another word; allow plurals, 'wrenches' too
+        for match in re.finditer(rf"\b{re.escape(tool)}(?:es|s)?\b", command):
+            found.append((match.start(), tool))
+
+    for position, tool in sorted(found):
+        if all(action.target != tool for action in actions):
+            actions.append(Action("deliver", tool, PRIORITY_DELIVER))
+
+    if any(word in command for word in ORGANIZE_WORDS):
+        actions.append(Action("organize", None, PRIORITY_ORGANIZE))
+    return actions
+
+
+class RobotExecutor:
+    """Interface for whatever actually moves the arm"""
+
+    def execute(self, action):
+        raise NotImplementedError
+
+
+class SimulatedArm(RobotExecutor):
+    """Executor that pretends to move, for testing without hardware"""
+
+    def __init__(self, delivery_seconds=2.0, organize_seconds=5.0):
+        self.delivery_seconds = delivery_seconds
+        self.organize_seconds = organize_seconds
+        self.history = []
+
+    def execute(self, action):
+        duration = self.delivery_seconds if action.kind == "deliver" else self.organize_seconds
+        print(f"🤖 [ACTION] {action.kind} {action.target or ''}".rstrip())
+        time.sleep(duration)
+        self.history.append(action.key)
+
+
+class ActionDispatcher:
+    def __init__(self, executor=None):
+        self.executor = executor or SimulatedArm()
+        self.queue = []
+        self.pending = {}  # key -> queued Action, used to coalesce repeats
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.current = None
+        self.running = True
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, action, callback=None):
+        """Queue an action; a repeat of one still waiting is merged into it"""
+        with self.condition:
+            existing = self.pending.get(action.key)
+            if existing:
+                if callback:
+                    existing.callbacks.append(callback)
+                if action.priority < existing.priority:
+                    # Re-push at the higher priority; the old entry is skipped when popped
+                    existing.priority = action.priority
+                    heapq.heappush(self.queue, (existing.priority, next(self.counter), existing))
+                return existing
+
+            if callback:
+                action.callbacks.append(callback)
+            self.pending[action.key] = action
+            heapq.heappush(self.queue, (action.priority, next(self.counter), action))
+            self.condition.notify()
+            return action
+
+    def submit_all(self, actions, callback=None):
+        """Queue several actions, keeping their spoken order within a priority"""
+        return [self.submit(action, callback) for action in actions]
+
+    def cancel_pending(self):
+        """Drop everything that has not started yet; their callbacks see the cancelled status"""
+        with self.condition:
+            cancelled = list(self.pending.values())
+            for action in cancelled:
+                action.status = "cancelled"
+            self.pending.clear()
+            self.queue.clear()
+            self.condition.notify_all()
+
+        # Outside the lock, so a callback may submit again
+        for action in cancelled:
+            self.notify(action)
+        return cancelled
+
+    def notify(self, action):
+        """Run an action's completion callbacks; one failing does not stop the others"""
+        for callback in action.callbacks:
+            try:
+                callback(action)
+            except Exception as e:
+                print(f"⚠️  Action callback failed: {e}")
+
+    def wait_idle(self, timeout=None):
+        """Block until the queue is empty and nothing is running"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and self.current is None, timeout)
+
+    def run(self):
+        """Worker thread: execute actions one at a time in priority order"""
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                priority, _, action = heapq.heappop(self.queue)
+
+                # Skip entries left behind by coalescing or cancellation
+                if self.pending.get(action.key) is not action or priority != action.priority:
+                    continue
+                del self.pending[action.key]
+                self.current = action
+                action.status = "running"
+
+            try:
+                self.executor.execute(action)
+                action.status = "done"
+            except Exception as e:
+                action.status = "failed"
+                action.error = e
+                print(f"⚠️  Action {action} failed: {e}")
+
+            self.notify(action)
+
+            with self.condition:
+                self.current = None
+                self.condition.notify_all()
+
+    def stop(self):
+        """Stop the worker after the current action"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
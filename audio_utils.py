@@ -0,0 +1,172 @@
+# audio_utils.py - Shared vectorized helpers for speech detection on int16 audio
+import numpy as np
+
+
+def frame_rms(audio, frame_length):
+    """RMS energy of consecutive non-overlapping frames (trailing partial frame dropped)"""
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def peak_level(chunk):
+    """Absolute peak of an int16 chunk, without temporary arrays (drives the level meters)"""
+    return max(int(chunk.max()), -int(chunk.min())) if len(chunk) else 0
+
+
+def zero_crossing_rate(audio, frame_length):
+    """Fraction of sign changes in consecutive non-overlapping frames"""
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    signs = np.signbit(frames)
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1).astype(np.float32) / (frame_length - 1)
+
+
+def speech_bounds(audio, rate, frame_ms=10, high_factor=8.0, low_factor=3.0, floor=100.0,
+                  zcr_threshold=0.25, zcr_extend_ms=250):
+    """Endpoints of the speech in a clip from short-time energy and zero-crossing rate
+
+    Returns (start, end) sample indices, or None if nothing rises above the noise.
+    Strong-energy frames anchor the speech; the bounds then widen over weaker
+    energy, then over high-ZCR frames (fricatives like the s in "stop").
+    """
+    frame_length = int(rate * frame_ms / 1000)
+    energy = frame_rms(audio, frame_length)
+    if len(energy) == 0:
+        return None
+    zcr = zero_crossing_rate(audio, frame_length)
+
+    # Quietest frames approximate the noise floor of this clip
+    noise = max(float(np.percentile(energy, 10)), 1.0)
+    high = max(noise * high_factor, floor * 3)
+    low = max(noise * low_factor, floor)
+
+    strong = np.nonzero(energy > high)[0]
+    if len(strong) == 0:
+        return None
+    first, last = strong[0], strong[-1]
+
+    # Widen while the energy stays above the low threshold
+    weak = energy <= low
+    before = np.nonzero(weak[:first])[0]
+    first = before[-1] + 1 if len(before) else 0
+    after = np.nonzero(weak[last + 1:])[0]
+    last = last + after[0] if len(after) else len(energy) - 1
+
+    # Then over unvoiced frames: quiet but with many zero crossings
+    reach = zcr_extend_ms // frame_ms
+    unvoiced = (zcr > zcr_threshold) & (energy > noise * 1.5)
+    lead = unvoiced[max(0, first - reach):first][::-1]
+    first -= int(np.argmin(lead)) if len(lead) and not lead.all() else len(lead)
+    tail = unvoiced[last + 1:last + 1 + reach]
+    last += int(np.argmin(tail)) if len(tail) and not tail.all() else len(tail)
+
+    return first * frame_length, min((last + 1) * frame_length, len(audio))
+
+
+def noise_threshold(noise_profile, factor=3.0, floor=300.0):
+    """Speech energy threshold derived from a captured noise profile"""
+    if noise_profile is None or len(noise_profile) == 0:
+        return floor
+    noise = np.asarray(noise_profile, dtype=np.float32)
+    return max(float(np.sqrt(np.mean(noise * noise))) * factor, floor)
+
+
+class UtteranceSegmenter:
+    """Split a continuous int16 stream into utterances using energy-based VAD"""
+
+    def __init__(self, rate, threshold, frame_ms=20, min_speech_ms=200,
+                 min_silence_ms=500, pad_ms=150, max_utterance_s=10):
+        self.frame_length = int(rate * frame_ms / 1000)
+        self.threshold = threshold
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.pad_frames = pad_ms // frame_ms
+        self.max_frames = int(max_utterance_s * 1000 / frame_ms)
+        self.reset()
+
+    def reset(self):
+        """Drop any partially collected utterance"""
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.frames = []          # frames of the current candidate utterance
+        self.voiced = []          # voiced flag per collected frame
+        self.silence_run = 0
+        self.in_speech = False
+
+    def feed(self, chunk):
+        """Add int16 samples; returns a list of completed, trimmed utterances"""
+        audio = np.concatenate((self.pending, chunk)) if len(self.pending) else chunk
+        n_frames = len(audio) // self.frame_length
+        self.pending = audio[n_frames * self.frame_length:].copy()
+        if n_frames == 0:
+            return []
+
+        framed = audio[:n_frames * self.frame_length]
+        frames = framed.reshape(n_frames, self.frame_length)
+        voiced = frame_rms(framed, self.frame_length) > self.threshold
+
+        utterances = []
+        for frame, is_voiced in zip(frames, voiced):
+            self.frames.append(frame)
+            self.voiced.append(bool(is_voiced))
+
+            if not self.in_speech:
+                # Keep only enough leading silence for the padding
+                if is_voiced:
+                    self.in_speech = True
+                    self.silence_run = 0
+                elif len(self.frames) > self.pad_frames:
+                    del self.frames[0], self.voiced[0]
+                continue
+
+            self.silence_run = 0 if is_voiced else self.silence_run + 1
+            if self.silence_run >= self.min_silence_frames or len(self.frames) >= self.max_frames:
+                utterance = self._finish()
+                if utterance is not None:
+                    utterances.append(utterance)
+
+        return utterances
+
+    def flush(self):
+        """Return the utterance in progress at the end of the stream, if any"""
+        return self._finish() if self.in_speech else None
+
+    def _finish(self):
+        """Close the current utterance, trimming trailing silence down to the padding"""
+        keep = len(self.frames) - max(0, self.silence_run - self.pad_frames)
+        frames = self.frames[:keep]
+        speech_frames = sum(self.voiced[:keep])
+
+        self.frames = []
+        self.voiced = []
+        self.silence_run = 0
+        self.in_speech = False
+
+        # Clicks and bumps are shorter than any command
+        if speech_frames < self.min_speech_frames:
+            return None
+        return np.concatenate(frames)
+
+
+def captured_phrase(speech, rate=16000, lead_s=0.5, tail_s=0.8, noise_rms=40, seed=0):
+    """Speech as recognizer.listen() returns it: pre-roll before, the pause threshold after"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, noise_rms, int(rate * (lead_s + tail_s)) + len(speech))
+    start = int(rate * lead_s)
+    noise[start:start + len(speech)] += speech
+    return np.clip(noise, -32768, 32767).astype(np.int16)
+
+
+def synthetic_speech(rate=16000, seconds=1.2, seed=0):
+    """Voiced syllables with pitch movement, standing in for a spoken command"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 1.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) ** 0.5
+    return (3000 * voiced * syllables + rng.normal(0, 200, len(t)) * syllables).astype(np.float32)
@@ -0,0 +1,124 @@
+# batch_transcriber.py - Check that every dataset clip actually says its folder's phrase
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+import wave
+
+from spoken_phrases import spoken_phrase
+
+# Loaded once per worker process by load_model, then reused for every clip it transcribes
+MODEL = None
+
+
+def normalize(text):
+    """Lowercase words without punctuation, for comparing transcripts"""
+    return re.sub(r"[^a-z0-9' ]", " ", text.lower()).split()
+
+
+def word_error_rate(expected, actual):
+    """Word-level edit distance divided by the expected length"""
+    ref, hyp = normalize(expected), normalize(actual)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def load_model(model_path):
+    """Pool initializer: each worker loads the model once, whatever the start method"""
+    global MODEL
+    from vosk import Model
+
+    MODEL = Model(model_path)
+
+
+def transcribe(path):
+    """Worker: run the shared model over one clip"""
+    from vosk import KaldiRecognizer
+
+    with wave.open(path, 'rb') as wf:
+        recognizer = KaldiRecognizer(MODEL, wf.getframerate())
+        while True:
+            data = wf.readframes(4000)
+            if not data:
+                break
+            recognizer.AcceptWaveform(data)
+    return path, json.loads(recognizer.FinalResult()).get('text', '')
+
+
+def find_clips(data_dir):
+    """All (path, expected phrase) pairs under voice_dataset/<category>/<phrase>/"""
+    clips = []
+    for root, dirs, files in os.walk(data_dir):
+        for name in sorted(files):
+            if name.endswith('.wav'):
+                clips.append((os.path.join(root, name), spoken_phrase(os.path.basename(root))))
+    return clips
+
+
+def verify_dataset(data_dir="voice_dataset", model_path="vosk-model-small-en-us-0.15",
+                   workers=None, report_path="transcription_report.csv"):
+    """Transcribe the dataset on a worker pool and report label mismatches"""
+    clips = find_clips(data_dir)
+    if not clips:
+        print(f"❌ No clips found in {data_dir}")
+        return []
+    expected = dict(clips)
+    workers = workers or os.cpu_count()
+
+    # spawn works on every platform; fork is unavailable on Windows and unsafe with threads
+    context = mp.get_context("spawn")
+
+    start = time.time()
+    with context.Pool(workers, initializer=load_model, initargs=(model_path,)) as pool:
+        transcripts = pool.map(transcribe, [path for path, _ in clips], chunksize=8)
+    elapsed = time.time() - start
+
+    rows = []
+    for path, text in transcripts:
+        rows.append({
+            "file": path,
+            "expected": expected[path],
+            "transcript": text,
+            "wer": word_error_rate(expected[path], text),
+        })
+
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["file", "expected", "transcript", "wer"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    mismatches = sorted((row for row in rows if row["wer"] > 0), key=lambda row: -row["wer"])
+    mean_wer = sum(row["wer"] for row in rows) / len(rows)
+
+    print("\n=== LABEL VERIFICATION REPORT ===")
+    for row in mismatches[:20]:
+        print(f"   ⚠️  {row['file']}: expected '{row['expected']}', heard '{row['transcript']}' "
+              f"(WER {row['wer']:.2f})")
+    if len(mismatches) > 20:
+        print(f"   ... and {len(mismatches) - 20} more in {report_path}")
+
+    print(f"\n📊 {len(mismatches)}/{len(rows)} clips differ from their label, mean WER {mean_wer:.3f}")
+    print(f"⏱️  {len(rows) / elapsed:.1f} clips/s on {workers} workers "
+          f"({len(rows) / elapsed / workers:.2f} clips/s per core)")
+    print(f"💾 Per-file report: {report_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe voice_dataset and flag mislabelled clips")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--model", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", default="transcription_report.csv")
+    args = parser.parse_args()
+
+    verify_dataset(args.data_dir, args.model, args.workers, args.report)
@@ -0,0 +1,304 @@
+# beamformer.py - Combine a multi-mic array into one enhanced channel (GCC-PHAT + delay-and-sum)
+import argparse
+import time
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+RATE = 16000
+FRAME = 512          # STFT frame; hann at 50% overlap sums to one, so plain overlap-add reconstructs
+MAX_CHANNELS = 8
+
+
+def input_channels(audio, device_index=None, max_channels=MAX_CHANNELS):
+    """Number of channels to open on an input device (1 when it is a plain mono mic)"""
+    try:
+        if device_index is None:
+            info = audio.get_default_input_device_info()
+        else:
+            info = audio.get_device_info_by_index(device_index)
+    except (IOError, OSError):
+        return 1
+    return max(1, min(int(info.get('maxInputChannels', 1)), max_channels))
+
+
+class Beamformer:
+    """Streaming delay-and-sum beamformer steered by smoothed GCC-PHAT delay estimates"""
+
+    def __init__(self, channels, rate=RATE, frame=FRAME, max_delay_ms=1.0, smoothing=0.9,
+                 energy_threshold=300, upsample=4, budget=0.5, patience=3):
+        self.channels = channels
+        self.rate = rate
+        self.frame = frame
+        self.hop = frame // 2
+        self.smoothing = smoothing
+        self.energy_threshold = energy_threshold
+        self.upsample = upsample
+        self.max_lag = max(1, int(round(max_delay_ms * rate / 1000 * upsample)))
+        self.budget = budget
+        self.patience = patience
+
+        self.window = np.hanning(frame + 1)[:-1].astype(np.float32)  # periodic hann
+        self.omega = (2 * np.pi * np.fft.rfftfreq(frame)).astype(np.float32)
+        self.reset()
+
+        # Degrade in steps when a chunk takes longer than its share of real time
+        self.tracking = True
+        self.passthrough = channels == 1
+        self.slow_chunks = 0
+        self.over_budget = 0
+        self.chunks = 0
+        self.cpu_seconds = 0.0
+
+    def reset(self):
+        """Forget the previous stream's audio and delay estimates; the talker may have moved since"""
+        self.cross = np.zeros((self.frame // 2 + 1, self.channels), dtype=np.complex64)
+        self.delays = np.zeros(self.channels, dtype=np.float32)  # samples each channel lags channel 0
+
+        # One hop of leading zeros gives a fixed latency of one hop
+        self.buffer = np.zeros((self.hop, self.channels), dtype=np.float32)
+        self.carry = np.zeros(self.hop, dtype=np.float32)
+        self.output = np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk):
+        """Interleaved int16 (n * channels) or an (n, channels) array in, mono int16 of n samples out"""
+        started = time.perf_counter()
+        samples = np.asarray(chunk).reshape(-1, self.channels)
+        n = len(samples)
+
+        if self.passthrough:
+            out = samples[:, 0].astype(np.int16)
+        else:
+            out = self._beamform(samples, n)
+
+        elapsed = time.perf_counter() - started
+        self.chunks += 1
+        self.cpu_seconds += elapsed
+        self._check_budget(elapsed, n)
+        return out
+
+    def _beamform(self, samples, n):
+        buffer = np.concatenate((self.buffer, samples.astype(np.float32)))
+        n_frames = (len(buffer) - self.hop) // self.hop
+        out = [self.output]
+        if n_frames > 0:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame, axis=0)[::self.hop][:n_frames]
+            # (frames, channels, frame) -> spectra (frames, bins, channels)
+            spectra = np.fft.rfft(frames * self.window, axis=2).transpose(0, 2, 1)
+            self.buffer = buffer[n_frames * self.hop:]
+
+            if self.tracking:
+                self._update_delays(frames, spectra)
+
+            # Advance every channel by its delay so they add coherently, then average
+            steering = np.exp(1j * np.outer(self.omega, self.delays)).astype(np.complex64)
+            combined = (spectra * steering).mean(axis=2)
+            y = np.fft.irfft(combined, self.frame, axis=1)
+
+            tails = np.concatenate((self.carry[None], y[:-1, self.hop:]))
+            out.append((y[:, :self.hop] + tails).reshape(-1))
+            self.carry = y[-1, self.hop:].copy()
+        else:
+            self.buffer = buffer
+        out = np.concatenate(out)
+
+        if len(out) < n:
+            # Chunk not a multiple of the hop: delay by the partial hop still buffered
+            out = np.concatenate((np.zeros(n - len(out), dtype=np.float32), out))
+        self.output = out[n:]
+        return np.clip(out[:n], -32768, 32767).astype(np.int16)
+
+    def _update_delays(self, frames, spectra):
+        """Fold voiced frames into the smoothed PHAT cross-spectra and re-estimate the delays"""
+        rms = np.sqrt(np.mean(frames[:, 0] ** 2, axis=1))
+        voiced = rms > self.energy_threshold
+        if not voiced.any():
+            return
+
+        cross = spectra[voiced] * np.conj(spectra[voiced, :, :1])
+        cross /= np.abs(cross) + 1e-9
+        # Sequential exponential smoothing over the voiced frames, in one step
+        k = len(cross)
+        weights = (1 - self.smoothing) * self.smoothing ** np.arange(k - 1, -1, -1)
+        self.cross = self.smoothing ** k * self.cross + np.tensordot(weights, cross, axes=1)
+
+        # Upsampled cross-correlation for sub-sample lags, searched within the array's aperture
+        size = self.frame * self.upsample
+        correlation = np.fft.irfft(self.cross, size, axis=0)
+        lags = np.concatenate((correlation[:self.max_lag + 1], correlation[-self.max_lag:]))
+        best = np.argmax(lags, axis=0)
+        self.delays = np.where(best > self.max_lag, best - 2 * self.max_lag - 1, best).astype(np.float32) \
+            / self.upsample
+
+    def _check_budget(self, elapsed, n):
+        if elapsed <= self.budget * n / self.rate:
+            self.slow_chunks = 0
+            return
+        self.over_budget += 1
+        self.slow_chunks += 1
+        if self.slow_chunks < self.patience:
+            return
+
+        self.slow_chunks = 0
+        if self.tracking:
+            self.tracking = False
+            print("⚠️  Beamformer over its CPU budget - freezing the delay estimates")
+        elif not self.passthrough:
+            self.passthrough = True
+            print("⚠️  Beamformer still over its CPU budget - using the first channel only")
+
+    def stats(self):
+        """Counters and the current steering delays in samples"""
+        return {
+            "chunks": self.chunks,
+            "cpu_per_chunk_ms": self.cpu_seconds / max(self.chunks, 1) * 1000,
+            "over_budget": self.over_budget,
+            "tracking": self.tracking,
+            "passthrough": self.passthrough,
+            "delays": self.delays.tolist(),
+        }
+
+
+class BeamformedStream:
+    """Stream wrapper: reads interleaved multi-channel audio, returns the beamformed mono bytes"""
+
+    def __init__(self, stream, beamformer):
+        self.stream = stream
+        self.beamformer = beamformer
+        # A new stream must not start with the tail of the last one's audio
+        beamformer.reset()
+        # So latency queries and sr.Microphone.MicrophoneStream users still find the PyAudio stream
+        self.pyaudio_stream = getattr(stream, 'pyaudio_stream', stream)
+
+    def read(self, frames, **kwargs):
+        data = self.stream.read(frames, **kwargs)
+        return self.beamformer.process(np.frombuffer(data, dtype=np.int16)).tobytes()
+
+    def get_read_available(self):
+        return self.stream.get_read_available()
+
+    def stop_stream(self):
+        return self.stream.stop_stream()
+
+    def close(self):
+        return self.stream.close()
+
+
+class ArrayMicrophone(sr.Microphone):
+    """sr.Microphone that opens every channel of an array and hands out the beamformed one"""
+
+    def __init__(self, channels, device_index=None, sample_rate=RATE, chunk_size=1024, **beamformer_kwargs):
+        super().__init__(device_index=device_index, sample_rate=sample_rate, chunk_size=chunk_size)
+        self.channels = channels
+        self.beamformer = Beamformer(channels, sample_rate, **beamformer_kwargs)
+
+    def __enter__(self):
+        assert self.stream is None, "This audio source is already inside a context manager"
+        self.audio = self.pyaudio_module.PyAudio()
+        try:
+            self.stream = BeamformedStream(sr.Microphone.MicrophoneStream(
+                self.audio.open(
+                    input_device_index=self.device_index, channels=self.channels, format=self.format,
+                    rate=self.SAMPLE_RATE, frames_per_buffer=self.CHUNK, input=True,
+                )
+            ), self.beamformer)
+        except Exception:
+            self.audio.terminate()
+        return self
+
+
+def read_wav(path):
+    """Read a 16-bit WAV as (int16 samples of shape (n, channels), rate)"""
+    with wave.open(path, 'rb') as wf:
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        return audio.reshape(-1, wf.getnchannels()), wf.getframerate()
+
+
+def write_wav(path, audio, rate=RATE):
+    """Write int16 audio of shape (n,) or (n, channels)"""
+    audio = np.asarray(audio, dtype=np.int16)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1 if audio.ndim == 1 else audio.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(memoryview(np.ascontiguousarray(audio)))
+
+
+def make_array_recording(source, channels=4, spacing=0.05, angle_deg=40.0, noise_rms=800.0,
+                         rate=RATE, seed=0):
+    """Simulate a linear array hearing `source` from an angle, with independent noise per mic"""
+    rng = np.random.default_rng(seed)
+    source = np.asarray(source, dtype=np.float32)
+    # Far-field plane wave: each mic further along the array hears it later
+    delays = np.arange(channels) * spacing * np.sin(np.radians(angle_deg)) / 343.0 * rate
+    spectrum = np.fft.rfft(source, 2 * len(source))
+    omega = 2 * np.pi * np.fft.rfftfreq(2 * len(source))
+    mics = np.stack([np.fft.irfft(spectrum * np.exp(-1j * omega * d))[:len(source)] for d in delays], axis=1)
+    noisy = mics + rng.normal(0, noise_rms, mics.shape)
+    return np.clip(noisy, -32768, 32767).astype(np.int16), mics[:, 0], delays
+
+
+def snr_db(output, clean):
+    """SNR of `output` against the clean signal, after a least-squares gain match"""
+    output = output.astype(np.float64)
+    clean = clean.astype(np.float64)
+    gain = output @ clean / (clean @ clean)
+    noise = output - gain * clean
+    return 10 * np.log10((gain * gain * (clean @ clean)) / (noise @ noise))
+
+
+def evaluate(recording, clean=None, chunk=1024, rate=RATE):
+    """Run an (n, channels) recording through the beamformer chunk by chunk and report"""
+    beamformer = Beamformer(recording.shape[1], rate)
+    out = np.concatenate([beamformer.process(recording[i:i + chunk]) for i in range(0, len(recording), chunk)])
+    stats = beamformer.stats()
+
+    print("\n=== BEAMFORMER REPORT ===")
+    print(f"🎙️  {recording.shape[1]} channels, {len(recording) / rate:.1f}s")
+    print(f"📐 Estimated delays (samples vs channel 0): {np.round(stats['delays'], 2).tolist()}")
+    budget_ms = beamformer.budget * chunk / rate * 1000
+    print(f"⚙️  {stats['cpu_per_chunk_ms']:.2f} ms per {chunk}-frame chunk "
+          f"(budget {budget_ms:.0f} ms, {stats['over_budget']} chunks over)")
+    if clean is not None:
+        # Output lags the input by one hop
+        aligned = out[beamformer.hop:]
+        reference = clean[:len(aligned)]
+        before = snr_db(recording[:len(aligned), 0], reference)
+        after = snr_db(aligned, reference)
+        print(f"📈 SNR: channel 0 {before:.1f} dB -> beamformed {after:.1f} dB ({after - before:+.1f} dB)")
+        stats["snr_before"], stats["snr_after"] = before, after
+    return out, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delay-and-sum beamforming for multi-mic recordings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    make = sub.add_parser("make", help="build a synthetic array recording from a mono speech WAV")
+    make.add_argument("speech")
+    make.add_argument("out")
+    make.add_argument("--channels", type=int, default=4)
+    make.add_argument("--spacing", type=float, default=0.05, help="mic spacing in metres")
+    make.add_argument("--angle", type=float, default=40.0, help="source direction in degrees")
+    make.add_argument("--noise", type=float, default=800.0, help="per-mic noise RMS")
+
+    run = sub.add_parser("evaluate", help="beamform a multi-channel WAV")
+    run.add_argument("recording")
+    run.add_argument("--clean", help="mono WAV of the source as heard at channel 0, for SNR")
+    run.add_argument("--out", help="write the beamformed mono WAV here")
+    args = parser.parse_args()
+
+    if args.command == "make":
+        speech, rate = read_wav(args.speech)
+        recording, clean, delays = make_array_recording(speech[:, 0], args.channels, args.spacing,
+                                                        args.angle, args.noise, rate)
+        write_wav(args.out, recording, rate)
+        write_wav(args.out.replace('.wav', '_clean.wav'), np.clip(clean, -32768, 32767), rate)
+        print(f"💾 {args.out}: {args.channels} channels, true delays {np.round(delays, 2).tolist()} samples")
+    else:
+        recording, rate = read_wav(args.recording)
+        clean = read_wav(args.clean)[0][:, 0] if args.clean else None
+        out, stats = evaluate(recording, clean, rate=rate)
+        if args.out:
+            write_wav(args.out, out, rate)
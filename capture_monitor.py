@@ -0,0 +1,212 @@
+# capture_monitor.py - Overrun/underrun/gap accounting and adaptive chunk sizing for input streams
+import argparse
+import time
+
+import numpy as np
+
+RATE = 16000
+CHUNK_SIZES = [256, 512, 1024, 2048, 4096]
+PA_INPUT_OVERFLOWED = -9981  # PortAudio error code raised by PyAudio on input overflow
+
+
+class CaptureMonitor:
+    """Wraps a blocking PyAudio input stream and keeps drop statistics
+
+    `buffer_frames` is the host buffer size when it is known; a buffer found full
+    before a read has overrun. Without it, lost frames still show up as gaps.
+    """
+
+    def __init__(self, stream, rate=RATE, gap_tolerance=0.05, buffer_frames=None):
+        self.stream = stream
+        self.rate = rate
+        self.gap_tolerance = gap_tolerance
+        self.buffer_frames = buffer_frames
+        self.reset()
+
+    def reset(self):
+        """Clear all counters"""
+        self.chunks = 0
+        self.frames = 0
+        self.overflows = 0
+        self.underflows = 0
+        self.gaps = 0
+        self.gap_seconds = 0.0
+        self.start_time = None
+        self.resync_frames = 0
+
+    def read(self, frames):
+        """Read frames once, counting an overflow instead of raising or silently ignoring it"""
+        # PyAudio throws away the chunk it raises an overflow for, so never ask it to raise
+        overflowed = self.buffer_frames is not None and self.stream.get_read_available() >= self.buffer_frames
+        data = self.stream.read(frames, exception_on_overflow=False)
+
+        # Frames still waiting in the host buffer are newer than the ones just read
+        backlog = self.stream.get_read_available()
+        self.record(frames, time.monotonic() - backlog / self.rate, status_overflow=overflowed)
+        return data
+
+    def record(self, frames, timestamp, status_overflow=False, status_underflow=False):
+        """Account for one chunk whose last sample was captured at `timestamp`
+
+        Also usable from PortAudio callbacks, passing the ADC time and status flags.
+        """
+        self.chunks += 1
+        self.overflows += bool(status_overflow)
+        self.underflows += bool(status_underflow)
+
+        if self.start_time is None:
+            # First chunk: its last sample arrived now
+            self.start_time = timestamp - frames / self.rate
+            self.resync_frames = 0
+        self.frames += frames
+        self.resync_frames += frames
+
+        # Audio delivered should keep pace with the clock; a shortfall means frames were lost
+        expected = self.start_time + self.resync_frames / self.rate
+        lag = timestamp - expected
+        if lag > self.gap_tolerance:
+            self.gaps += 1
+            self.gap_seconds += lag
+            self.start_time = timestamp - self.resync_frames / self.rate
+
+    def metrics(self):
+        """Current counters as a dict"""
+        elapsed = self.frames / self.rate
+        return {
+            "chunks": self.chunks,
+            "seconds": elapsed,
+            "overflows": self.overflows,
+            "underflows": self.underflows,
+            "gaps": self.gaps,
+            "gap_seconds": self.gap_seconds,
+            "drop_rate": self.gap_seconds / (elapsed + self.gap_seconds) if elapsed else 0.0,
+        }
+
+
+class AdaptiveChunkSizer:
+    """Pick the smallest read size that stays overflow-free under the current load"""
+
+    def __init__(self, sizes=CHUNK_SIZES, start=1024, probe_after=10.0, rate=RATE):
+        self.sizes = list(sizes)
+        self.index = self.sizes.index(start) if start in self.sizes else len(self.sizes) // 2
+        self.probe_after = probe_after
+        self.rate = rate
+        self.clean_seconds = 0.0
+        self.last_drops = 0
+        self.failed = {}  # size index -> clean seconds needed before trying it again
+
+    @property
+    def chunk(self):
+        return self.sizes[self.index]
+
+    def update(self, monitor):
+        """Call after each read; returns the chunk size to use for the next read"""
+        metrics = monitor.metrics()
+        drops = metrics["overflows"] + metrics["gaps"]
+
+        if drops > self.last_drops:
+            self.last_drops = drops
+            self.clean_seconds = 0.0
+            if self.index < len(self.sizes) - 1:
+                # Back off, and wait longer before retrying the size that failed
+                self.failed[self.index] = self.failed.get(self.index, self.probe_after) * 2
+                self.index += 1
+            return self.chunk
+
+        self.clean_seconds += self.chunk / self.rate
+        if self.index > 0 and self.clean_seconds >= self.failed.get(self.index - 1, self.probe_after):
+            self.index -= 1
+            self.clean_seconds = 0.0
+        return self.chunk
+
+
+class SimulatedInputStream:
+    """Real-time input stream with a bounded host buffer, for benchmarking without a microphone"""
+
+    def __init__(self, rate=RATE, host_buffer=2048):
+        self.rate = rate
+        self.host_buffer = host_buffer
+        self.start = time.monotonic()
+        self.consumed = 0
+
+    def read(self, frames, exception_on_overflow=True):
+        produced = int((time.monotonic() - self.start) * self.rate)
+        if produced - self.consumed > self.host_buffer:
+            # Frames beyond the host buffer were overwritten before we read them
+            self.consumed = produced - self.host_buffer
+            if exception_on_overflow:
+                raise OSError(PA_INPUT_OVERFLOWED, "Input overflowed")
+
+        ready_at = self.start + (self.consumed + frames) / self.rate
+        delay = ready_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.consumed += frames
+        return np.zeros(frames, dtype=np.int16).tobytes()
+
+    def get_read_available(self):
+        produced = int((time.monotonic() - self.start) * self.rate)
+        return max(0, min(produced - self.consumed, self.host_buffer))
+
+
+def benchmark(seconds=5.0, load_ms_per_read=8.0, jitter_ms=20.0, open_stream=None, seed=0):
+    """Sweep chunk sizes under a simulated processing load; report latency against drop rate"""
+    rng = np.random.default_rng(seed)
+    results = []
+
+    print("\n=== CHUNK SIZE SWEEP ===")
+    print(f"Load: {load_ms_per_read:.0f} ms per read + occasional {jitter_ms:.0f} ms stalls")
+    print(f"{'chunk':>6} {'chunk ms':>9} {'latency ms':>11} {'drop rate':>10} {'overflows':>10} {'gaps':>5}")
+
+    for chunk in CHUNK_SIZES:
+        # Like PortAudio, the host buffer holds a couple of periods of the opened chunk size
+        if open_stream:
+            monitor = CaptureMonitor(open_stream(chunk))
+        else:
+            monitor = CaptureMonitor(SimulatedInputStream(host_buffer=2 * chunk), buffer_frames=2 * chunk)
+        latencies = []
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            monitor.read(chunk)
+            arrived = time.monotonic()
+
+            # Stand-in for DSP/recognition work plus GIL stalls from other threads
+            busy = load_ms_per_read + (jitter_ms if rng.random() < 0.1 else 0.0)
+            time.sleep(busy / 1000)
+
+            # End-to-end: oldest sample in the chunk waited a full chunk, then processing
+            latencies.append(chunk / RATE + (time.monotonic() - arrived))
+
+        metrics = monitor.metrics()
+        latency_ms = np.mean(latencies) * 1000
+        results.append((chunk, latency_ms, metrics))
+        print(f"{chunk:>6} {chunk / RATE * 1000:>9.0f} {latency_ms:>11.1f} {metrics['drop_rate']:>10.3f} "
+              f"{metrics['overflows']:>10} {metrics['gaps']:>5}")
+
+    best = [r for r in results if r[2]["overflows"] == 0 and r[2]["gaps"] == 0]
+    if best:
+        print(f"\n✅ Smallest drop-free chunk: {best[0][0]} frames ({best[0][1]:.1f} ms end-to-end)")
+    else:
+        print("\n❌ Every chunk size dropped frames under this load")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep capture chunk sizes: latency vs drop rate")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per chunk size")
+    parser.add_argument("--load-ms", type=float, default=8.0, help="processing time per read")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="extra stall on 10%% of reads")
+    parser.add_argument("--mic", action="store_true", help="use the real microphone instead of a simulated one")
+    args = parser.parse_args()
+
+    open_stream = None
+    if args.mic:
+        import pyaudio
+        audio = pyaudio.PyAudio()
+
+        def mic_stream(chunk):
+            return audio.open(format=pyaudio.paInt16, channels=1, rate=RATE,
+                              input=True, frames_per_buffer=chunk)
+        open_stream = mic_stream
+
+    benchmark(args.seconds, args.load_ms, args.jitter_ms, open_stream)
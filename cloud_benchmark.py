@@ -0,0 +1,209 @@
+# cloud_benchmark.py - Cloud recognition latency and upload size against a local mock speech endpoint
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_utils import captured_phrase, synthetic_speech
+from cloud_recognizer import CloudRecognizer
+
+
+class MockSpeechServer(ThreadingHTTPServer):
+    """Local stand-in for the speech endpoint with injected handshake, uplink and processing delays"""
+    daemon_threads = True
+
+    def __init__(self, transcript="give me the hammer", latency=0.3, connect_latency=0.15,
+                 uplink_kbps=None, slow_every=0, slow_latency=5.0, idle_timeout=None, status=200):
+        super().__init__(("127.0.0.1", 0), MockSpeechHandler)
+        self.transcript = transcript
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.uplink_kbps = uplink_kbps
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.idle_timeout = idle_timeout  # drop keep-alive connections idle this long, like real servers
+        self.status = status
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.bytes_received = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/speech-api/v2/recognize"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class MockSpeechHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        self.timeout = self.server.idle_timeout
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        # TCP and TLS handshake cost, paid once per connection
+        time.sleep(self.server.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def throttle(self, size):
+        if self.server.uplink_kbps:
+            time.sleep(size * 8 / (self.server.uplink_kbps * 1000))
+
+    def read_body(self):
+        received = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                self.rfile.read(size + 2)  # data and its CRLF
+                if size == 0:
+                    return received
+                received += size
+                self.throttle(size)
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            data = self.rfile.read(min(4096, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            received += len(data)
+            self.throttle(len(data))
+        return received
+
+    def do_POST(self):
+        received = self.read_body()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_received += received
+            number = self.server.requests
+        slow = self.server.slow_every and number % self.server.slow_every == 0
+        time.sleep(self.server.slow_latency if slow else self.server.latency)
+
+        lines = ['{"result":[]}']
+        if received:
+            lines.append(json.dumps({"result": [{"alternative": [
+                {"transcript": self.server.transcript, "confidence": 0.92}], "final": True}], "result_index": 0}))
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            self.send_response(self.server.status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client gave up on this request
+
+
+def evaluate(phrases, latency=0.3, connect_latency=0.15, uplink_kbps=256, budget=2.0, rate=16000, chunk=1024):
+    """Compare recognize_google with the pooled, trimmed and streamed client against a mock endpoint"""
+    results = {}
+
+    def report(name, server, latencies, client=None):
+        latencies = np.array(latencies) * 1000
+        uploaded = server.bytes_received / max(server.requests, 1) / 1024
+        print(f"{name:<24} median {np.median(latencies):5.0f} ms   p95 {np.percentile(latencies, 95):5.0f} ms   "
+              f"{uploaded:6.1f} KB/request   {server.connections} connections")
+        results[name] = {"median_ms": float(np.median(latencies)), "p95_ms": float(np.percentile(latencies, 95)),
+                         "kb_per_request": uploaded, "connections": server.connections}
+
+    print(f"\n=== CLOUD RECOGNITION REPORT ({len(phrases)} phrases, {latency * 1000:.0f} ms server, "
+          f"{connect_latency * 1000:.0f} ms handshake, {uplink_kbps or 'unlimited'} kbps uplink) ===")
+    print("Latency is measured from the end of capture to the transcript")
+
+    # Before: recognize_google, whole phrase, new connection, no deadline
+    server = MockSpeechServer(latency=latency, connect_latency=connect_latency, uplink_kbps=uplink_kbps)
+    recognizer = sr.Recognizer()
+    latencies = []
+    for phrase in phrases:
+        audio = sr.AudioData(phrase.tobytes(), rate, 2)
+        started = time.perf_counter()
+        recognizer.recognize_google(audio, show_all=True, endpoint=server.url)
+        latencies.append(time.perf_counter() - started)
+    report("recognize_google", server, latencies)
+    server.stop()
+
+    # Trimmed whole phrase over the pool
+    server = MockSpeechServer(latency=latency, connect_latency=connect_latency, uplink_kbps=uplink_kbps)
+    client = CloudRecognizer(server.url, budget=budget * 4)
+    latencies = []
+    for phrase in phrases:
+        audio = sr.AudioData(phrase.tobytes(), rate, 2)
+        started = time.perf_counter()
+        client.recognize(audio)
+        latencies.append(time.perf_counter() - started)
+    report("trimmed + pooled", server, latencies)
+    client.close()
+    server.stop()
+
+    # Streamed while speaking, fed in real time
+    server = MockSpeechServer(latency=latency, connect_latency=connect_latency, uplink_kbps=uplink_kbps)
+    client = CloudRecognizer(server.url, budget=budget * 4)
+    latencies = []
+    for phrase in phrases:
+        upload = client.open_stream(rate)
+        for i in range(0, len(phrase), chunk):
+            upload.feed(phrase[i:i + chunk].tobytes())
+            time.sleep(chunk / rate)
+        started = time.perf_counter()
+        upload.finish()
+        latencies.append(time.perf_counter() - started)
+    report("streamed + pooled", server, latencies)
+    client.close()
+    server.stop()
+
+    # Budget: every third reply stalls; the local backend answers instead of the user waiting
+    from racing_recognizer import RacingRecognizer, cloud_backend
+
+    def local(audio):
+        time.sleep(0.2)
+        return "give me the hammer", 0.6
+    local.name = "local"
+
+    server = MockSpeechServer(latency=latency, connect_latency=connect_latency, uplink_kbps=uplink_kbps,
+                              slow_every=3, slow_latency=budget * 5)
+    client = CloudRecognizer(server.url, budget=budget)
+    racer = RacingRecognizer([cloud_backend(client), local], deadline=budget * 4)
+    latencies, answered_by = [], []
+    for phrase in phrases:
+        audio = sr.AudioData(phrase.tobytes(), rate, 2)
+        started = time.perf_counter()
+        text, confidence, backend = racer.recognize(audio)
+        latencies.append(time.perf_counter() - started)
+        answered_by.append(backend)
+    report(f"{budget:.1f}s budget, 1/3 stall", server, latencies)
+    print(f"   {answered_by.count('local')} answered by the local fallback, "
+          f"{client.stats['timeouts']} cloud requests cut off at the budget")
+    results["fallbacks"] = answered_by.count("local")
+    racer.close()
+    client.close()
+    server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cloud recognition latency and upload size against a mock endpoint")
+    parser.add_argument("clips", nargs="*", help="16 kHz speech WAVs (default: synthetic phrases)")
+    parser.add_argument("--count", type=int, default=9, help="phrases to send per mode")
+    parser.add_argument("--latency", type=float, default=0.3, help="server processing time in seconds")
+    parser.add_argument("--connect-latency", type=float, default=0.15, help="handshake time per new connection")
+    parser.add_argument("--uplink-kbps", type=float, default=256, help="upload bandwidth, 0 for unlimited")
+    parser.add_argument("--budget", type=float, default=2.0, help="per-request budget for the fallback run")
+    args = parser.parse_args()
+
+    if args.clips:
+        from sample_trimmer import read_clip
+        speech = [read_clip(path)[0].astype(np.float32) for path in args.clips]
+    else:
+        speech = [synthetic_speech(seed=i) for i in range(args.count)]
+    phrases = [captured_phrase(speech[i % len(speech)], seed=i) for i in range(args.count)]
+    evaluate(phrases, args.latency, args.connect_latency, args.uplink_kbps or None, args.budget)
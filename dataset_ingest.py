@@ -0,0 +1,231 @@
+# dataset_ingest.py - Convert external recordings into the voice_dataset layout
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from math import gcd
+
+import numpy as np
+from scipy import signal
+
+from audio_utils import UtteranceSegmenter, noise_threshold
+from sample_trimmer import next_sample_number
+
+TARGET_RATE = 16000
+BLOCK_FRAMES = 65536  # frames read per block, keeps memory flat for multi-hour files
+
+
+class StreamingResampler:
+    """Block-wise polyphase resampler that matches a whole-file resample_poly"""
+
+    def __init__(self, rate_in, rate_out=TARGET_RATE):
+        divisor = gcd(rate_in, rate_out)
+        self.up = rate_out // divisor
+        self.down = rate_in // divisor
+
+        # Context on each side of a block must cover the filter half-length
+        # and stay a multiple of `down` so block outputs line up exactly
+        half_len = 10 * max(self.up, self.down) / self.up
+        self.context = self.down * int(np.ceil(half_len / self.down) + 1)
+
+        self.history = np.zeros(self.context, dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def _resample(self, data, n_input):
+        """Resample data with context on both sides, keeping output for the middle n_input samples"""
+        if self.up == self.down:
+            return data[self.context:self.context + n_input]
+        out = signal.resample_poly(data, self.up, self.down)
+        start = self.context * self.up // self.down
+        n_output = -(-n_input * self.up // self.down)  # ceil, as resample_poly does
+        return out[start:start + n_output]
+
+    def process(self, block):
+        """Feed mono float samples; returns whatever output is final so far"""
+        self.pending = np.concatenate((self.pending, block))
+        ready = (len(self.pending) - self.context) // self.down * self.down
+        if ready <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        data = np.concatenate((self.history, self.pending[:ready + self.context]))
+        out = self._resample(data, ready)
+        self.history = data[ready:ready + self.context]
+        self.pending = self.pending[ready:]
+        return out
+
+    def flush(self):
+        """Resample the tail of the stream"""
+        if len(self.pending) == 0:
+            return np.zeros(0, dtype=np.float32)
+        data = np.concatenate((self.history, self.pending, np.zeros(self.context, dtype=np.float32)))
+        out = self._resample(data, len(self.pending))
+        self.pending = np.zeros(0, dtype=np.float32)
+        return out
+
+
+def open_pcm_source(path):
+    """Return (rate, channels, block iterator) of interleaved int16 frames for any audio file"""
+    if path.lower().endswith('.wav'):
+        wf = wave.open(path, 'rb')
+        if wf.getsampwidth() == 2:
+            def blocks():
+                with wf:
+                    while True:
+                        data = wf.readframes(BLOCK_FRAMES)
+                        if not data:
+                            break
+                        yield np.frombuffer(data, dtype=np.int16)
+            return wf.getframerate(), wf.getnchannels(), blocks()
+        wf.close()
+
+    # MP3, FLAC and non-16-bit WAV are decoded by ffmpeg (via pydub) and piped in blocks
+    from pydub.utils import mediainfo, get_encoder_name
+    info = mediainfo(path)
+    rate = int(info['sample_rate'])
+    channels = int(info['channels'])
+
+    def blocks():
+        process = subprocess.Popen(
+            [get_encoder_name(), '-v', 'quiet', '-i', path, '-f', 's16le', '-acodec', 'pcm_s16le', '-'],
+            stdout=subprocess.PIPE
+        )
+        try:
+            block_bytes = BLOCK_FRAMES * channels * 2
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) // (channels * 2) * channels * 2
+                yield np.frombuffer(data[:usable], dtype=np.int16)
+        finally:
+            process.stdout.close()
+            process.wait()
+    return rate, channels, blocks()
+
+
+def to_int16(samples):
+    """Clip float samples back into int16 range"""
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+def ingest_file(path, out_dir, split=False):
+    """Convert one file to 16 kHz mono int16 clips in out_dir, in order; returns a report dict"""
+    rate, channels, blocks = open_pcm_source(path)
+    resampler = StreamingResampler(rate)
+    outputs = []
+    writer = None
+    segmenter = UtteranceSegmenter(TARGET_RATE, noise_threshold(None)) if split else None
+
+    def write_clip(samples):
+        filename = os.path.join(out_dir, f"{len(outputs) + 1:03d}.part")
+        with wave.open(filename, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(TARGET_RATE)
+            wf.writeframes(samples)
+        outputs.append(filename)
+
+    def emit(samples):
+        nonlocal writer
+        if len(samples) == 0:
+            return
+        audio = to_int16(samples)
+        if split:
+            for utterance in segmenter.feed(audio):
+                write_clip(utterance)
+        else:
+            if writer is None:
+                filename = os.path.join(out_dir, "001.part")
+                writer = wave.open(filename, 'wb')
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(TARGET_RATE)
+                outputs.append(filename)
+            writer.writeframes(audio)
+
+    input_frames = 0
+    for block in blocks:
+        # Downmix interleaved channels in one vectorized step
+        mono = block.reshape(-1, channels).astype(np.float32).mean(axis=1)
+        input_frames += len(mono)
+        emit(resampler.process(mono))
+    emit(resampler.flush())
+
+    if split:
+        tail = segmenter.flush()
+        if tail is not None:
+            write_clip(tail)
+    elif writer is not None:
+        writer.close()
+
+    return {
+        "source": path,
+        "rate": rate,
+        "channels": channels,
+        "seconds": input_frames / rate if rate else 0.0,
+        "outputs": outputs,
+    }
+
+
+def ingest(paths, category, phrase, data_dir="voice_dataset", split=False, workers=None):
+    """Convert many files in parallel into voice_dataset/<category>/<phrase>/<phrase>_NNN.wav"""
+    out_dir = os.path.join(data_dir, category, phrase)
+    os.makedirs(out_dir, exist_ok=True)
+    reports = []
+    start = time.time()
+
+    # Workers write into private staging folders; only this process hands out sample numbers,
+    # in input order, so parallel files never race for the same name
+    staging = tempfile.mkdtemp(prefix=".ingest-", dir=out_dir)
+    number = next_sample_number(out_dir)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for i, path in enumerate(paths):
+                file_dir = os.path.join(staging, str(i))
+                os.mkdir(file_dir)
+                futures.append((path, pool.submit(ingest_file, path, file_dir, split)))
+
+            for path, future in futures:
+                try:
+                    report = future.result()
+                except Exception as e:
+                    print(f"❌ {path}: {e}")
+                    continue
+                outputs = []
+                for staged in report["outputs"]:
+                    filename = os.path.join(out_dir, f"{phrase}_{number:03d}.wav")
+                    os.replace(staged, filename)
+                    outputs.append(filename)
+                    number += 1
+                report["outputs"] = outputs
+                reports.append(report)
+                print(f"✅ {path}: {report['rate']} Hz x{report['channels']}, "
+                      f"{report['seconds']:.1f}s -> {len(outputs)} file(s)")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    total_seconds = sum(r['seconds'] for r in reports)
+    total_outputs = sum(len(r['outputs']) for r in reports)
+    elapsed = time.time() - start
+    print("\n=== INGEST REPORT ===")
+    print(f"📁 {category}/{phrase}: {len(reports)}/{len(paths)} files converted, {total_outputs} clips written")
+    print(f"⏱️  {total_seconds:.1f}s of audio in {elapsed:.1f}s ({total_seconds / max(elapsed, 1e-6):.0f}x real time)")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest external audio into the voice dataset")
+    parser.add_argument("category", help="e.g. tool_delivery")
+    parser.add_argument("phrase", help="e.g. give_me_wrench")
+    parser.add_argument("files", nargs="+", help="WAV/MP3/FLAC files at any rate and channel count")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--split", action="store_true", help="split long recordings into utterances")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    ingest(args.files, args.category, args.phrase, args.data_dir, args.split, args.workers)
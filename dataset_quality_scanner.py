@@ -0,0 +1,213 @@
+# dataset_quality_scanner.py - Find bad takes in voice_dataset with batched spectral analysis
+import argparse
+import json
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import signal
+
+from sample_trimmer import load_manifest
+
+RATE = 16000
+FRAME = 512          # STFT window (32 ms)
+HOP = 256            # STFT hop (16 ms)
+SPEECH_BAND = (100, 4000)
+CLIP_LEVEL = 32767 * 0.99
+METRICS = ["snr_db", "clipping_ratio", "leading_silence", "trailing_silence", "speech_duration", "loudness_db"]
+
+
+def load_clip(path):
+    """Read a 16-bit mono WAV as int16"""
+    with wave.open(path, 'rb') as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def load_noise_power(data_dir):
+    """Mean speech-band power of the stored noise profile, or None if it was never saved"""
+    path = os.path.join(data_dir, "noise_profile.npy")
+    if not os.path.exists(path):
+        return None
+    noise = np.load(path).astype(np.float32)
+    power = band_power(noise[np.newaxis, :])
+    return float(power.mean()) if power.size else None
+
+
+def band_power(batch):
+    """Per-frame speech-band power for a (clips, samples) batch -> (clips, frames)"""
+    freqs, _, spec = signal.stft(batch, fs=RATE, nperseg=FRAME, noverlap=FRAME - HOP,
+                                 boundary=None, padded=False, axis=-1)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    magnitude = np.abs(spec[:, band, :])
+    return np.mean(magnitude * magnitude, axis=1)
+
+
+def analyze_batch(clips, noise_power=None, speech_margin_db=10.0):
+    """Compute quality metrics for a list of int16 clips using one stacked STFT
+
+    `noise_power` is the noise profile's band power at each clip's own scale
+    (one value or one per clip, NaN where unknown).
+    """
+    lengths = np.array([len(clip) for clip in clips])
+    batch = np.zeros((len(clips), max(lengths.max(), FRAME)), dtype=np.float32)
+    for row, clip in zip(batch, clips):
+        row[:len(clip)] = clip
+
+    power = band_power(batch)
+    n_frames = power.shape[1]
+    valid_frames = np.clip((lengths - FRAME) // HOP + 1, 1, n_frames)
+    valid = np.arange(n_frames)[np.newaxis, :] < valid_frames[:, np.newaxis]
+
+    # Noise floor from the quietest frames of each clip; zero padding is excluded
+    masked = np.where(valid, power, np.nan)
+    floor = np.nanpercentile(masked, 20, axis=1)
+    if noise_power is None:
+        noise_power = np.nan
+    noise_power = np.broadcast_to(np.asarray(noise_power, dtype=np.float64), floor.shape)
+    # A take with no pauses has no quiet frames; the noise profile is the floor then
+    floor = np.maximum(np.fmin(floor, noise_power), 1e-3)
+    voiced = valid & (power > floor[:, np.newaxis] * 10 ** (speech_margin_db / 10))
+
+    frame_seconds = HOP / RATE
+    any_voiced = voiced.any(axis=1)
+    first = np.where(any_voiced, voiced.argmax(axis=1), valid_frames)
+    last = np.where(any_voiced, n_frames - 1 - voiced[:, ::-1].argmax(axis=1), valid_frames)
+
+    speech_power = np.where(voiced, power, 0).sum(axis=1) / np.maximum(voiced.sum(axis=1), 1)
+    silence = valid & ~voiced
+    silence_power = np.where(silence, power, 0).sum(axis=1) / np.maximum(silence.sum(axis=1), 1)
+
+    # Clips with no pauses at all fall back to the stored noise profile, else their quietest frames
+    reference = np.where(silence.any(axis=1), silence_power, np.where(np.isnan(noise_power), floor, noise_power))
+    snr_db = 10 * np.log10(np.maximum(speech_power, 1e-3) / np.maximum(reference, 1e-3))
+
+    # Time-domain metrics, masked so padding does not count
+    sample_valid = np.arange(batch.shape[1])[np.newaxis, :] < lengths[:, np.newaxis]
+    clipped = (np.abs(batch) >= CLIP_LEVEL) & sample_valid
+    speech_samples = np.repeat(voiced, HOP, axis=1)[:, :batch.shape[1]]
+    if speech_samples.shape[1] < batch.shape[1]:
+        speech_samples = np.pad(speech_samples, ((0, 0), (0, batch.shape[1] - speech_samples.shape[1])))
+    speech_energy = np.where(speech_samples, batch * batch, 0).sum(axis=1)
+    speech_rms = np.sqrt(speech_energy / np.maximum(speech_samples.sum(axis=1), 1))
+
+    return {
+        "snr_db": np.where(any_voiced, snr_db, 0.0),
+        "clipping_ratio": clipped.sum(axis=1) / np.maximum(lengths, 1),
+        "leading_silence": first * frame_seconds,
+        "trailing_silence": np.maximum(valid_frames - 1 - last, 0) * frame_seconds,
+        "speech_duration": voiced.sum(axis=1) * frame_seconds,
+        "loudness_db": 20 * np.log10(np.maximum(speech_rms, 1.0) / 32768),
+    }
+
+
+def rank_outliers(files, metrics):
+    """Score each clip by robust z-score within its folder plus hard quality limits"""
+    scores = np.zeros(len(files))
+    reasons = [[] for _ in files]
+
+    for name in METRICS:
+        values = metrics[name]
+        median = np.median(values)
+        mad = np.median(np.abs(values - median)) * 1.4826
+        z = np.abs(values - median) / mad if mad > 0 else np.zeros_like(values)
+        scores += np.minimum(z, 10)
+        for i in np.nonzero(z > 3.5)[0]:
+            reasons[i].append(f"{name} unusual ({values[i]:.2f})")
+
+    # Absolute limits that make a take unusable regardless of its neighbours
+    limits = [
+        (metrics["snr_db"] < 10, 10, "low SNR / mostly noise"),
+        (metrics["clipping_ratio"] > 0.001, 10, "clipped"),
+        (metrics["speech_duration"] < 0.2, 10, "no speech found"),
+        ((metrics["leading_silence"] > 1.5) & (metrics["speech_duration"] >= 0.2), 5, "late start"),
+        ((metrics["trailing_silence"] < 0.05) & (metrics["speech_duration"] >= 0.2), 5, "cut off at the end"),
+    ]
+    for mask, penalty, reason in limits:
+        scores += np.where(mask, penalty, 0)
+        for i in np.nonzero(mask)[0]:
+            reasons[i].append(reason)
+
+    order = np.argsort(-scores)
+    return [
+        {"file": files[i], "score": float(scores[i]), "reasons": reasons[i],
+         **{name: float(metrics[name][i]) for name in METRICS}}
+        for i in order
+    ]
+
+
+def scan_folder(folder, noise_power=None, batch_size=64, gains=None):
+    """Analyze every WAV in one phrase folder; returns ranked clip reports
+
+    The stored noise profile is raw microphone input while saved clips were
+    normalized, so it is only used for clips whose gain (file name -> gain) is known.
+    """
+    files = sorted(f for f in os.listdir(folder) if f.endswith('.wav'))
+    if not files:
+        return []
+    gains = gains or {}
+    clip_noise = np.array([noise_power * gains[f] ** 2 if noise_power is not None and f in gains else np.nan
+                           for f in files])
+
+    # Batch clips of similar length together to keep padding small
+    clips = [load_clip(os.path.join(folder, f)) for f in files]
+    order = np.argsort([len(c) for c in clips])
+    metrics = {name: np.zeros(len(files)) for name in METRICS}
+    for start in range(0, len(order), batch_size):
+        index = order[start:start + batch_size]
+        results = analyze_batch([clips[i] for i in index], clip_noise[index])
+        for name in METRICS:
+            metrics[name][index] = results[name]
+
+    return rank_outliers([os.path.join(folder, f) for f in files], metrics)
+
+
+def scan_dataset(data_dir="voice_dataset", top=5, workers=None):
+    """Scan all phrase folders in parallel and print the worst takes in each"""
+    noise_power = load_noise_power(data_dir)
+    folders = [root for root, dirs, files in os.walk(data_dir) if any(f.endswith('.wav') for f in files)]
+
+    # Gains the collector recorded per take; ingested or older clips have none
+    gains = {folder: {} for folder in folders}
+    for key, row in load_manifest(data_dir).items():
+        folder = os.path.dirname(os.path.join(data_dir, key))
+        if row.get("gain") and folder in gains:
+            gains[folder][os.path.basename(key)] = float(row["gain"])
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = dict(zip(folders, pool.map(scan_folder, folders, [noise_power] * len(folders),
+                                             [64] * len(folders), [gains[f] for f in folders])))
+
+    print("\n=== DATASET QUALITY REPORT ===")
+    if noise_power is None:
+        print("⚠️  No stored noise profile - SNR uses each clip's own pauses only")
+    elif not any(gains.values()):
+        print("⚠️  No recorded gains - the noise profile cannot be scaled to the clips, so it is not used")
+
+    flagged = 0
+    for folder in sorted(results):
+        ranked = results[folder]
+        bad = [r for r in ranked if r["reasons"]]
+        flagged += len(bad)
+        print(f"\n📁 {os.path.relpath(folder, data_dir)}: {len(ranked)} clips, {len(bad)} flagged")
+        for report in bad[:top]:
+            print(f"   ⚠️  {os.path.basename(report['file'])} (score {report['score']:.1f}): "
+                  f"{', '.join(report['reasons'])}")
+
+    total = sum(len(r) for r in results.values())
+    print(f"\n📊 {flagged}/{total} clips flagged for review")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank outlier clips in each phrase folder")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--top", type=int, default=5, help="outliers to print per folder")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="also write the full ranked report to this file")
+    args = parser.parse_args()
+
+    results = scan_dataset(args.data_dir, args.top, args.workers)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,272 @@
+# dsp_benchmark.py - Time and peak memory of the per-sample DSP paths, tracked against a saved baseline
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from audio_utils import peak_level, synthetic_speech
+from sample_trimmer import read_clip, write_clip
+
+RATE = 16000
+CHUNK = 1024
+
+
+def synthetic_clip(seconds, seed=0, noise_rms=300):
+    """Shop-like recording: speech-like syllables over broadband noise"""
+    rng = np.random.default_rng(seed)
+    speech = synthetic_speech(RATE, seconds, seed)
+    return np.clip(speech + rng.normal(0, noise_rms, len(speech)), -32768, 32767).astype(np.int16)
+
+
+def real_clips(data_dir, limit=16):
+    """Up to `limit` recorded samples from the dataset, or [] when there is none"""
+    paths = []
+    for root, dirs, files in os.walk(data_dir):
+        paths += [os.path.join(root, f) for f in sorted(files) if f.endswith('.wav')]
+    return [read_clip(path)[0] for path in sorted(paths)[:limit]]
+
+
+def fit_length(clip, samples):
+    """Tile or cut a clip to an exact length so real and synthetic rows are comparable"""
+    return np.resize(clip, samples) if len(clip) else np.zeros(samples, dtype=np.int16)
+
+
+def collector():
+    """VoiceDataCollector without a microphone, with a captured-looking noise profile"""
+    from voice_data_collector import VoiceDataCollector
+
+    instance = VoiceDataCollector.__new__(VoiceDataCollector)
+    instance.rate = RATE
+    instance.noise_profile = np.random.default_rng(1).normal(0, 300, RATE * 2).astype(np.float32)
+    instance.is_noise_profile_captured = True
+    return instance
+
+
+def level_meter(clip):
+    """The per-chunk meter of listen_with_visual_feedback over a whole clip"""
+    for i in range(0, len(clip), CHUNK):
+        peak_level(clip[i:i + CHUNK])
+
+
+def build_cases(workdir):
+    """name -> (per-clip function, batch preparation or None), or a reason the case is skipped"""
+    cases = {}
+    instance = collector()
+    try:
+        import noisereduce  # apply_noise_reduction imports it for every clip
+        cases["noise_reduction"] = (instance.apply_noise_reduction, None)
+    except ImportError as e:
+        cases["noise_reduction"] = f"skipped: {e}"
+    cases["audio_enhancement"] = (instance.apply_audio_enhancement, None)
+    cases["level_meter"] = (level_meter, None)
+
+    save_path = os.path.join(workdir, "save.wav")
+    cases["wav_save"] = (lambda clip: write_clip(save_path, clip), None)
+
+    def stage(batch):
+        """Loading reads from disk, so each clip of the batch is written once up front"""
+        paths = [os.path.join(workdir, f"load_{i}.wav") for i in range(len(batch))]
+        for path, clip in zip(paths, batch):
+            write_clip(path, clip)
+        return paths
+    cases["wav_load"] = (read_clip, stage)
+    return cases
+
+
+def measure(function, batch, min_time=0.1, min_repeats=3):
+    """Seconds per call for each repeat within min_time"""
+    # Like timeit: a collection landing in one repeat would only add noise
+    gc.disable()
+    try:
+        times = []
+        started = time.perf_counter()
+        while len(times) < min_repeats or time.perf_counter() - started < min_time:
+            start = time.perf_counter()
+            for clip in batch:
+                function(clip)
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return times
+
+
+def peak_memory(function, batch):
+    """Peak traced bytes while processing one batch"""
+    tracemalloc.start()
+    for clip in batch:
+        function(clip)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run_suite(lengths=(0.5, 2.0, 8.0), batches=(1, 8), data_dir="voice_dataset", only=None, keys=None,
+              rounds=7):
+    """Every case over synthetic and real clips at each length and batch size (or just `keys`)
+
+    The suite is timed in interleaved rounds and each case keeps its fastest
+    time, so a few seconds of CPU contention cannot slow down one case in every round.
+    """
+    sources = {"synthetic": lambda n, i: synthetic_clip(n / RATE, seed=i)}
+    recorded = real_clips(data_dir)
+    if recorded:
+        sources["real"] = lambda n, i: fit_length(recorded[i % len(recorded)], n)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        jobs = []
+        for name, case in build_cases(workdir).items():
+            if only and name not in only:
+                continue
+            if isinstance(case, str):
+                print(f"⚠️  {name}: {case}")
+                continue
+            function, prepare = case
+            for source, make in sources.items():
+                for seconds in lengths:
+                    for batch_size in batches:
+                        key = f"{name}/{source}/{seconds:g}s/x{batch_size}"
+                        if keys is not None and key not in keys:
+                            continue
+                        batch = [make(int(RATE * seconds), i) for i in range(batch_size)]
+                        if prepare:
+                            batch = prepare(batch)
+                        # Warm-up doubles as the memory pass: filter design caches, first-touch page faults
+                        jobs.append((key, function, batch, seconds * batch_size, peak_memory(function, batch)))
+
+        times = {key: [] for key, *rest in jobs}
+        for _ in range(rounds):
+            for key, function, batch, audio_seconds, peak in jobs:
+                times[key] += measure(function, batch)
+
+        for key, function, batch, audio_seconds, peak in jobs:
+            results[key] = {
+                "s_per_audio_s": min(times[key]) / audio_seconds,
+                "median_s_per_audio_s": float(np.median(times[key])) / audio_seconds,
+                "peak_bytes": peak,
+                "repeats": len(times[key]),
+            }
+            print(f"   {key:<40} {min(times[key]) / audio_seconds * 1000:9.3f} ms per audio-s   "
+                  f"peak {peak / 1024:9.1f} KiB")
+    return results
+
+
+def environment():
+    """What the numbers depend on, stored with every run"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1)
+
+
+def compare(run, baseline, threshold=0.25, memory_threshold=0.25, memory_slack=64 * 1024, keys=None):
+    """Cases slower or hungrier than the baseline by more than the thresholds
+
+    Memory growth below memory_slack bytes is ignored so a few-KiB peak cannot flap.
+    """
+    regressions = []
+    print(f"\n=== COMPARISON WITH BASELINE ({baseline['environment']['time']}, "
+          f"commit {baseline['environment']['commit']}) ===")
+    if baseline["environment"]["processor"] != run["environment"]["processor"]:
+        print("⚠️  Baseline was recorded on a different CPU - timings are not comparable")
+
+    for key, now in sorted(run["results"].items()):
+        before = baseline["results"].get(key)
+        if before is None or (keys is not None and key not in keys):
+            continue
+        speed = now["s_per_audio_s"] / before["s_per_audio_s"]
+        memory = (now["peak_bytes"] + 1) / (before["peak_bytes"] + 1)
+        flags = []
+        if speed > 1 + threshold:
+            flags.append(f"time x{speed:.2f}")
+        if memory > 1 + memory_threshold and now["peak_bytes"] - before["peak_bytes"] > memory_slack:
+            flags.append(f"memory x{memory:.2f}")
+        if flags:
+            regressions.append((key, flags))
+            print(f"   ❌ {key:<40} {', '.join(flags)}")
+        elif speed < 1 - threshold:
+            print(f"   🚀 {key:<40} time x{speed:.2f}")
+
+    missing = sorted(set(baseline["results"]) - set(run["results"]))
+    if missing and keys is None:
+        print(f"   ⚠️  {len(missing)} baseline cases were not run this time")
+    print(f"{'❌' if regressions else '✅'} {len(regressions)} regressions beyond "
+          f"{threshold * 100:.0f}% time / {memory_threshold * 100:.0f}% memory")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the DSP hot paths and compare with a baseline")
+    parser.add_argument("--lengths", type=float, nargs="+", default=[0.5, 2.0, 8.0], help="clip seconds")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 8], help="clips per timed call")
+    parser.add_argument("--rounds", type=int, default=7, help="interleaved timing passes over the suite")
+    parser.add_argument("--only", nargs="+", help="case names, e.g. level_meter wav_save")
+    parser.add_argument("--data-dir", default="voice_dataset", help="real clips, used when present")
+    parser.add_argument("--history", default="benchmarks/history.json")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="make this run the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    print("\n=== DSP BENCHMARK ===")
+    suite = (args.lengths, args.batches, args.data_dir, args.only)
+    run = {"environment": environment(), "results": run_suite(*suite, rounds=args.rounds)}
+
+    baseline = None if args.save_baseline else load_json(args.baseline, None)
+    regressions = []
+    if baseline is not None:
+        thresholds = (args.threshold, args.memory_threshold)
+        regressions = compare(run, baseline, *thresholds)
+        if regressions:
+            # A slow stretch on a busy box is noise; a regression has to survive a longer second look
+            print("\n🔁 Re-measuring the regressed cases...")
+            keys = {key for key, flags in regressions}
+            for key, result in run_suite(*suite, keys=keys, rounds=args.rounds * 2).items():
+                if result["s_per_audio_s"] < run["results"][key]["s_per_audio_s"]:
+                    run["results"][key] = result
+            regressions = compare(run, baseline, *thresholds, keys=keys)
+
+    history = load_json(args.history, [])
+    history.append(run)
+    save_json(args.history, history)
+    print(f"📝 Run {len(history)} appended to {args.history}")
+
+    if args.save_baseline:
+        save_json(args.baseline, run)
+        print(f"📌 Saved as baseline: {args.baseline}")
+    elif baseline is None:
+        print(f"⚠️  No baseline at {args.baseline} - run with --save-baseline first")
+    elif regressions:
+        raise SystemExit(1)
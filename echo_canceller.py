@@ -0,0 +1,358 @@
+# echo_canceller.py - Remove Guido's own TTS output from the microphone signal before recognition
+import argparse
+import os
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+from scipy.signal import resample_poly
+
+RATE = 16000
+BLOCK = 256        # 16 ms adaptive filter block
+PARTITIONS = 8     # 8 x 16 ms = 128 ms of echo tail covered
+
+
+class EchoReference:
+    """What the speaker is playing, with the time it reaches the speaker, shared with capture"""
+
+    def __init__(self, rate=RATE, tail_seconds=PARTITIONS * BLOCK / RATE):
+        self.rate = rate
+        self.tail_seconds = tail_seconds
+        self.lock = threading.Lock()
+        self.samples = np.zeros(0, dtype=np.float32)
+        self.start_time = None
+
+    def begin(self, samples, start_time):
+        """Publish a clip that starts playing at `start_time` (time.monotonic clock)"""
+        with self.lock:
+            self.samples = np.asarray(samples, dtype=np.float32)
+            self.start_time = start_time
+
+    def end(self, stop_time=None):
+        """Playback was cut short at `stop_time`; anything after it was never heard"""
+        with self.lock:
+            if self.start_time is not None and stop_time is not None:
+                played = max(0, int((stop_time - self.start_time) * self.rate))
+                self.samples = self.samples[:played]
+
+    def active(self, end_time):
+        """True while playback, or its echo tail, overlaps audio captured up to `end_time`"""
+        with self.lock:
+            if self.start_time is None:
+                return False
+            stop = self.start_time + len(self.samples) / self.rate + self.tail_seconds
+            return self.start_time <= end_time + self.tail_seconds and end_time - self.tail_seconds <= stop
+
+    def window(self, end_time, n):
+        """Reference samples for the n captured samples ending at `end_time`, zero outside playback"""
+        out = np.zeros(n, dtype=np.float32)
+        with self.lock:
+            if self.start_time is None:
+                return out
+            first = int(round((end_time - self.start_time) * self.rate)) - n
+            lo, hi = max(first, 0), min(first + n, len(self.samples))
+            if hi > lo:
+                out[lo - first:hi - first] = self.samples[lo:hi]
+        return out
+
+
+class EchoSuppressor:
+    """Partitioned-block frequency-domain NLMS echo canceller with a reference-gated VAD
+
+    The adaptive filter subtracts the estimated echo; blocks whose residual is still
+    mostly echo (no near-end talker) are gated to silence so the recognizer skips them.
+    """
+
+    def __init__(self, block=BLOCK, partitions=PARTITIONS, step=1.0, smoothing=0.9,
+                 near_end_ratio=0.5, gate_gain=0.0, min_erle_db=6.0, hangover_blocks=12,
+                 speech_rms=300):
+        self.block = block
+        self.partitions = partitions
+        self.step = step
+        self.smoothing = smoothing
+        self.near_end_ratio = near_end_ratio
+        self.gate_gain = gate_gain
+        self.min_erle = 10 ** (min_erle_db / 10)
+        self.hangover_blocks = hangover_blocks
+        self.speech_energy = speech_rms ** 2 * block
+        self.hangover = 0
+
+        bins = block + 1
+        self.weights = np.zeros((partitions, bins), dtype=np.complex64)
+        self.power = np.zeros(bins, dtype=np.float32)
+        self.erle = 1.0
+        self.blocks = 0
+        self.gated_blocks = 0
+        self.clear_history()
+
+    def clear_history(self):
+        """Forget buffered audio but keep the learned echo path"""
+        self.ref_history = np.zeros(2 * self.block, dtype=np.float32)
+        self.spectra = np.zeros_like(self.weights)
+        self.pending_mic = np.zeros(0, dtype=np.float32)
+        self.pending_ref = np.zeros(0, dtype=np.float32)
+        self.output = np.zeros(0, dtype=np.float32)
+
+    @property
+    def converged(self):
+        """The filter removes enough echo that what is left can be told from a talker"""
+        return self.erle >= self.min_erle
+
+    @property
+    def idle(self):
+        """No partial block waiting, so the canceller can be bypassed without losing samples"""
+        return len(self.pending_mic) == 0 and len(self.output) == 0
+
+    def process(self, mic, ref):
+        """Cancel `ref`'s echo from int16 `mic`; returns int16 of the same length
+
+        Chunks that are a multiple of the block size come back with no added latency.
+        """
+        n = len(mic)
+        mic = np.concatenate((self.pending_mic, np.asarray(mic, dtype=np.float32)))
+        ref = np.concatenate((self.pending_ref, np.asarray(ref, dtype=np.float32)))
+        cut = len(mic) // self.block * self.block
+        self.pending_mic, self.pending_ref = mic[cut:], ref[cut:]
+
+        out = [self.output]
+        for i in range(0, cut, self.block):
+            out.append(self._process_block(mic[i:i + self.block], ref[i:i + self.block]))
+        out = np.concatenate(out)
+
+        if len(out) < n:
+            # Odd-sized chunk: delay the output by the partial block still pending
+            out = np.concatenate((np.zeros(n - len(out), dtype=np.float32), out))
+        self.output = out[n:]
+        return np.clip(out[:n], -32768, 32767).astype(np.int16)
+
+    def _process_block(self, d, x):
+        """One overlap-save step on a block of mic samples `d` and reference samples `x`"""
+        b = self.block
+        self.ref_history[:b] = self.ref_history[b:]
+        self.ref_history[b:] = x
+        self.spectra[1:] = self.spectra[:-1]
+        self.spectra[0] = np.fft.rfft(self.ref_history)
+
+        echo = np.fft.irfft((self.weights * self.spectra).sum(axis=0))[b:]
+        error = d - echo
+
+        d_energy = float(d @ d) + 1e-3
+        e_energy = float(error @ error) + 1e-3
+        y_energy = float(echo @ echo)
+        x_energy = float(x @ x)
+
+        # Near-end talker: the residual is speech-loud and large compared with the echo we can explain
+        converged = self.converged
+        near_end = e_energy > max(self.near_end_ratio * y_energy, self.speech_energy)
+
+        if not (converged and near_end) and x_energy > 0:
+            # Adapt only on echo-only blocks once converged, so a talker does not drag the filter off
+            current = (np.abs(self.spectra) ** 2).sum(axis=0)
+            # Never trail the current power: a stale low estimate at a speech onset means a huge step
+            self.power = np.maximum(self.smoothing * self.power + (1 - self.smoothing) * current, current)
+            gradient = np.fft.rfft(np.concatenate((np.zeros(b, dtype=np.float32), error)))
+            # Floor the per-bin power so nearly empty bins of a voiced reference do not blow up
+            floor = self.power.mean() + 1e-6
+            update = self.step * np.conj(self.spectra) * gradient / (self.power + floor)
+            # Gradient constraint: keep each partition a causal b-tap filter
+            taps = np.fft.irfft(update, axis=1)
+            taps[:, b:] = 0
+            self.weights += np.fft.rfft(taps, axis=1).astype(np.complex64)
+            if y_energy > 0:
+                self.erle = 0.95 * self.erle + 0.05 * d_energy / e_energy
+
+        # Hold the gate open a little after the talker so word endings are not clipped
+        self.hangover = self.hangover_blocks if near_end else max(0, self.hangover - 1)
+
+        self.blocks += 1
+        if y_energy > 0 and converged and not self.hangover:
+            self.gated_blocks += 1
+            return error * self.gate_gain
+        return error
+
+
+def to_mono_16k(audio, channels, rate):
+    """Mix int16 audio down to mono and resample it to RATE"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != RATE:
+        g = np.gcd(rate, RATE)
+        audio = resample_poly(audio, RATE // g, rate // g)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def load_wav(path):
+    """Read a 16-bit WAV as mono int16 at RATE"""
+    with wave.open(path, 'rb') as wf:
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        return to_mono_16k(audio, wf.getnchannels(), wf.getframerate())
+
+
+class EchoAwareSpeaker:
+    """Plays TTS itself instead of through pyttsx3, so the capture side knows what was played"""
+
+    def __init__(self, engine, reference, chunk=1024):
+        import pyaudio
+
+        self.engine = engine
+        self.reference = reference
+        self.chunk = chunk
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=RATE,
+                                      output=True, frames_per_buffer=chunk)
+        self.stop_event = threading.Event()
+
+    def render(self, text):
+        """Synthesize text to int16 samples with the engine's own voice settings"""
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            return load_wav(path)
+        finally:
+            os.remove(path)
+
+    def say(self, text):
+        """Speak text, publishing the samples as the echo reference; blocks until done or stopped"""
+        try:
+            samples = self.render(text)
+        except Exception as e:
+            # Some engines cannot render to a file; speak without cancellation rather than not at all
+            print(f"⚠️  TTS render failed ({e}), speaking without echo reference")
+            self.engine.say(text)
+            self.engine.runAndWait()
+            return
+
+        self.stop_event.clear()
+        # Samples written now reach the speaker after the output latency
+        self.reference.begin(samples, time.monotonic() + self.stream.get_output_latency())
+        for i in range(0, len(samples), self.chunk):
+            if self.stop_event.is_set():
+                self.reference.end(time.monotonic() + self.stream.get_output_latency())
+                return
+            self.stream.write(samples[i:i + self.chunk].tobytes())
+
+    def stop(self):
+        """Barge-in: cut playback short from another thread"""
+        self.stop_event.set()
+
+    def close(self):
+        self.stream.close()
+        self.audio.terminate()
+
+
+class EchoCancellingStream:
+    """Wraps a microphone stream's read() so everything downstream sees echo-free audio"""
+
+    def __init__(self, stream, suppressor, reference, input_latency=0.0, rate=RATE):
+        self.stream = stream
+        self.suppressor = suppressor
+        self.reference = reference
+        self.input_latency = input_latency
+        self.rate = rate
+
+    def read(self, size):
+        data = self.stream.read(size)
+        # The newest sample just read left the microphone one input latency ago
+        end_time = time.monotonic() - self.input_latency
+        if not self.reference.active(end_time):
+            # Nothing playing: skip the filter entirely so idle listening costs nothing extra
+            if not self.suppressor.idle:
+                self.suppressor.clear_history()
+            return data
+
+        mic = np.frombuffer(data, dtype=np.int16)
+        ref = self.reference.window(end_time, len(mic))
+        return self.suppressor.process(mic, ref).tobytes()
+
+    def close(self):
+        return self.stream.close()
+
+
+def evaluate(tts, speech, delay_ms=20.0, echo_gain=0.6, speech_at=None, chunk=1024,
+             energy_threshold=300, seed=0):
+    """Offline check: simulate the speaker-to-mic path for a TTS clip, mix in a talker, measure"""
+    rng = np.random.default_rng(seed)
+    tts = tts.astype(np.float32)
+    speech = speech.astype(np.float32)
+    if speech_at is None:
+        speech_at = len(tts) // 2
+
+    # Room: direct path after the acoustic delay plus a decaying diffuse tail
+    delay = int(delay_ms * RATE / 1000)
+    tail = rng.normal(0, 0.05, 1200) * np.exp(-np.arange(1200) / 250)
+    path = np.zeros(delay + len(tail))
+    path[delay] = echo_gain
+    path[delay:] += tail
+    echo = np.convolve(tts, path)[:len(tts)]
+
+    near = np.zeros_like(tts)
+    n = min(len(speech), len(tts) - speech_at)
+    near[speech_at:speech_at + n] = speech[:n]
+    mic = np.clip(echo + near + rng.normal(0, 30, len(tts)), -32768, 32767).astype(np.int16)
+
+    suppressor = EchoSuppressor()
+    start = time.process_time()
+    out = np.concatenate([suppressor.process(mic[i:i + chunk], tts[i:i + chunk])
+                          for i in range(0, len(mic), chunk)])
+    cpu = time.process_time() - start
+
+    block = 20 * RATE // 1000
+    n_blocks = len(mic) // block
+
+    def rms(x):
+        return np.sqrt(np.mean(x[:n_blocks * block].astype(np.float32).reshape(n_blocks, block) ** 2, axis=1))
+
+    talker = rms(near) > energy_threshold
+    self_speech_in, self_speech_out = rms(mic) > energy_threshold, rms(out) > energy_threshold
+    echo_only = ~talker & (rms(echo) > energy_threshold)
+
+    # Filter alone, without the gate, after it has converged and before the talker
+    ungated = EchoSuppressor(gate_gain=1.0)
+    residual = np.concatenate([ungated.process(mic[i:i + chunk], tts[i:i + chunk])
+                               for i in range(0, len(mic), chunk)])
+    settled = slice(len(mic) // 4, speech_at)
+    erle = 10 * np.log10(np.mean(mic[settled].astype(np.float32) ** 2) /
+                         max(np.mean(residual[settled].astype(np.float32) ** 2), 1e-9))
+    talk = slice(speech_at, speech_at + n)
+    snr_in = 10 * np.log10(np.mean(near[talk] ** 2) / np.mean((mic[talk] - near[talk]) ** 2))
+    snr_out = 10 * np.log10(np.mean(near[talk] ** 2) /
+                            np.mean((out[talk].astype(np.float32) - near[talk]) ** 2))
+
+    seconds = len(mic) / RATE
+    print("\n=== ECHO SUPPRESSION REPORT ===")
+    print(f"🔊 {seconds:.1f}s of TTS, talker from {speech_at / RATE:.1f}s for {n / RATE:.1f}s")
+    print(f"📉 Echo return loss enhancement (filter only): {erle:.1f} dB")
+    print(f"🗣️  Self-speech frames above the VAD threshold: {np.sum(self_speech_in & echo_only)} -> "
+          f"{np.sum(self_speech_out & echo_only)} of {np.sum(echo_only)}")
+    print(f"👤 Talker frames kept: {np.sum(self_speech_out & talker)}/{np.sum(talker)}, "
+          f"SNR {snr_in:.1f} dB -> {snr_out:.1f} dB")
+    print(f"⚙️  CPU: {cpu / seconds * 100:.2f}% of one core")
+    return {"erle_db": erle, "self_speech_in": int(np.sum(self_speech_in & echo_only)),
+            "self_speech_out": int(np.sum(self_speech_out & echo_only)),
+            "talker_kept": int(np.sum(self_speech_out & talker)), "talker_frames": int(np.sum(talker)),
+            "snr_in": snr_in, "snr_out": snr_out, "cpu": cpu, "cleaned": out}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mix a TTS clip and a speech clip offline and measure echo suppression")
+    parser.add_argument("tts", help="WAV of Guido's TTS output (e.g. rendered with pyttsx3 save_to_file)")
+    parser.add_argument("speech", help="WAV of a person speaking, e.g. a voice_dataset sample")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="speaker-to-mic delay")
+    parser.add_argument("--echo-gain", type=float, default=0.6, help="speaker-to-mic gain")
+    parser.add_argument("--speech-at", type=float, default=None, help="talker start in seconds")
+    parser.add_argument("--out", help="write the cleaned mic signal to this WAV")
+    args = parser.parse_args()
+
+    speech_at = int(args.speech_at * RATE) if args.speech_at is not None else None
+    result = evaluate(load_wav(args.tts), load_wav(args.speech), args.delay_ms, args.echo_gain, speech_at)
+    if args.out:
+        with wave.open(args.out, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(RATE)
+            wf.writeframes(result["cleaned"].tobytes())
@@ -1,18 +1,62 @@
 import speech_recognition as sr
 import pyttsx3
+import os
 import time
 import threading
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime
+from racing_recognizer import RacingRecognizer, cloud_backend, vosk_backend
+from cloud_recognizer import CloudRecognizer, StreamingTap
+from action_dispatcher import ActionDispatcher, Action, parse_actions, PRIORITY_ORGANIZE, ORGANIZE_WORDS
+from wake_detector import WakeDetector
+from audio_utils import UtteranceSegmenter
+from echo_canceller import EchoReference, EchoSuppressor, EchoAwareSpeaker, EchoCancellingStream
+from utterance_log import UtteranceLog
+from beamformer import ArrayMicrophone, input_channels
+from phonetic_index import PhoneticIndex, UNROUTED
+from spoken_phrases import SPOKEN_PHRASES
 
 class GuidoVoiceSystem:
     def __init__(self):
         # Initialize speech recognition
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = self.create_microphone()
         
-        # Initialize text-to-speech
-        self.tts_engine = pyttsx3.init()
-        self.setup_tts()
+        # Keep audio from just before the phrase starts so a wake word
+        # spoken right at the start of capture is not clipped
+        self.pre_roll_seconds = 0.5
+        self.recognizer.non_speaking_duration = self.pre_roll_seconds
+        self.recognizer.pause_threshold = max(self.recognizer.pause_threshold, self.pre_roll_seconds)
+        
+        # Long enough for "Guido, give me the hammer" in a single utterance
+        self.wake_phrase_time_limit = 6
+        
+        # Race Google against the local Vosk model and take the first confident answer
+        self.vosk_model_path = "vosk-model-small-en-us-0.15"
+        self.cloud_recognizer = self.create_cloud_recognizer()
+        self.racing_recognizer = self.create_racing_recognizer()
+        
+        # Cheap first stage for the idle state, built from the recorded activation samples
+        self.wake_detector = WakeDetector.from_dataset("voice_dataset")
+        if self.wake_detector is None:
+            print("⚠️  No activation samples found - using full recognition for wake words")
+        # Wake hits are recognized here so the capture loop never stops reading the stream
+        self.recognize_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recognize")
+        
+        # Text-to-speech is created by the thread that speaks; see setup_speech()
+        self.tts_engine = None
+        self.speaker = None
+        
+        # Guido plays its own TTS so the microphone path can cancel it before recognition
+        self.echo_reference = EchoReference()
+        self.echo_suppressor = EchoSuppressor()
+        
+        # When Guido last stopped talking, so capture can tell its own voice from a command
+        self.playback_idle = threading.Event()
+        self.playback_idle.set()
+        self.playback_ended = 0.0
         
         # System state
         self.is_activated = False
@@ -20,6 +64,33 @@ class GuidoVoiceSystem:
         self.activation_timeout = 15 * 60  # 15 minutes
         self.check_interval = 10 * 60     # 10 minutes for object checking
         
+        self.setup_vocabulary()
+        
+        # Audio and outcome of every utterance, written off the listen loop for later replay
+        self.utterance_log = self.create_utterance_log()
+        
+        # Deliveries run on a background queue so listening continues meanwhile
+        self.action_dispatcher = ActionDispatcher()
+        
+        print("Guido Voice System Initialized!")
+    
+    def create_microphone(self):
+        """Beamformed array microphone when the input device has several channels"""
+        # Same rate as the dataset templates
+        try:
+            audio = sr.Microphone.get_pyaudio().PyAudio()
+            channels = input_channels(audio)
+            audio.terminate()
+        except Exception:
+            channels = 1
+        
+        if channels > 1:
+            print(f"🎙️  {channels}-channel microphone array - beamforming to mono")
+            return ArrayMicrophone(channels, sample_rate=16000)
+        return sr.Microphone(sample_rate=16000)
+    
+    def setup_vocabulary(self):
+        """Activation phrases and tool classes"""
         # Activation phrases
         self.activation_phrases = [
             "guido wake up",
@@ -35,7 +106,57 @@ class GuidoVoiceSystem:
             'plier': 3, 'screwdriver': 4, 'wrench': 5
         }
         
-        print("Guido Voice System Initialized!")
+        # Near-miss correction towards the words that change what Guido does
+        self.phonetic_index = PhoneticIndex.from_vocabulary(
+            self.tool_classes, self.activation_phrases, SPOKEN_PHRASES.values(),
+            routes=lambda word: self.command_intent(word) != "unknown"
+        )
+    
+    def create_utterance_log(self):
+        """Structured utterance log, or None if the log directory cannot be used"""
+        try:
+            return UtteranceLog("utterance_logs")
+        except OSError as e:
+            print(f"⚠️  Utterance logging disabled: {e}")
+            return None
+    
+    def create_cloud_recognizer(self):
+        """Pooled Google client with a per-request budget, connected ahead of the first phrase"""
+        # Inside the 4 s race deadline, so a stalled request still leaves Vosk's answer in time
+        cloud = CloudRecognizer(budget=2.5)
+        cloud.warm()
+        return cloud
+    
+    def create_racing_recognizer(self):
+        """Set up the cloud and local recognition backends"""
+        backends = [cloud_backend(self.cloud_recognizer)] if self.cloud_recognizer else []
+        
+        if os.path.exists(self.vosk_model_path):
+            try:
+                from vosk import Model
+                backends.append(vosk_backend(Model(self.vosk_model_path)))
+            except Exception as e:
+                print(f"⚠️  Vosk backend unavailable: {e}")
+        
+        return RacingRecognizer(backends)
+    
+    def create_speaker(self):
+        """Echo-aware TTS playback, or None to fall back to plain pyttsx3"""
+        try:
+            return EchoAwareSpeaker(self.tts_engine, self.echo_reference)
+        except Exception as e:
+            print(f"⚠️  Echo-aware playback unavailable: {e}")
+            return None
+    
+    def setup_speech(self):
+        """Create the TTS engine and player on the calling thread
+        
+        pyttsx3's sapi5 and nsss drivers only work on the thread that created the
+        engine, and every line is spoken on the speech thread.
+        """
+        self.tts_engine = pyttsx3.init()
+        self.setup_tts()
+        self.speaker = self.create_speaker()
     
     def setup_tts(self):
         """Configure text-to-speech engine"""
@@ -47,8 +168,28 @@ class GuidoVoiceSystem:
     def speak(self, text):
         """Convert text to speech"""
         print(f"Guido: {text}")
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+        if self.tts_engine is None:
+            self.setup_speech()
+        self.playback_idle.clear()
+        try:
+            if self.speaker:
+                self.speaker.say(text)
+            else:
+                self.tts_engine.say(text)
+                self.tts_engine.runAndWait()
+        finally:
+            self.playback_ended = time.time()
+            self.playback_idle.set()
+    
+    def echo_guarded(self):
+        """Guido's own voice is removed from the microphone signal before recognition"""
+        return self.speaker is not None and self.echo_suppressor.converged
+    
+    def heard_own_voice(self, started):
+        """Audio captured since `started` overlapped Guido's speech and nothing removed it"""
+        if self.echo_guarded():
+            return False
+        return not self.playback_idle.is_set() or self.playback_ended > started
     
     def calibrate_microphone(self):
         """Calibrate microphone for ambient noise"""
@@ -57,29 +198,155 @@ class GuidoVoiceSystem:
             self.recognizer.adjust_for_ambient_noise(source, duration=1)
         print("Calibration complete!")
     
+    def cancel_echo(self, source):
+        """Route an opened microphone through the echo suppressor"""
+        if self.speaker is None:
+            return
+        latency = source.stream.pyaudio_stream.get_input_latency()
+        source.stream = EchoCancellingStream(source.stream, self.echo_suppressor, self.echo_reference, latency)
+    
+    def stream_to_cloud(self, source):
+        """Upload the phrase to the cloud recognizer while it is still being spoken"""
+        if self.cloud_recognizer is None:
+            return None
+        upload = self.cloud_recognizer.open_stream(source.SAMPLE_RATE, self.recognizer.energy_threshold)
+        source.stream = StreamingTap(source.stream, upload)
+        return upload
+    
     def listen(self, timeout=7, phrase_time_limit=6):
         """Listen for voice input"""
+        started = time.time()
+        upload = None
         try:
             with self.microphone as source:
+                self.cancel_echo(source)
+                upload = self.stream_to_cloud(source)
                 print("\n🎤 Listening...")
                 audio = self.recognizer.listen(
                     source, 
                     timeout=timeout, 
                     phrase_time_limit=phrase_time_limit
                 )
+            captured = time.time()
+            if self.heard_own_voice(started):
+                # Most likely Guido's own line; the canceller is still adapting to it
+                print("🔇 Ignoring audio captured while Guido was speaking")
+                return None
             
-            text = self.recognizer.recognize_google(audio).lower()
-            print(f"👤 You said: {text}")
+            streamed = {"google": upload.finish} if upload else None
+            heard, confidence, backend = self.racing_recognizer.recognize(audio, streamed=streamed)
+            text = self.correct_transcript(heard, self.is_activated)
+            self.log_utterance(audio, started, captured, heard, confidence, backend, corrected=text)
+            print(f"👤 You said: {text} ({backend}, {confidence:.2f})")
             return text
             
         except sr.WaitTimeoutError:
             return None
         except sr.UnknownValueError:
+            self.log_utterance(audio, started, captured, error="not understood")
             print("❌ Could not understand audio")
             return None
         except sr.RequestError as e:
+            self.log_utterance(audio, started, captured, error=str(e))
             print(f"❌ Error with speech recognition: {e}")
             return None
+        finally:
+            # A phrase that never came, or a race Vosk won, must not keep uploading
+            if upload:
+                upload.abort()
+    
+    def correct_transcript(self, text, active, quiet=False):
+        """Transcript with misheard command words replaced by the ones they sound like
+        
+        Only an utterance Guido would not act on is corrected, so a sentence that
+        already routes somewhere is never turned into a different command.
+        """
+        if self.utterance_intent(text, active) not in UNROUTED:
+            return text
+        corrected, corrections = self.phonetic_index.correct(text)
+        if not quiet:
+            for heard, word, confidence in corrections:
+                print(f"🔤 Heard '{heard}' as '{word}' ({confidence:.2f})")
+        return corrected
+    
+    def log_utterance(self, audio, started, captured, text=None, confidence=None, backend=None, error=None,
+                      corrected=None):
+        """Queue the utterance for the background log writer; the audio buffer is not copied"""
+        if self.utterance_log is None:
+            return
+        
+        finished = time.time()
+        active = self.is_activated
+        self.utterance_log.log({
+            "time": started,
+            "state": "active" if active else "idle",
+            "transcript": text,
+            "corrected": corrected if corrected != text else None,
+            "confidence": confidence,
+            "backend": backend,
+            "intent": self.utterance_intent(corrected or text, active) if text else None,
+            "error": error,
+            "timings": {"capture_s": captured - started, "recognize_s": finished - captured},
+        }, audio.frame_data, audio.sample_rate, audio.sample_width)
+    
+    def listen_for_wake(self, timeout=10):
+        """Run the cheap wake detector on every chunk; only its hits go to full recognition
+        
+        A hit is followed to the normal phrase endpoint, so a command after a pause
+        ("hey guido ... give me the hammer") is recognized together with the wake phrase.
+        """
+        self.wake_detector.reset()
+        with self.microphone as source:
+            self.cancel_echo(source)
+            self.wake_detector.set_energy_threshold(self.recognizer.energy_threshold)
+            end_time = time.time() + timeout
+            phrase = None  # segmenter following a stage-1 hit to the end of the phrase
+            pending = []   # hits being recognized while capture goes on
+            
+            while time.time() < end_time or phrase or pending:
+                chunk = np.frombuffer(source.stream.read(source.CHUNK), dtype=np.int16)
+                if phrase:
+                    finished = phrase.feed(chunk)
+                    if finished or not phrase.in_speech:
+                        pending += [self.recognize_wake(segment, source) for segment in finished]
+                        phrase = None
+                        self.wake_detector.reset()
+                elif time.time() < end_time:
+                    for segment in self.wake_detector.feed(chunk):
+                        if self.heard_own_voice(time.time() - len(segment) / source.SAMPLE_RATE):
+                            continue
+                        phrase = UtteranceSegmenter(
+                            source.SAMPLE_RATE, self.recognizer.energy_threshold,
+                            min_silence_ms=int(self.recognizer.pause_threshold * 1000),
+                            max_utterance_s=self.wake_phrase_time_limit
+                        )
+                        phrase.feed(segment)
+                        break
+                
+                for hit in [hit for hit in pending if hit[0].done()]:
+                    pending.remove(hit)
+                    text = self.wake_result(*hit)
+                    if self.is_activation_command(text):
+                        return text
+        return None
+    
+    def recognize_wake(self, segment, source):
+        """Start full recognition of a wake hit on the recognize thread"""
+        audio = sr.AudioData(segment.tobytes(), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        return self.recognize_executor.submit(self.racing_recognizer.recognize, audio), audio, time.time()
+    
+    def wake_result(self, future, audio, started):
+        """Transcript of a finished wake hit, logged; None if it was not understood"""
+        try:
+            heard, confidence, backend = future.result()
+        except (sr.UnknownValueError, sr.RequestError) as e:
+            self.log_utterance(audio, started, started, error=str(e) or "not understood")
+            return None
+        
+        text = self.correct_transcript(heard, False)
+        self.log_utterance(audio, started, started, heard, confidence, backend, corrected=text)
+        print(f"👤 You said: {text} ({backend}, {confidence:.2f})")
+        return text
     
     def is_activation_command(self, text):
         """Check if the text contains activation phrases"""
@@ -91,41 +358,113 @@ class GuidoVoiceSystem:
                 return True
         return False
     
-    def process_command(self, command):
-        """Process voice commands"""
-        self.last_activity_time = time.time()
+    def split_activation_command(self, text):
+        """Return the command spoken after the activation phrase, if any"""
+        if not text:
+            return None
         
+        # Skip past every activation phrase, e.g. "hello guido wake up ..."
+        best_end = None
+        for phrase in self.activation_phrases:
+            start = text.find(phrase)
+            if start != -1:
+                end = start + len(phrase)
+                if best_end is None or end > best_end:
+                    best_end = end
+        
+        if best_end is None:
+            return None
+        
+        command = text[best_end:].strip(" ,.!?")
+        return command or None
+    
+    def command_intent(self, command):
+        """Name of the handler a command is routed to"""
         if any(tool in command for tool in ['bolt', 'hammer', 'measuring tape', 'plier', 'screwdriver', 'wrench']):
-            self.handle_tool_request(command)
+            return "tool"
+        elif any(word in command for word in ORGANIZE_WORDS):
+            return "organize"
         elif any(word in command for word in ['guide', 'help', 'manual']):
-            self.provide_guidance(command)
+            return "guidance"
         elif any(word in command for word in ['deactivate', 'sleep', 'stop']):
-            self.deactivate()
+            return "deactivate"
         elif 'time' in command:
-            self.tell_time()
+            return "time"
+        return "unknown"
+    
+    def utterance_intent(self, text, active):
+        """What run() does with a transcript heard in the idle or active state"""
+        if active:
+            return self.command_intent(text)
+        if not self.is_activation_command(text):
+            return "ignored"
+        command = self.split_activation_command(text)
+        return f"activation+{self.command_intent(command)}" if command else "activation"
+    
+    def process_command(self, command):
+        """Process voice commands; state changes now, the spoken part as a cancellable task"""
+        self.last_activity_time = time.time()
+        
+        intent = self.command_intent(command)
+        if intent == "unknown" and self.handler_running():
+            # Probably noise while Guido is busy - do not cut the current handler off for it
+            return
+        self.preempt()
+        
+        if intent == "tool":
+            self.start_task(self.handle_tool_request(command))
+        elif intent == "organize":
+            self.start_task(self.handle_organize_request())
+        elif intent == "guidance":
+            self.start_task(self.provide_guidance(command))
+        elif intent == "deactivate":
+            self.deactivate()
+        elif intent == "time":
+            self.start_task(self.tell_time())
         else:
-            self.speak("I didn't understand that command. Please try again.")
+            self.start_task(self.say("I didn't understand that command. Please try again."))
+    
+    async def say(self, text):
+        """Speak on the speech thread; awaiting it is where a handler can be cancelled"""
+        await self.loop.run_in_executor(self.speech_executor, self.speak, text)
     
-    def handle_tool_request(self, command):
+    async def handle_tool_request(self, command):
         """Handle tool delivery request"""
-        # Extract tool name from command
-        tool = None
-        for tool_name in self.tool_classes.keys():
-            if tool_name in command:
-                tool = tool_name
-                break
-        
-        if tool:
-            self.speak(f"I will bring you the {tool}. Please show me your hand.")
+        # "give me the wrench and the screwdriver" -> one delivery per tool, in spoken order,
+        # plus "... and organize the tools" as a low-priority action behind them
+        actions = parse_actions(command, self.tool_classes)
+        
+        # Queued before speaking, so a pre-empting command cannot lose the delivery
+        self.action_dispatcher.submit_all(actions, self.on_action_complete)
+        tools = [action.target for action in actions if action.kind == "deliver"]
+        if tools:
+            tool_list = tools[0] if len(tools) == 1 else f"{', '.join(tools[:-1])} and the {tools[-1]}"
             # Here you would integrate with MediaPipe hand detection
-            print(f"🤖 [ACTION] Delivering {tool} to user's hand")
+            await self.say(f"I will bring you the {tool_list}. Please show me your hand.")
+        else:
+            await self.say("I didn't catch which tool you need. Please say it again.")
+        if any(action.kind == "organize" for action in actions):
+            await self.say("Then I'll organize the tools according to their classes.")
+    
+    async def handle_organize_request(self):
+        """Tidy the tools by class once any pending deliveries are done"""
+        self.action_dispatcher.submit(Action("organize", None, PRIORITY_ORGANIZE), self.on_action_complete)
+        await self.say("I'm organizing the tools according to their classes.")
+    
+    def on_action_complete(self, action):
+        """Called from the dispatcher thread when an action finishes; handled on the event loop"""
+        self.post_event(self.action_finished, action)
+    
+    def action_finished(self, action):
+        if action.status == "done":
+            print(f"🤖 [ACTION] {action.kind} {action.target or 'tools'} complete")
         else:
-            self.speak("I didn't catch which tool you need. Please say it again.")
+            print(f"⚠️  [ACTION] {action.kind} {action.target or 'tools'} {action.status}")
     
-    def provide_guidance(self, command):
-        """Provide repair guidance"""
+    async def provide_guidance(self, command):
+        """Provide repair guidance; a new command cancels it between steps"""
         if 'tire' in command or 'tyre' in command or 'puncture' in command:
-            self.speak("Here's the procedure for repairing a punctured tire:")
+            await self.say("Here's the procedure for repairing a punctured tire:")
             procedure = [
                 "1. Secure the vehicle on a flat surface and apply parking brake",
                 "2. Loosen the lug nuts before jacking up the vehicle",
@@ -137,81 +476,179 @@ class GuidoVoiceSystem:
             ]
             for step in procedure:
                 print(f"   {step}")
-                self.speak(step)
+                await self.say(step)
         else:
-            self.speak("I can help with tire repair procedures. What specific guidance do you need?")
+            await self.say("I can help with tire repair procedures. What specific guidance do you need?")
     
-    def tell_time(self):
+    async def tell_time(self):
         """Tell current time"""
         current_time = datetime.now().strftime("%I:%M %p")
-        self.speak(f"The current time is {current_time}")
+        await self.say(f"The current time is {current_time}")
     
     def check_inactivity(self):
         """Check if robot should deactivate due to inactivity"""
         if self.is_activated and (time.time() - self.last_activity_time) > self.activation_timeout:
-            self.speak("I'm deactivating due to inactivity. Say 'Guido wake up' when you need me.")
             self.is_activated = False
+            # Nobody is there to hand queued tools to
+            self.action_dispatcher.cancel_pending()
+            self.start_task(self.say("I'm deactivating due to inactivity. Say 'Guido wake up' when you need me."),
+                            preemptible=False)
     
     def auto_organize_tools(self):
         """Simulate automatic tool organization"""
         if self.is_activated:
             print("🛠️ [AUTO-ORGANIZE] Checking and organizing tools by class...")
-            self.speak("I'm organizing the tools according to their classes.")
-            # This would integrate with your vision system
+            # Low priority, so any pending deliveries go first; this would integrate with your vision system
+            self.action_dispatcher.submit(Action("organize", None, PRIORITY_ORGANIZE), self.on_action_complete)
+            self.start_task(self.say("I'm organizing the tools according to their classes."), preemptible=False)
     
     def deactivate(self):
-        """Deactivate the robot"""
+        """Deactivate the robot; deliveries not started yet are cancelled, the one in progress finishes"""
         self.is_activated = False
-        self.speak("Deactivating now. Goodbye!")
+        self.action_dispatcher.cancel_pending()
+        self.start_task(self.say("Deactivating now. Goodbye!"))
     
-    def run(self):
-        """Main system loop"""
-        self.calibrate_microphone()
-        self.speak("Voice system ready. Say 'Guido wake up' to activate me.")
+    def start_task(self, coroutine, preemptible=True):
+        """Run a handler as a task; the latest preemptible one is what a new command cancels"""
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.task_finished)
+        if preemptible:
+            self.current_task = task
+        return task
+    
+    def task_finished(self, task):
+        """Handler completion event"""
+        self.tasks.discard(task)
+        if task is self.current_task:
+            self.current_task = None
+        if not task.cancelled() and task.exception():
+            print(f"Unexpected error: {task.exception()}")
+    
+    async def wait_until_quiet(self):
+        """Let every handler finish speaking; plain pyttsx3 output cannot be cancelled from the mic"""
+        await asyncio.sleep(0)  # a handler started just now has not reached its first line yet
+        while self.tasks:
+            await asyncio.wait(list(self.tasks))
+    
+    def handler_running(self):
+        return self.current_task is not None and not self.current_task.done()
+    
+    def preempt(self):
+        """Cancel the command handler still running and cut off the line it is speaking"""
+        if self.handler_running():
+            print("⏭️  New command - interrupting the current one")
+            self.current_task.cancel()
+            if self.speaker:
+                self.speaker.stop()
+    
+    def post_event(self, callback, *args):
+        """Run callback on the event loop from another thread; returns a future for its result"""
+        done = Future()
         
-        # Start background threads
-        inactivity_thread = threading.Thread(target=self.monitor_inactivity, daemon=True)
-        organization_thread = threading.Thread(target=self.monitor_organization, daemon=True)
-        inactivity_thread.start()
-        organization_thread.start()
+        def handle():
+            try:
+                done.set_result(callback(*args))
+            except Exception as e:
+                done.set_exception(e)
         
+        self.loop.call_soon_threadsafe(handle)
+        return done
+    
+    def run_timer(self, interval, callback):
+        """Timer thread: post callback to the event loop every interval and wait until it ran"""
         while True:
+            time.sleep(interval)
             try:
-                if not self.is_activated:
-                    # Listen for activation
-                    text = self.listen(timeout=10, phrase_time_limit=3)
-                    if text and self.is_activation_command(text):
-                        self.is_activated = True
-                        self.last_activity_time = time.time()
-                        self.speak("I am activated sir! How can I assist you today?")
-                
-                else:
-                    # Listen for commands
-                    text = self.listen(timeout=8, phrase_time_limit=5)
-                    if text:
-                        self.process_command(text)
-                    else:
-                        print("⏰ No command detected, continuing to listen...")
-                        
-            except KeyboardInterrupt:
-                self.speak("Shutting down Guido system. Goodbye!")
-                break
+                self.post_event(callback).result()
+            except RuntimeError:
+                return  # event loop closed
             except Exception as e:
                 print(f"Unexpected error: {e}")
-                continue
     
-    def monitor_inactivity(self):
-        """Background thread to monitor inactivity"""
-        while True:
-            time.sleep(30)  # Check every 30 seconds
-            self.check_inactivity()
+    def listen_for_state(self):
+        """Blocking capture and recognition for the current state, run on the listen thread"""
+        if not self.is_activated:
+            # Listen for activation
+            if self.wake_detector:
+                return self.listen_for_wake(timeout=10)
+            return self.listen(timeout=10, phrase_time_limit=self.wake_phrase_time_limit)
+        # Listen for commands
+        return self.listen(timeout=8, phrase_time_limit=5)
     
-    def monitor_organization(self):
-        """Background thread for automatic organization"""
-        while True:
-            time.sleep(600)  # Check every 10 minutes
-            if self.is_activated:
-                self.auto_organize_tools()
+    def handle_utterance(self, text):
+        """Recognition result event; all state changes happen here, on the event loop"""
+        if not self.is_activated:
+            if text and self.is_activation_command(text):
+                self.is_activated = True
+                self.last_activity_time = time.time()
+                
+                # "Guido, give me the hammer" - dispatch the command straight away
+                command = self.split_activation_command(text)
+                if command:
+                    self.process_command(command)
+                else:
+                    self.start_task(self.say("I am activated sir! How can I assist you today?"))
+        elif text:
+            self.process_command(text)
+        else:
+            print("⏰ No command detected, continuing to listen...")
+    
+    def run(self):
+        """Main system loop"""
+        asyncio.run(self.run_async())
+    
+    async def run_async(self):
+        """Event loop: capture keeps going while handlers speak, and a new command can pre-empt them"""
+        self.loop = asyncio.get_running_loop()
+        self.speech_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech")
+        self.listen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="listen")
+        self.tasks = set()
+        self.current_task = None
+        
+        self.calibrate_microphone()
+        await self.say("Voice system ready. Say 'Guido wake up' to activate me.")
+        
+        # Timers only post events; the state they check is changed on the event loop alone
+        threading.Thread(target=self.run_timer, args=(30, self.check_inactivity), daemon=True).start()
+        threading.Thread(target=self.run_timer, args=(self.check_interval, self.auto_organize_tools),
+                         daemon=True).start()
+        
+        try:
+            while True:
+                try:
+                    if self.speaker is None:
+                        # Without echo cancellation Guido would hear itself, as before barge-in existed
+                        await self.wait_until_quiet()
+                    text = await self.loop.run_in_executor(self.listen_executor, self.listen_for_state)
+                    self.handle_utterance(text)
+                except (KeyboardInterrupt, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    print(f"Unexpected error: {e}")
+                    continue
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            self.preempt()
+            await self.say("Shutting down Guido system. Goodbye!")
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            self.listen_executor.shutdown(wait=False, cancel_futures=True)
+            self.recognize_executor.shutdown(wait=False, cancel_futures=True)
+            if self.speaker:
+                # Cut the current line short; its thread must be done with the output stream before it closes
+                self.speaker.stop()
+            self.speech_executor.shutdown(wait=self.speaker is not None, cancel_futures=True)
+            self.action_dispatcher.cancel_pending()
+            self.action_dispatcher.stop()
+            self.racing_recognizer.close()
+            if self.cloud_recognizer:
+                self.cloud_recognizer.close()
+            if self.utterance_log:
+                # Flush the utterances queued before shutdown
+                self.utterance_log.close()
+            if self.speaker:
+                self.speaker.close()
 
 # Test the system
 if __name__ == "__main__":
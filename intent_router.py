@@ -0,0 +1,168 @@
+# intent_router.py - Commit to a command as soon as streaming partials make it clear
+import json
+import os
+import sys
+import time
+import wave
+
+
+# Intents that are safe to act on before the speaker has finished, with exactly the
+# keywords test_speech.process_command matches them by, so an early commit never
+# lands on a word the handler ignores. A misheard "range" waits for the final
+# result, where near-miss correction can turn it into "wrench".
+# Activation needs two keywords, so it always waits for the full utterance.
+EARLY_INTENTS = {
+    "tool": ['hammer', 'wrench', 'spanner', 'screwdriver', 'bolt'],
+    "tire_change": ['tire', 'tyre', 'wheel'],
+    "oil_change": ['oil', 'engine'],
+    "deactivate": ['stop', 'sleep', 'deactivate', 'bye'],
+    "time": ['time'],
+}
+
+
+def configure_streaming(recognizer, max_alternatives=3):
+    """Ask Vosk for word confidences on partial and final results"""
+    recognizer.SetWords(True)
+    if hasattr(recognizer, "SetPartialWords"):
+        recognizer.SetPartialWords(True)
+    recognizer.SetMaxAlternatives(max_alternatives)
+
+
+def result_text(result):
+    """Get the best transcript from a Vosk result, with or without alternatives"""
+    if 'alternatives' in result:
+        alternatives = result['alternatives']
+        return alternatives[0].get('text', '') if alternatives else ''
+    return result.get('text', '')
+
+
+class IntentRouter:
+    def __init__(self, min_confidence=0.85, stable_partials=2):
+        self.min_confidence = min_confidence
+        self.stable_partials = stable_partials
+        self.reset()
+
+    def reset(self):
+        """Forget partial hypotheses from the previous utterance"""
+        self.last_intent = None
+        self.stable_count = 0
+        self.committed = None
+
+    def match_intent(self, text):
+        """Return the early intent mentioned in the text, or None if unclear"""
+        matches = set()
+        for intent, keywords in EARLY_INTENTS.items():
+            if any(keyword in text for keyword in keywords):
+                matches.add(intent)
+
+        # Two different intents in one partial is not unambiguous yet
+        if len(matches) == 1:
+            return matches.pop()
+        return None
+
+    def keyword_confidence(self, words, intent):
+        """Lowest confidence among the words that triggered the intent"""
+        tokens = {token for keyword in EARLY_INTENTS[intent] for token in keyword.split()}
+        confidences = [word.get('conf', 1.0) for word in words if word.get('word') in tokens]
+        return min(confidences) if confidences else 0.0
+
+    def feed_partial(self, partial):
+        """Feed a parsed PartialResult; returns the command text once it is safe to act on"""
+        if self.committed:
+            return None
+
+        text = partial.get('partial', '').lower()
+        intent = self.match_intent(text) if text else None
+
+        if intent is None:
+            self.last_intent = None
+            self.stable_count = 0
+            return None
+
+        # Without word-level results there is no confidence to check against
+        words = partial.get('partial_result')
+        confident = words is None or self.keyword_confidence(words, intent) >= self.min_confidence
+
+        if intent == self.last_intent and confident:
+            self.stable_count += 1
+        else:
+            self.stable_count = 1 if confident else 0
+        self.last_intent = intent
+
+        if self.stable_count >= self.stable_partials:
+            self.committed = text
+            return text
+        return None
+
+
+def replay_latency_report(data_dir="voice_dataset", model_path="vosk-model-small-en-us-0.15", chunk=4096,
+                          tail_s=1.0):
+    """Replay the dataset through Vosk and report how much earlier commands are committed
+
+    The baseline is when Vosk finalizes the same stream, which is what the
+    non-streaming path waits for. Clips are trimmed, so `tail_s` of silence follows each one
+    for Vosk's endpointer, as the room would after a live command.
+    """
+    from vosk import Model, KaldiRecognizer
+
+    model = Model(model_path)
+    router = IntentRouter()
+    savings = {}
+    total_clips = 0
+
+    for root, dirs, files in os.walk(data_dir):
+        for name in sorted(files):
+            if not name.endswith('.wav'):
+                continue
+
+            wf = wave.open(os.path.join(root, name), 'rb')
+            rate = wf.getframerate()
+            recognizer = KaldiRecognizer(model, rate)
+            configure_streaming(recognizer)
+            router.reset()
+
+            audio = wf.readframes(wf.getnframes()) + bytes(2 * int(rate * tail_s))
+            wf.close()
+
+            frames_read = 0
+            commit_time = None
+            final_time = None
+            for start in range(0, len(audio), 2 * chunk):
+                data = audio[start:start + 2 * chunk]
+                frames_read += len(data) // 2
+
+                if recognizer.AcceptWaveform(data):
+                    if result_text(json.loads(recognizer.Result())):
+                        final_time = frames_read / rate
+                        break
+                    router.reset()
+                elif commit_time is None and router.feed_partial(json.loads(recognizer.PartialResult())):
+                    commit_time = frames_read / rate
+
+            if final_time is None:
+                # No endpoint within the tail: the final result is forced at the end of the stream
+                final_time = frames_read / rate
+            total_clips += 1
+
+            if commit_time is not None:
+                phrase = os.path.basename(root)
+                savings.setdefault(phrase, []).append(final_time - commit_time)
+
+    print("\n=== EARLY INTENT LATENCY REPORT ===")
+    committed = 0
+    for phrase, saved in sorted(savings.items()):
+        committed += len(saved)
+        print(f"📁 {phrase}: {len(saved)} early commits, "
+              f"{sum(saved) / len(saved) * 1000:.0f} ms saved on average")
+
+    print(f"\n📊 {committed}/{total_clips} clips committed before Vosk's final result")
+    if committed:
+        all_saved = [s for saved in savings.values() for s in saved]
+        print(f"⏱️  Mean latency saved: {sum(all_saved) / len(all_saved) * 1000:.0f} ms")
+    return savings
+
+
+if __name__ == "__main__":
+    start = time.time()
+    replay_latency_report(*sys.argv[1:2])
+    print(f"Replay took {time.time() - start:.1f}s")
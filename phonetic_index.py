@@ -0,0 +1,443 @@
+# phonetic_index.py - Map misheard transcript words to the command word they sound like
+import argparse
+import itertools
+import json
+import os
+import re
+
+VOWELS = {"AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW"}
+
+# Sounds a recognizer confuses (voicing, place): half the cost of any other substitution
+NEAR = {frozenset(pair) for pair in [
+    ("P", "B"), ("T", "D"), ("K", "G"), ("F", "V"), ("S", "Z"), ("CH", "JH"), ("SH", "ZH"),
+    ("TH", "DH"), ("M", "N"), ("N", "NG"), ("CH", "SH"), ("JH", "ZH"), ("TH", "F"), ("TH", "S"),
+]}
+
+# Vowels that blur into each other; any vowel also blurs into an unstressed schwa (AH)
+NEAR_VOWELS = {frozenset(pair) for pair in [
+    ("IH", "IY"), ("EH", "AE"), ("AA", "AO"), ("UH", "UW"), ("AO", "OW"), ("EH", "IH"),
+]}
+
+# Soundex digit per consonant phoneme; vowels and semivowels carry no code
+SOUNDEX = {
+    "P": "1", "B": "1", "F": "1", "V": "1",
+    "K": "2", "G": "2", "S": "2", "Z": "2", "CH": "2", "JH": "2", "SH": "2", "ZH": "2",
+    "T": "3", "D": "3", "TH": "3", "DH": "3",
+    "L": "4", "M": "5", "N": "5", "NG": "5", "R": "6",
+}
+
+# Metaphone-style: one symbol per voiced/unvoiced pair
+VOICELESS = {"B": "P", "D": "T", "G": "K", "V": "F", "Z": "S", "JH": "CH", "ZH": "SH", "DH": "TH"}
+
+# Words that are not commands but hold commands together ("the wrench and the screwdriver")
+FUNCTION_WORDS = {
+    "a", "an", "and", "or", "of", "to", "for", "with", "in", "on", "at", "it", "is", "are", "be",
+    "i", "me", "my", "you", "your", "we", "can", "could", "would", "please", "now", "then", "that",
+    "this", "those", "these", "some", "one", "two", "also", "too", "just", "need", "want", "get",
+}
+
+# Everyday words that sound like a command word but are far likelier to be meant as said
+# ("what is the next step", "good morning", "put it on the bench"): never corrected
+COMMON_WORDS = set("""
+    about after again all almost already always am any anything around as ask away back bad bag bank bar
+    bat bed been before bell belt bench best bet better big bit bite black block blow blue board boat body
+    bold bone book boot both bottle bottom box boy break bring brown bus but buy by call came car card care
+    case cat catch cause chair change check chip cold come cool cop cost could cup cut day dead deal dear
+    deep did dime dip do does dog done door down drive driver drop dry during each early eat else end
+    enough even ever every eye face fact fall far fast feel felt few find fine first fish fit five fix
+    floor food foot four free french friend from front full fun game gave give go god goes going gone
+    good got great green guess guy had half hand hang happy hard has hat have he head hear heard heart
+    heat held hell her here hey hi high him his hit hold home hot hour house how hut idea if job keep
+    kept kid kind knew know last late later left leg less let life light like line list little live long
+    look lost lot loud love low made make man many may maybe mean meant meet men met might mind mine
+    miss money month more morning most move much must name near neck never new news next nice night no
+    none not nothing number off oh ok okay old once only open other our out over own page paper part
+    pass past pay pen people pick piece place plan play player point pot put quite rain ran rate
+    read ready real really red rest right ring road rock room round run said same sat saw say see seem
+    seen send set she ship shop short shot should show shut side sign since sit six slap slept slim slip
+    slot small so soft sold son soon sorry sound speak spent spot stand star start stay steam steep step
+    stick still stock stood stopped store story stuff such sure table take talk tap team tell ten test
+    than thank thanks the their them there they thing things think three through tie till tip today
+    together told tom tomorrow tonight took top town trench tried true try turn under until up upon us
+    use used very wait walk wall was watch water way week weekend well went were what when where which
+    while white who whole why will win window wish without woke word work world yeah year yes yet young
+    activity annual hail hollow hummer menial ranch slope stab stoop tame tim timer type wakey weak wick
+""".split())
+
+# Different words for the same tool, not near-misses
+ALIASES = {"spanner": "wrench", "tyre": "tire", "pliers": "plier", "screwdrivers": "screwdriver"}
+
+# Recognizer confusions seen in practice, taken even though the heard word is a real word
+MISHEARINGS = {"range": "wrench"}
+
+# Outcomes where Guido does nothing useful with a transcript, the only ones worth correcting
+UNROUTED = ("unknown", "ignored", "activation+unknown")
+
+LONG_VOWELS = {"a": ["EY"], "e": ["IY"], "i": ["AY"], "o": ["OW"], "u": ["UW"], "y": ["AY"]}
+SHORT_VOWELS = {"a": ["AE"], "e": ["EH"], "i": ["IH"], "o": ["AA"], "u": ["AH"], "y": ["IH"]}
+VOWEL_GROUPS = [
+    ("eau", ["OW"]), ("ee", ["IY"]), ("ea", ["IY"]), ("ai", ["EY"]), ("ay", ["EY"]), ("ei", ["EY"]),
+    ("ey", ["EY"]), ("oa", ["OW"]), ("oo", ["UW"]), ("ou", ["AW"]), ("ow", ["AW"]), ("oi", ["OY"]),
+    ("oy", ["OY"]), ("au", ["AO"]), ("aw", ["AO"]), ("ue", ["UW"]), ("ew", ["UW"]), ("ui", ["UW"]),
+    ("ie", ["IY"]), ("ar", ["AA", "R"]), ("or", ["AO", "R"]), ("er", ["ER"]), ("ir", ["ER"]), ("ur", ["ER"]),
+]
+CONSONANT_GROUPS = [
+    ("tch", ["CH"]), ("dge", ["JH"]), ("ch", ["CH"]), ("sh", ["SH"]), ("th", ["TH"]), ("ph", ["F"]),
+    ("ck", ["K"]), ("qu", ["K", "W"]), ("wh", ["W"]), ("ng", ["NG"]),
+]
+LETTERS = {
+    "b": ["B"], "d": ["D"], "f": ["F"], "h": ["HH"], "j": ["JH"], "k": ["K"], "l": ["L"], "m": ["M"],
+    "n": ["N"], "p": ["P"], "q": ["K"], "r": ["R"], "s": ["S"], "t": ["T"], "v": ["V"], "w": ["W"],
+    "x": ["K", "S"], "z": ["Z"],
+}
+HARD_G = {"give", "get", "gift", "gear", "girl", "geese", "begin", "forget"}
+
+
+def phonemes(word):
+    """Rough ARPAbet pronunciation of an English word from its spelling
+
+    Letter-to-sound rules only, with no dictionary, so it runs offline on any
+    word the recognizer produces. Misspellings of the same sound come out the
+    same, which is what near-miss matching needs.
+    """
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if len(word) > 4 and word.endswith("es") and word[-3] not in "aeiouschxz":
+        return phonemes(word[:-1]) + ("Z",)  # "tapes", "guides": the e stays silent, it is not a syllable
+    for prefix, replacement in (("wr", "r"), ("kn", "n"), ("gn", "n"), ("ps", "s")):
+        if word.startswith(prefix):
+            word = replacement + word[2:]
+    vowel_letters = "aeiouy"
+    # Final silent e, unless it is the only vowel ("the", "me")
+    silent_e = len(word) > 2 and word.endswith("e") and any(c in "aeiouy" for c in word[:-1])
+    body = word[:-1] if silent_e else word
+
+    phones = []
+    i = 0
+    while i < len(body):
+        rest = body[i:]
+        letter = body[i]
+        if i and letter == body[i - 1] and letter not in vowel_letters:
+            i += 1  # double consonants are one sound
+            continue
+
+        group = next(((g, p) for g, p in CONSONANT_GROUPS if rest.startswith(g)), None)
+        if group:
+            spelling, sounds = group
+            if spelling == "ng" and i + 2 < len(word) and word[i + 2] in "eiy":
+                sounds = ["N", "JH"]  # "range", "engine"
+            phones += sounds
+            i += len(spelling)
+            continue
+
+        if letter in vowel_letters:
+            if letter == "y" and (i == 0 or (i + 1 < len(body) and body[i + 1] in "aeiou")):
+                phones.append("Y")
+                i += 1
+                continue
+            if silent_e and i == len(body) - 2 and body[-1] not in vowel_letters:
+                phones += LONG_VOWELS[letter]  # magic e: "tape", "tire"
+                i += 1
+                continue
+            group = next(((g, p) for g, p in VOWEL_GROUPS if rest.startswith(g)), None)
+            if group and not (group[0] == "ie" and i + 2 == len(word)):
+                spelling, sounds = group
+                phones += sounds
+                i += len(spelling)
+                continue
+            if letter == "y" and i == len(body) - 1:
+                # "my" but "body"
+                phones += ["AY"] if not any(c in "aeiou" for c in body[:i]) else ["IY"]
+            elif letter == "a" and body[i + 1:i + 3] == "ng" and word[i + 3:i + 4] in ("e", "i"):
+                phones += ["EY"]  # "change", "range"
+            elif i == len(word) - 1 or (letter in "eo" and len(body) <= 2):
+                phones += LONG_VOWELS[letter] if letter != "a" else ["AH"]  # open final vowel: "go", "me"
+            else:
+                phones += SHORT_VOWELS[letter]
+            i += 1
+            continue
+
+        nxt = body[i + 1] if i + 1 < len(body) else (word[i + 1] if i + 1 < len(word) else "")
+        if letter == "c":
+            phones.append("S" if nxt in "eiy" and nxt else "K")
+        elif letter == "g":
+            if rest.startswith("gh"):
+                phones += ["G"] if i == 0 else []  # "light"
+                i += 2
+                continue
+            phones.append("JH" if nxt and nxt in "eiy" and word not in HARD_G else "G")
+        elif letter == "w" and not (nxt and nxt in vowel_letters):
+            pass  # part of a vowel ("tow") that the groups did not catch
+        else:
+            phones += LETTERS.get(letter, [])
+        i += 1
+    return tuple(phones)
+
+
+def soundex_key(phones):
+    """Soundex-style code of the consonant sounds, first sound included, repeats collapsed"""
+    codes = [SOUNDEX[p] for p in phones if p in SOUNDEX]
+    return "".join(code for code, _ in itertools.groupby(codes))
+
+
+def skeleton_key(phones):
+    """Metaphone-style consonant skeleton with voicing pairs merged"""
+    return tuple(VOICELESS.get(p, p) for p in phones if p not in VOWELS and p not in ("HH", "W", "Y"))
+
+
+def substitution_cost(a, b):
+    if a == b:
+        return 0.0
+    if a in VOWELS and b in VOWELS:
+        # A different stressed vowel makes a different word: "step" is not "stop"
+        return 0.3 if "AH" in (a, b) or frozenset((a, b)) in NEAR_VOWELS else 0.8
+    return 0.5 if frozenset((a, b)) in NEAR else 1.0
+
+
+def indel_cost(phone):
+    # Recognizers drop and add unstressed vowels more often than consonants
+    return 0.5 if phone in VOWELS else 1.0
+
+
+def phoneme_distance(a, b):
+    """Weighted edit distance between two phoneme sequences"""
+    previous = [0.0]
+    for phone in b:
+        previous.append(previous[-1] + indel_cost(phone))
+    for x in a:
+        current = [previous[0] + indel_cost(x)]
+        for j, y in enumerate(b):
+            current.append(min(previous[j + 1] + indel_cost(x), current[j] + indel_cost(y),
+                               previous[j] + substitution_cost(x, y)))
+        previous = current
+    return previous[-1]
+
+
+def deletions(phones, depth=2):
+    """Every sequence reachable by deleting up to `depth` phonemes"""
+    variants = {phones}
+    frontier = {phones}
+    for _ in range(depth):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+class PhoneticIndex:
+    """Precomputed sound keys of the command vocabulary for constant-time near-miss lookup
+
+    Only `words` are correction targets; `known` words and COMMON_WORDS are
+    taken as heard, so neither the rest of the vocabulary nor everyday speech
+    is ever turned into a command.
+    Candidates come from hash buckets keyed by Soundex code, consonant skeleton
+    and the two-deletion neighbourhood of the phoneme string (SymSpell), so a
+    lookup touches only the few words that sound alike however large the
+    vocabulary. Results are memoized per token.
+    """
+
+    def __init__(self, words, known=(), aliases=None, min_confidence=0.85, margin=0.02, key_bonus=0.02,
+                 cache_size=4096):
+        self.words = set(words)
+        self.known = self.words | set(known)
+        self.aliases = dict(ALIASES if aliases is None else aliases, **MISHEARINGS)
+        self.passthrough = (self.known | FUNCTION_WORDS | COMMON_WORDS) - set(self.aliases)
+        self.min_confidence = min_confidence
+        self.margin = margin
+        self.key_bonus = key_bonus
+        self.cache_size = cache_size
+        self.cache = {}
+
+        self.entries = {}
+        self.buckets = {}
+        for word in sorted(self.words):
+            phones = phonemes(word)
+            if len(phones) < 2:
+                continue
+            entry = (phones, soundex_key(phones), skeleton_key(phones))
+            self.entries[word] = entry
+            keys = {("soundex", entry[1]), ("skeleton", entry[2])}
+            keys |= {("deletion", variant) for variant in deletions(phones)}
+            for key in keys:
+                self.buckets.setdefault(key, set()).add(word)
+
+    @classmethod
+    def from_vocabulary(cls, tool_classes, activation_phrases, spoken_phrases, routes=None, **kwargs):
+        """Tool and activation words, plus the dataset words for which routes(word) is true"""
+        def words_of(phrases):
+            return {word for phrase in phrases for word in re.findall(r"[a-z']+", phrase.lower())}
+
+        spoken = words_of(spoken_phrases) - FUNCTION_WORDS
+        commands = words_of(tool_classes) | words_of(activation_phrases)
+        commands |= {word for word in spoken if routes is None or routes(word)}
+        return cls(commands - FUNCTION_WORDS, known=spoken, **kwargs)
+
+    def lookup(self, token):
+        """(command word, confidence) for a transcript token, or None if nothing is close enough"""
+        token = token.lower()
+        if token in self.aliases:
+            return self.aliases[token], 1.0
+        if token in self.passthrough:
+            return token, 1.0
+        if token in self.cache:
+            return self.cache[token]
+
+        result = None
+        phones = phonemes(token)
+        if len(phones) >= 3:
+            result = self.nearest(phones)
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[token] = result
+        return result
+
+    def nearest(self, phones):
+        soundex, skeleton = soundex_key(phones), skeleton_key(phones)
+        candidates = set()
+        for key in ({("soundex", soundex), ("skeleton", skeleton)}
+                    | {("deletion", variant) for variant in deletions(phones)}):
+            candidates |= self.buckets.get(key, set())
+
+        scored = []
+        for word in candidates:
+            target, target_soundex, target_skeleton = self.entries[word]
+            length = max(len(phones), len(target))
+            score = 1 - phoneme_distance(phones, target) / length
+            score += self.key_bonus * (soundex == target_soundex) + self.key_bonus * (skeleton == target_skeleton)
+            scored.append((score, word))
+        if not scored:
+            return None
+
+        scored.sort(reverse=True)
+        confidence, word = scored[0]
+        # Two command words that sound equally close: better to ask again than to guess
+        if len(scored) > 1 and confidence - scored[1][0] < self.margin:
+            return None
+        return (word, min(confidence, 0.99)) if confidence >= self.min_confidence else None
+
+    def correct(self, text):
+        """Transcript with near-miss words replaced; returns (text, [(heard, word, confidence)])
+
+        Punctuation and spacing are kept, and two unknown words in a row are also
+        tried as one ("screw driver").
+        """
+        # Words at odd positions, whatever separates them at even ones
+        pieces = re.split(r"([a-z']+)", text.lower())
+        corrections = []
+        for i in range(1, len(pieces), 2):
+            token = pieces[i]
+            if not token or token in FUNCTION_WORDS:
+                continue
+            # A split compound may be made of common words ("screw driver"), so it is tried first,
+            # but only a near-exact command word counts ("good day" is not "guide")
+            following = pieces[i + 2] if i + 2 < len(pieces) and pieces[i + 1] == " " else ""
+            if following and following not in FUNCTION_WORDS:
+                joined = self.lookup(token + following)
+                if joined and joined[0] in self.words and joined[1] >= 0.95:
+                    corrections.append((f"{token} {following}", joined[0], joined[1]))
+                    pieces[i], pieces[i + 1], pieces[i + 2] = joined[0], "", ""
+                    continue
+            if token in self.passthrough:
+                continue
+            match = self.lookup(token)
+            if match and match[0] != token:
+                corrections.append((token, match[0], match[1]))
+                pieces[i] = match[0]
+        return "".join(pieces), corrections
+
+
+def expected_route(guido, reference, active):
+    """What Guido does with a transcript: its intent plus the tools it would deliver"""
+    from action_dispatcher import parse_actions
+
+    intent = guido.utterance_intent(reference, active)
+    if intent in ("tool", "activation+tool"):
+        command = guido.split_activation_command(reference) if intent.startswith("activation") else reference
+        tools = tuple(action.target for action in parse_actions(command, guido.tool_classes)
+                      if action.kind == "deliver")
+        return intent, tools
+    return intent, ()
+
+
+def reprompts(route):
+    """Routes where Guido has to ask the user to say it again"""
+    intent, tools = route
+    return intent in UNROUTED or (intent.endswith("tool") and not tools)
+
+
+def reprompt_report(transcripts, guido):
+    """Replay (category, reference phrase, transcript) triples with and without the index"""
+    outcomes = {"avoided": [], "introduced": [], "still_reprompted": 0, "correct": 0, "wrong": 0, "skipped": 0}
+    for category, reference, transcript in transcripts:
+        active = category != "activation"
+        expected = expected_route(guido, reference.lower(), active)
+        if reprompts(expected):
+            outcomes["skipped"] += 1  # the phrase itself is not one Guido routes
+            continue
+
+        raw = expected_route(guido, transcript, active) if transcript else ("ignored", ())
+        corrected_text = guido.correct_transcript(transcript, active, quiet=True) if transcript else transcript
+        fixed = expected_route(guido, corrected_text, active) if transcript else raw
+
+        if raw != expected and fixed == expected:
+            outcomes["avoided"].append((transcript, corrected_text))
+        elif raw == expected and fixed != expected:
+            outcomes["introduced"].append((transcript, corrected_text))
+        if fixed == expected:
+            outcomes["correct"] += 1
+        elif reprompts(fixed):
+            outcomes["still_reprompted"] += 1
+        else:
+            outcomes["wrong"] += 1
+
+    routable = len(transcripts) - outcomes["skipped"]
+    print("\n=== PHONETIC INDEX REPORT ===")
+    print(f"📊 {routable} routable utterances ({outcomes['skipped']} phrases Guido does not route skipped)")
+    print(f"✅ Re-prompts avoided: {len(outcomes['avoided'])}")
+    for heard, corrected in outcomes["avoided"][:10]:
+        print(f"   '{heard}' -> '{corrected}'")
+    print(f"❌ Routes broken by a correction: {len(outcomes['introduced'])}")
+    for heard, corrected in outcomes["introduced"][:10]:
+        print(f"   '{heard}' -> '{corrected}'")
+    print(f"🔁 Still re-prompted: {outcomes['still_reprompted']}, misrouted: {outcomes['wrong']}, "
+          f"correct: {outcomes['correct']}/{routable}")
+    return outcomes
+
+
+def dataset_transcripts(data_dir="voice_dataset", model_path="vosk-model-small-en-us-0.15"):
+    """Transcribe every dataset clip with Vosk: (category, reference phrase, transcript)"""
+    import wave
+    from vosk import Model, KaldiRecognizer
+    from spoken_phrases import spoken_phrase
+
+    model = Model(model_path)
+    transcripts = []
+    for root, dirs, files in os.walk(data_dir):
+        for name in sorted(files):
+            if not name.endswith('.wav'):
+                continue
+            with wave.open(os.path.join(root, name), 'rb') as wf:
+                recognizer = KaldiRecognizer(model, wf.getframerate())
+                recognizer.AcceptWaveform(wf.readframes(wf.getnframes()))
+            text = json.loads(recognizer.FinalResult()).get('text', '')
+            category = os.path.basename(os.path.dirname(root))
+            transcripts.append((category, spoken_phrase(os.path.basename(root)), text))
+    return transcripts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-prompts the phonetic index avoids on replayed recordings")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--model", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--lookup", nargs="+", help="just show the match for these words")
+    args = parser.parse_args()
+
+    from guido_voice_system import GuidoVoiceSystem
+
+    # Only the vocabulary is needed, not the microphone or TTS
+    guido = GuidoVoiceSystem.__new__(GuidoVoiceSystem)
+    guido.setup_vocabulary()
+
+    if args.lookup:
+        for word in args.lookup:
+            print(f"{word:<16} {' '.join(phonemes(word)):<24} -> {guido.phonetic_index.lookup(word)}")
+    else:
+        reprompt_report(dataset_transcripts(args.data_dir, args.model), guido)
@@ -0,0 +1,101 @@
+# racing_recognizer.py - Send the same audio to several recognizers and keep the first confident answer
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import speech_recognition as sr
+
+
+def cloud_backend(client):
+    """Cloud backend over a CloudRecognizer's pooled connections and time budget, returns (text, confidence)"""
+    def recognize(audio):
+        return client.recognize(audio)
+    recognize.name = "google"
+    return recognize
+
+
+def vosk_backend(model, rate=16000):
+    """Local backend using Vosk, returns (text, confidence)"""
+    from vosk import KaldiRecognizer
+
+    def recognize(audio):
+        recognizer = KaldiRecognizer(model, rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=rate, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        text = result.get('text', '').lower()
+        if not text:
+            raise sr.UnknownValueError()
+        words = result.get('result', [])
+        confidence = sum(word['conf'] for word in words) / len(words) if words else 0.0
+        return text, confidence
+    recognize.name = "vosk"
+    return recognize
+
+
+class RacingRecognizer:
+    def __init__(self, backends, confidence_threshold=0.7, deadline=4.0, max_workers=None):
+        self.backends = list(backends)
+        if not self.backends:
+            raise ValueError("RacingRecognizer needs at least one backend")
+        self.confidence_threshold = confidence_threshold
+        self.deadline = deadline
+        # Spare workers so a straggler from the last request does not delay the next one
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or 2 * len(self.backends))
+
+    def recognize(self, audio, deadline=None, streamed=None):
+        """Return (text, confidence, backend_name) from the first confident backend
+
+        streamed maps a backend name to a callable that finishes a request already
+        uploaded during capture; it runs in place of that backend.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        end_time = time.monotonic() + deadline
+        streamed = streamed or {}
+
+        futures = {}
+        for backend in self.backends:
+            finish = streamed.get(getattr(backend, 'name', backend.__name__))
+            futures[self.executor.submit(finish) if finish else self.executor.submit(backend, audio)] = backend
+        pending = set(futures)
+        best = None
+        errors = []
+
+        try:
+            while pending:
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = futures[future]
+                    name = getattr(backend, 'name', backend.__name__)
+                    try:
+                        text, confidence = future.result()
+                    except sr.UnknownValueError:
+                        continue
+                    except Exception as e:
+                        errors.append(f"{name}: {e}")
+                        continue
+
+                    if confidence >= self.confidence_threshold:
+                        return text, confidence, name
+                    if best is None or confidence > best[1]:
+                        best = (text, confidence, name)
+        finally:
+            # Slower backends keep running in the pool but their results are ignored
+            for future in pending:
+                future.cancel()
+
+        if best:
+            return best
+        if pending:
+            errors.append(f"deadline of {deadline:.1f}s exceeded")
+        if errors:
+            raise sr.RequestError("; ".join(errors))
+        raise sr.UnknownValueError()
+
+    def close(self):
+        """Stop the worker pool without waiting for stragglers"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,167 @@
+# sample_trimmer.py - Cut recorded samples down to their speech, optionally to a fixed length
+import argparse
+import csv
+import os
+import re
+import wave
+
+import numpy as np
+
+from audio_utils import speech_bounds
+
+RATE = 16000
+MANIFEST = "trim_manifest.csv"
+FIELDS = ["file", "original_samples", "start", "end", "offset", "samples", "truncated", "gain"]
+SAMPLE_NUMBER = re.compile(r"_(\d+)\.wav$")
+
+
+def trim_audio(audio, rate=RATE, pad_ms=150, align_seconds=None):
+    """Trim int16 audio to its speech plus padding; returns (clip, info)
+
+    info["start"]/["end"] are the speech bounds in the original clip, info["offset"]
+    is where the returned clip starts in the original (negative when zero padding
+    was added in front), and info["truncated"] says speech ran into an edge of the
+    recording or had to be cut to fit `align_seconds`.
+    """
+    audio = np.asarray(audio, dtype=np.int16)
+    pad = int(rate * pad_ms / 1000)
+    bounds = speech_bounds(audio, rate)
+    if bounds is None:
+        start, end = 0, len(audio)
+    else:
+        start, end = bounds
+
+    # Speech right at an edge was probably cut off by the recording window
+    edge = int(rate * 0.02)
+    truncated = bounds is not None and (start < edge or end > len(audio) - edge)
+
+    clip_start, clip_end = max(0, start - pad), min(len(audio), end + pad)
+
+    if align_seconds:
+        length = int(rate * align_seconds)
+        if clip_end - clip_start > length:
+            # Keep the middle of the speech; the recording is longer than the training window
+            truncated = True
+            centre = (start + end) // 2
+            clip_start = min(max(0, centre - length // 2), len(audio) - length)
+            clip_end = clip_start + length
+            clip = audio[clip_start:clip_end]
+        else:
+            # Centre the speech in silence
+            clip = np.zeros(length, dtype=np.int16)
+            lead = (length - (clip_end - clip_start)) // 2
+            clip[lead:lead + clip_end - clip_start] = audio[clip_start:clip_end]
+            clip_start -= lead
+    else:
+        clip = audio[clip_start:clip_end]
+
+    info = {
+        "original_samples": len(audio),
+        "start": int(start),
+        "end": int(end),
+        "offset": int(clip_start),
+        "samples": len(clip),
+        "truncated": bool(truncated),
+    }
+    return clip, info
+
+
+def read_clip(path):
+    """Read a 16-bit mono WAV as (int16 samples, rate)"""
+    with wave.open(path, 'rb') as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16), wf.getframerate()
+
+
+def write_clip(path, audio, rate=RATE):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(memoryview(audio))
+
+
+def next_sample_number(folder):
+    """One past the highest <phrase>_NNN.wav number in `folder`, so gaps left by deleted takes are never reused"""
+    if not os.path.isdir(folder):
+        return 1
+    numbers = [int(match.group(1)) for match in map(SAMPLE_NUMBER.search, os.listdir(folder)) if match]
+    return max(numbers, default=0) + 1
+
+
+def load_manifest(data_dir):
+    """file -> row of the trim manifest, empty if no clip was trimmed yet"""
+    path = os.path.join(data_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='') as f:
+        return {row["file"]: row for row in csv.DictReader(f)}
+
+
+def save_manifest(data_dir, rows):
+    with open(os.path.join(data_dir, MANIFEST), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(sorted(rows.values(), key=lambda row: row["file"]))
+
+
+def record_trim(data_dir, path, info):
+    """Add one clip's original offsets to the manifest"""
+    rows = load_manifest(data_dir)
+    rows[os.path.relpath(path, data_dir)] = dict(info, file=os.path.relpath(path, data_dir))
+    save_manifest(data_dir, rows)
+
+
+def trim_dataset(data_dir="voice_dataset", pad_ms=150, align_seconds=None, dry_run=False):
+    """Batch pass: trim every clip not yet in the manifest, in place, and report the savings"""
+    rows = load_manifest(data_dir)
+    bytes_before = bytes_after = 0
+    trimmed = []
+
+    for root, dirs, files in os.walk(data_dir):
+        for name in sorted(files):
+            if not name.endswith('.wav'):
+                continue
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, data_dir)
+            if key in rows:
+                continue  # trimmed at record time or by an earlier pass
+
+            audio, rate = read_clip(path)
+            clip, info = trim_audio(audio, rate, pad_ms, align_seconds)
+            bytes_before += audio.nbytes
+            bytes_after += clip.nbytes
+            trimmed.append((key, info))
+            if not dry_run:
+                write_clip(path, clip, rate)
+                rows[key] = dict(info, file=key)
+
+    if not dry_run and trimmed:
+        save_manifest(data_dir, rows)
+
+    truncated = [key for key, info in trimmed if info["truncated"]]
+    print("\n=== TRIM REPORT ===")
+    if not trimmed:
+        print("✅ Nothing to trim - every clip is already in the manifest")
+        return trimmed
+    saved = bytes_before - bytes_after
+    print(f"✂️  {len(trimmed)} clips {'would be ' if dry_run else ''}trimmed")
+    print(f"💾 {bytes_before / 1e6:.1f} MB -> {bytes_after / 1e6:.1f} MB "
+          f"({saved / 1e6:.1f} MB, {saved / max(bytes_before, 1) * 100:.0f}% saved)")
+    print(f"⚠️  {len(truncated)} clips where speech was cut off:")
+    for key in truncated[:20]:
+        print(f"   {key}")
+    if len(truncated) > 20:
+        print(f"   ... and {len(truncated) - 20} more")
+    return trimmed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trim voice_dataset clips to their speech")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--pad-ms", type=int, default=150, help="silence kept around the speech")
+    parser.add_argument("--align-seconds", type=float, default=None,
+                        help="pad or cut every clip to this fixed length, speech centred")
+    parser.add_argument("--dry-run", action="store_true", help="report only, leave the files alone")
+    args = parser.parse_args()
+
+    trim_dataset(args.data_dir, args.pad_ms, args.align_seconds, args.dry_run)
@@ -0,0 +1,336 @@
+# shared_audio_pipeline.py - Capture, recognition and TTS in separate processes over shared memory
+import json
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from capture_monitor import CaptureMonitor
+
+RATE = 16000
+CHUNK = 1024
+
+# Header slots (int64) at the front of the shared block
+WRITE_POS, OVERFLOWS, CALLBACKS, RUNNING, UNDERFLOWS, GAPS, WRITE_CLAIM = range(7)
+HEADER_SLOTS = 8
+
+
+class SharedRingBuffer:
+    """Single-writer, multi-reader int16 ring buffer in shared memory"""
+
+    def __init__(self, capacity=RATE * 10, name=None):
+        header_bytes = HEADER_SLOTS * 8
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + capacity * 2)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            capacity = (self.shm.size - header_bytes) // 2
+
+        self.capacity = capacity
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((capacity,), dtype=np.int16, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, samples):
+        """Append samples; the write position is published only after the data is in place"""
+        pos = int(self.header[WRITE_POS])
+        # Claimed before the copy, so a reader can tell afterwards whether it was lapped
+        self.header[WRITE_CLAIM] = pos + len(samples)
+        start = pos % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        if first < len(samples):
+            self.data[:len(samples) - first] = samples[first:]
+        self.header[WRITE_POS] = pos + len(samples)
+
+    def read(self, read_pos, max_samples=None):
+        """Return (views, new_read_pos, lost) for samples after read_pos, without copying"""
+        write_pos = int(self.header[WRITE_POS])
+        lost = self.overwritten(read_pos)
+        if lost:
+            # The reader fell a whole buffer behind; skip to the oldest sample still held
+            read_pos += lost
+
+        available = write_pos - read_pos
+        if max_samples is not None:
+            available = min(available, max_samples)
+        if available <= 0:
+            return [], read_pos, lost
+
+        start = read_pos % self.capacity
+        first = min(available, self.capacity - start)
+        views = [self.data[start:start + first]]
+        if first < available:
+            views.append(self.data[:available - first])
+        return views, read_pos + available, lost
+
+    def overwritten(self, read_pos):
+        """Samples from read_pos on that the writer has overwritten or is overwriting right now"""
+        return max(0, int(self.header[WRITE_CLAIM]) - self.capacity - read_pos)
+
+    def copy(self, read_pos, max_samples=None):
+        """Like read(), but returns (bytes, new_read_pos, lost) with any samples torn during the copy dropped"""
+        views, end, lost = self.read(read_pos, max_samples)
+        data = b"".join(view.data for view in views)
+        # Views can be overwritten while they are copied; check the writer's claim again afterwards
+        torn = min(self.overwritten(end - len(data) // 2), len(data) // 2)
+        if torn:
+            data = data[2 * torn:]
+            lost += torn
+        return data, end, lost
+
+    def close(self):
+        # Drop numpy views before closing, or the buffer is still exported
+        del self.header, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_process(ring_name, control):
+    """Capture process: PortAudio callback copies each chunk straight into the ring"""
+    import pyaudio
+
+    ring = SharedRingBuffer(name=ring_name)
+    audio = pyaudio.PyAudio()
+    monitor = CaptureMonitor(None, RATE)
+
+    def callback(in_data, frame_count, time_info, status):
+        ring.write(np.frombuffer(in_data, dtype=np.int16))
+
+        # Some host APIs report no ADC time; fall back to arrival time
+        adc_time = time_info.get('input_buffer_adc_time') or time.monotonic()
+        monitor.record(frame_count, adc_time + frame_count / RATE,
+                       status_overflow=status & pyaudio.paInputOverflow,
+                       status_underflow=status & pyaudio.paInputUnderflow)
+        ring.header[CALLBACKS] = monitor.chunks
+        ring.header[OVERFLOWS] = monitor.overflows
+        ring.header[UNDERFLOWS] = monitor.underflows
+        ring.header[GAPS] = monitor.gaps
+        return None, pyaudio.paContinue
+
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=RATE, input=True,
+                        frames_per_buffer=CHUNK, stream_callback=callback)
+    ring.header[RUNNING] = 1
+    stream.start_stream()
+
+    # Nothing else runs in this process, so the callback never waits on a busy interpreter
+    control.get()
+
+    stream.stop_stream()
+    stream.close()
+    audio.terminate()
+    ring.header[RUNNING] = 0
+    ring.close()
+
+
+def recognition_process(ring_name, model_path, results, control):
+    """Recognition process: feeds the ring into Vosk and posts transcripts"""
+    from vosk import Model, KaldiRecognizer
+
+    ring = SharedRingBuffer(name=ring_name)
+    recognizer = KaldiRecognizer(Model(model_path), RATE)
+    read_pos = int(ring.header[WRITE_POS])
+
+    while True:
+        try:
+            if control.get_nowait() == "stop":
+                break
+        except queue.Empty:
+            pass
+
+        # Vosk's C API only takes bytes, so this is the one copy on the read side
+        data, read_pos, lost = ring.copy(read_pos)
+        if lost:
+            results.put(("lost", lost, time.time()))
+        if not data:
+            time.sleep(CHUNK / RATE / 4)
+            continue
+
+        if recognizer.AcceptWaveform(data):
+            text = json.loads(recognizer.Result()).get('text', '')
+            if text:
+                results.put(("text", text, time.time()))
+
+    ring.close()
+
+
+def tts_process(requests, results):
+    """TTS process: pyttsx3 blocks here instead of in the capture or recognition process"""
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    engine.setProperty('rate', 150)
+    while True:
+        text = requests.get()
+        if text is None:
+            break
+        engine.say(text)
+        engine.runAndWait()
+        results.put(("spoken", text, time.time()))
+
+
+class RingInputStream:
+    """Blocking PyAudio-style input stream reading the ring from another process, for CaptureMonitor"""
+
+    def __init__(self, ring, timeout=5.0):
+        self.ring = ring
+        self.timeout = timeout
+        self.read_pos = int(ring.header[WRITE_POS])  # only audio captured from now on
+        self.pending = bytearray()
+        self.lost = 0
+
+    def read(self, frames, exception_on_overflow=False):
+        """Next `frames` samples as bytes, waiting for the capture process to write them"""
+        needed = 2 * frames
+        waiting_since = time.monotonic()
+        while len(self.pending) < needed:
+            data, self.read_pos, lost = self.ring.copy(self.read_pos, (needed - len(self.pending)) // 2)
+            self.lost += lost
+            if data:
+                self.pending += data
+                waiting_since = time.monotonic()
+            elif time.monotonic() - waiting_since > self.timeout:
+                raise OSError("no audio from the capture process")
+            else:
+                time.sleep(CHUNK / RATE / 4)
+        data = bytes(self.pending[:needed])
+        del self.pending[:needed]
+        return data
+
+    def get_read_available(self):
+        return int(self.ring.header[WRITE_POS]) - self.read_pos + len(self.pending) // 2
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AudioPipeline:
+    def __init__(self, model_path="vosk-model-small-en-us-0.15", buffer_seconds=10):
+        self.model_path = model_path
+        self.ring = SharedRingBuffer(RATE * buffer_seconds)
+        self.results = mp.Queue()
+        self.tts_requests = mp.Queue()
+        self.capture_control = mp.Queue()
+        self.recognition_control = mp.Queue()
+        self.processes = []
+        self.recognizer_lost = 0
+
+    def start(self, recognition=True, tts=True):
+        """Start the capture process, and the recognition and TTS processes unless done in-process"""
+        self.processes = [
+            mp.Process(target=capture_process, args=(self.ring.name, self.capture_control), daemon=True),
+        ]
+        if recognition:
+            self.processes.append(mp.Process(
+                target=recognition_process,
+                args=(self.ring.name, self.model_path, self.results, self.recognition_control), daemon=True))
+        if tts:
+            self.processes.append(mp.Process(target=tts_process, args=(self.tts_requests, self.results), daemon=True))
+        for process in self.processes:
+            process.start()
+
+    def open_stream(self):
+        """Input stream over the ring for in-process readers, starting at the newest sample"""
+        return RingInputStream(self.ring)
+
+    def speak(self, text):
+        """Queue text for the TTS process; returns immediately"""
+        self.tts_requests.put(text)
+
+    def get_result(self, timeout=None):
+        """Next ("text" | "spoken" | "lost", value, timestamp) event from the workers"""
+        try:
+            event = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event[0] == "lost":
+            self.recognizer_lost += event[1]
+        return event
+
+    def stats(self):
+        """Capture counters straight from the shared header"""
+        return {
+            "samples_captured": int(self.ring.header[WRITE_POS]),
+            "callbacks": int(self.ring.header[CALLBACKS]),
+            "input_overflows": int(self.ring.header[OVERFLOWS]),
+            "input_underflows": int(self.ring.header[UNDERFLOWS]),
+            "timestamp_gaps": int(self.ring.header[GAPS]),
+            "recognizer_samples_lost": self.recognizer_lost,
+        }
+
+    def measure_drops_while_speaking(self, lines):
+        """Read lines aloud and report capture overflows that happened meanwhile"""
+        before = self.stats()
+        for line in lines:
+            self.speak(line)
+
+        pending = len(lines)
+        while pending:
+            event = self.get_result(timeout=60)
+            if event is None:
+                break
+            if event[0] == "spoken":
+                pending -= 1
+            elif event[0] == "text":
+                print(f"👤 Heard while speaking: {event[1]}")
+
+        after = self.stats()
+        return {
+            "input_overflows": after["input_overflows"] - before["input_overflows"],
+            "timestamp_gaps": after["timestamp_gaps"] - before["timestamp_gaps"],
+            "recognizer_samples_lost": after["recognizer_samples_lost"] - before["recognizer_samples_lost"],
+            "callbacks": after["callbacks"] - before["callbacks"],
+            "seconds_captured": (after["samples_captured"] - before["samples_captured"]) / RATE,
+        }
+
+    def stop(self):
+        """Stop all workers and release the shared buffer"""
+        self.capture_control.put("stop")
+        self.recognition_control.put("stop")
+        self.tts_requests.put(None)
+
+        deadline = time.time() + 5
+        while any(p.is_alive() for p in self.processes) and time.time() < deadline:
+            # Drain results so the recognition process can flush its queue and exit
+            self.get_result(timeout=0.1)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
+
+
+if __name__ == "__main__":
+    from test_speech import GuidoFixedAssistant
+
+    steps = GuidoFixedAssistant.__new__(GuidoFixedAssistant)
+    steps.setup_procedures()
+    procedure = steps.procedures["tire_change"]["steps"]
+
+    pipeline = AudioPipeline()
+    pipeline.start()
+    try:
+        time.sleep(1)
+        print("🔊 Reading the tire change procedure while capturing...")
+        report = pipeline.measure_drops_while_speaking(procedure)
+        print("\n=== FRAME DROP REPORT ===")
+        print(f"⏱️  {report['seconds_captured']:.1f}s captured in {report['callbacks']} callbacks")
+        print(f"📉 Input overflows during speech: {report['input_overflows']}")
+        print(f"📉 Timestamp gaps during speech: {report['timestamp_gaps']}")
+        print(f"📉 Samples the recognizer fell behind on: {report['recognizer_samples_lost']}")
+        print(f"📊 {pipeline.stats()}")
+    finally:
+        pipeline.stop()
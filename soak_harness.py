@@ -0,0 +1,364 @@
+# soak_harness.py - Run GuidoVoiceSystem for simulated hours without a mic, speakers or network
+import argparse
+import collections
+import contextlib
+import os
+import random
+import threading
+import time
+import tracemalloc
+import types
+import wave
+from unittest import mock
+
+import numpy as np
+import speech_recognition as sr
+
+import guido_voice_system
+from racing_recognizer import RacingRecognizer, vosk_backend
+from action_dispatcher import SimulatedArm
+
+RATE = 16000
+
+
+class VirtualClock:
+    """Simulated time shared by the main loop and the background threads"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.condition = threading.Condition()
+        self.sleepers = {}  # thread id -> virtual wake time
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        """Block the calling thread until the simulation reaches its wake time"""
+        ident = threading.get_ident()
+        with self.condition:
+            self.sleepers[ident] = self.now + seconds
+            self.condition.notify_all()
+            while self.now < self.sleepers[ident]:
+                self.condition.wait()
+            del self.sleepers[ident]
+            self.condition.notify_all()
+
+    def advance(self, seconds):
+        """Move time forward, letting each due background thread finish its work in order"""
+        with self.condition:
+            target = self.now + seconds
+            while True:
+                due = [wake for wake in self.sleepers.values() if wake <= target]
+                if not due:
+                    break
+                self.now = max(self.now, min(due))
+                self.condition.notify_all()
+                # Wait until every woken thread is asleep again (or has exited)
+                self.condition.wait_for(
+                    lambda: all(wake > self.now for wake in self.sleepers.values()), timeout=5
+                )
+            self.now = target
+
+    def elapse(self, seconds):
+        """Move time forward from a background thread without driving other sleepers"""
+        with self.condition:
+            self.now += seconds
+
+    def wait_for_sleepers(self, count):
+        """Wait until the background threads have reached their first sleep"""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.sleepers) >= count, timeout=5)
+
+
+class FakeTTS:
+    """pyttsx3 stand-in that records what was said and how long it would take"""
+
+    def __init__(self, clock, harness, words_per_second=2.5):
+        self.clock = clock
+        self.harness = harness
+        self.words_per_second = words_per_second
+        self.queue = []
+        self.lines_spoken = 0
+        self.spoken = collections.deque(maxlen=50)  # recent lines only, so the log does not grow
+
+    def getProperty(self, name):
+        return []
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, text):
+        self.harness.record_response()
+        self.queue.append(text)
+
+    def runAndWait(self):
+        for text in self.queue:
+            self.spoken.append((self.clock.time(), text))
+            self.lines_spoken += 1
+            duration = len(text.split()) / self.words_per_second
+            if threading.current_thread() is threading.main_thread():
+                self.clock.advance(duration)
+            else:
+                self.clock.elapse(duration)
+        self.queue = []
+
+
+class ScriptedRecognizer(sr.Recognizer):
+    """Recognizer whose listen() replays a script of utterances and silences"""
+
+    def __init__(self, clock, harness):
+        super().__init__()
+        self.clock = clock
+        self.harness = harness
+
+    def adjust_for_ambient_noise(self, source, duration=1):
+        self.clock.advance(duration)
+
+    def listen(self, source, timeout=None, phrase_time_limit=None, **kwargs):
+        return self.harness.next_utterance(timeout, phrase_time_limit)
+
+
+class NullMicrophone:
+    """Context manager standing in for sr.Microphone"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def load_wav(path):
+    """Read a 16-bit WAV as mono int16"""
+    with wave.open(path, 'rb') as wf:
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        channels = wf.getnchannels()
+    return audio.reshape(-1, channels)[:, 0] if channels > 1 else audio
+
+
+def build_shift_script(data_dir="voice_dataset", hours=8.0, seed=0):
+    """Build a random but realistic shift: (gap_seconds, transcript, audio) entries"""
+    rng = random.Random(seed)
+    phrases = {
+        "wake": ("activation", ["guido_wake_up", "hey_guido", "hello_guido"], "guido wake up"),
+        "tool": ("tool_delivery", ["give_me_hammer", "give_me_wrench", "give_me_screwdriver"], None),
+        "guide": ("manual_reading", ["help_me", "guide_me", "how_to_change_tire"], None),
+        "sleep": ("system", ["deactivate", "go_to_sleep"], None),
+        "time": ("system", ["what_time_is_it"], None),
+    }
+    kinds = ["tool"] * 6 + ["guide"] * 2 + ["time"]
+
+    def utterance(kind):
+        category, folders, _ = phrases[kind]
+        folder = rng.choice(folders)
+        text = folder.replace('_', ' ').replace('give me ', 'give me the ')
+        folder_path = os.path.join(data_dir, category, folder)
+        wavs = [f for f in os.listdir(folder_path) if f.endswith('.wav')] if os.path.isdir(folder_path) else []
+        audio = load_wav(os.path.join(folder_path, rng.choice(wavs))) if wavs else None
+        return text, audio
+
+    script = []
+    elapsed = 0.0
+    while elapsed < hours * 3600:
+        # Long idle stretches exercise the 15 minute inactivity timeout
+        entries = [(rng.choice([5, 20, 60, 300, 1200]), "wake")]
+        entries += [(rng.uniform(2, 40), rng.choice(kinds)) for _ in range(rng.randint(1, 5))]
+        if rng.random() < 0.6:
+            entries.append((rng.uniform(2, 20), "sleep"))
+
+        for gap, kind in entries:
+            script.append((gap,) + utterance(kind))
+            elapsed += gap + 10  # rough allowance for the utterance and the reply
+    return script
+
+
+class SoakHarness:
+    def __init__(self, script, use_vosk=False, noise_level=300, seed=0):
+        self.script = list(script)
+        self.position = 0
+        self.pending_gap = None
+        self.noise_level = noise_level
+        self.rng = np.random.default_rng(seed)
+        self.clock = VirtualClock()
+
+        self.labels = {}            # id(AudioData) -> transcript for the fake recognizer
+        self.utterance_wall = None  # wall-clock time the last utterance was delivered
+        self.latencies = []
+        self.violations = []
+        self.hourly = []
+        self.expected_active = False
+        self.expected_last_activity = 0.0
+
+        # Plain namespace rather than a Mock, which would record every call and skew memory
+        fake_time = types.SimpleNamespace(time=self.clock.time, sleep=self.clock.sleep)
+        self.tts = FakeTTS(self.clock, self)
+
+        with mock.patch.object(guido_voice_system, "time", fake_time), \
+                mock.patch.object(guido_voice_system.sr, "Microphone", NullMicrophone), \
+                mock.patch.object(guido_voice_system.GuidoVoiceSystem, "create_cloud_recognizer",
+                                  lambda system: None), \
+                mock.patch.object(guido_voice_system.GuidoVoiceSystem, "create_racing_recognizer",
+                                  lambda system: None), \
+                mock.patch.object(guido_voice_system.GuidoVoiceSystem, "create_utterance_log",
+                                  lambda system: None), \
+                mock.patch.object(guido_voice_system.GuidoVoiceSystem, "create_microphone",
+                                  lambda system: NullMicrophone()):
+            self.guido = guido_voice_system.GuidoVoiceSystem()
+        self.fake_time = fake_time
+
+        self.guido.recognizer = ScriptedRecognizer(self.clock, self)
+        self.guido.wake_detector = None  # the scripted source replaces listen(), not the raw stream
+        self.guido.action_dispatcher.executor = SimulatedArm(delivery_seconds=0, organize_seconds=0)
+        if use_vosk:
+            from vosk import Model
+            backend = vosk_backend(Model(self.guido.vosk_model_path))
+        else:
+            backend = self.transcribe
+        self.guido.racing_recognizer = RacingRecognizer([backend], confidence_threshold=0.0)
+
+    def transcribe(self, audio):
+        """Fake recognizer: return the transcript the script attached to this audio"""
+        return self.labels.pop(id(audio)), 1.0
+
+    def record_response(self):
+        """Called on every TTS call; the first one after an utterance is its response latency"""
+        if self.utterance_wall is not None:
+            self.latencies.append(time.perf_counter() - self.utterance_wall)
+            self.utterance_wall = None
+
+    def check_state(self):
+        """Compare the system state with the expected state machine"""
+        now = self.clock.time()
+        timeout = self.guido.activation_timeout
+
+        if self.expected_active and now - self.expected_last_activity > timeout:
+            # The inactivity thread only checks every 30 s
+            if now - self.expected_last_activity <= timeout + 30:
+                return
+            self.expected_active = False
+
+        if self.guido.is_activated != self.expected_active:
+            self.violations.append(
+                f"t={now / 3600:.2f}h after entry {self.position}: "
+                f"expected activated={self.expected_active}, got {self.guido.is_activated}"
+            )
+            self.expected_active = self.guido.is_activated
+
+    def update_expectations(self, text):
+        """Track what the state machine should do with a transcript"""
+        if not self.expected_active:
+            if self.guido.is_activation_command(text):
+                self.expected_active = True
+                self.expected_last_activity = self.clock.time()
+                command = self.guido.split_activation_command(text)
+                if command and any(word in command for word in ['deactivate', 'sleep', 'stop']):
+                    self.expected_active = False
+        else:
+            self.expected_last_activity = self.clock.time()
+            if not any(tool in text for tool in self.guido.tool_classes) and \
+                    not any(word in text for word in ['guide', 'help', 'manual']) and \
+                    any(word in text for word in ['deactivate', 'sleep', 'stop']):
+                self.expected_active = False
+
+    def make_audio(self, audio, seconds):
+        """Utterance audio (or synthetic speech-length noise) with shop noise mixed in"""
+        if audio is None:
+            audio = np.zeros(int(seconds * RATE), dtype=np.int16)
+        noise = self.rng.normal(0, self.noise_level, len(audio))
+        mixed = np.clip(audio.astype(np.float32) + noise, -32768, 32767).astype(np.int16)
+        return sr.AudioData(mixed.tobytes(), RATE, 2)
+
+    def next_utterance(self, timeout, phrase_time_limit):
+        """Replay the next script entry as if it came from the microphone"""
+        self.check_state()
+        self.sample_hourly()
+
+        if self.position >= len(self.script):
+            raise KeyboardInterrupt
+        if self.position == 0 and self.pending_gap is None:
+            self.clock.wait_for_sleepers(2)
+
+        gap, text, audio = self.script[self.position]
+        if self.pending_gap is None:
+            self.pending_gap = gap
+
+        # Silence longer than the listen timeout ends in WaitTimeoutError, like a real mic
+        if timeout and self.pending_gap > timeout:
+            self.clock.advance(timeout)
+            self.pending_gap -= timeout
+            raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+        seconds = len(audio) / RATE if audio is not None else 0.4 * len(text.split()) + 0.3
+        self.clock.advance(self.pending_gap + seconds)
+        self.pending_gap = None
+        self.position += 1
+
+        self.update_expectations(text)
+        data = self.make_audio(audio, seconds)
+        self.labels[id(data)] = text
+        self.utterance_wall = time.perf_counter()
+        return data
+
+    def sample_hourly(self):
+        """Record memory and thread count once per simulated hour"""
+        hour = int(self.clock.time() // 3600)
+        if len(self.hourly) <= hour:
+            current, peak = tracemalloc.get_traced_memory()
+            self.hourly.append((hour, current, threading.active_count()))
+
+    def run(self):
+        """Drive the real run() loop until the script is exhausted, then report"""
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        # TTS is created on the speech thread once the loop runs
+        with mock.patch.object(guido_voice_system, "time", self.fake_time), \
+                mock.patch.object(guido_voice_system.pyttsx3, "init", lambda: self.tts), \
+                mock.patch.object(guido_voice_system.GuidoVoiceSystem, "create_speaker", lambda system: None), \
+                open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            self.guido.run()
+
+        wall = time.perf_counter() - start
+        simulated = self.clock.time()
+        tracemalloc.stop()
+        self.report(simulated, wall)
+        return not self.violations
+
+    def report(self, simulated, wall):
+        print("\n=== SOAK REPORT ===")
+        print(f"⏱️  {simulated / 3600:.1f} simulated hours in {wall:.1f}s "
+              f"({simulated / max(wall, 1e-6):.0f}x real time)")
+        print(f"🗣️  {self.position} utterances, {self.tts.lines_spoken} TTS lines")
+
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            print(f"⚡ Response latency: median {np.median(latencies):.2f} ms, "
+                  f"p99 {np.percentile(latencies, 99):.2f} ms, max {latencies.max():.2f} ms")
+
+        if self.hourly:
+            first, last = self.hourly[0], self.hourly[-1]
+            print(f"🧠 Traced memory: {first[1] / 1024:.0f} KiB -> {last[1] / 1024:.0f} KiB "
+                  f"over {last[0]} h ({(last[1] - first[1]) / max(last[0], 1) / 1024:.1f} KiB/h)")
+            print(f"🧵 Threads: {first[2]} -> {last[2]} (max {max(h[2] for h in self.hourly)})")
+
+        if self.violations:
+            print(f"❌ {len(self.violations)} state machine violations:")
+            for violation in self.violations[:10]:
+                print(f"   {violation}")
+        else:
+            print("✅ State machine matched expectations for the whole session")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless soak test of the Guido main loop")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--vosk", action="store_true", help="recognize with the real Vosk model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    harness = SoakHarness(build_shift_script(args.data_dir, args.hours, args.seed), args.vosk, seed=args.seed)
+    raise SystemExit(0 if harness.run() else 1)
@@ -0,0 +1,52 @@
+# spoken_phrases.py - What is said in each voice_dataset folder, shared by the collector and the recognizers
+
+# Folder name -> phrase the speaker is asked to say
+SPOKEN_PHRASES = {
+    # Activation
+    "guido_wake_up": "Guido wake up",
+    "guido_activate": "Guido activate",
+    "hey_guido": "Hey Guido",
+    "wake_up_guido": "Wake up Guido",
+    "hello_guido": "Hello Guido",
+    
+    # Tool Delivery
+    "give_me_bolt": "Give me the bolt",
+    "give_me_hammer": "Give me the hammer",
+    "give_me_measuring_tape": "Give me the measuring tape",
+    "give_me_plier": "Give me the plier",
+    "give_me_screwdriver": "Give me the screwdriver",
+    "give_me_wrench": "Give me the wrench",
+    
+    # Enhanced Manual Reading
+    "read_manual": "Read the manual",
+    "guide_me": "Guide me",
+    "help_me": "Help me",
+    "show_procedure": "Show the procedure",
+    "how_to_change_tire": "How to change a tire",
+    "how_to_replace_tire": "How to replace a tire",
+    "tire_change_guide": "Tire change guide",
+    "change_car_tire": "Change car tire",
+    "how_to_change_engine_oil": "How to change engine oil",
+    "engine_oil_change": "Engine oil change",
+    "oil_change_guide": "Oil change guide",
+    "change_oil": "Change oil",
+    "car_maintenance": "Car maintenance",
+    "repair_instructions": "Repair instructions",
+    
+    # Rearrangement
+    "arrange_tools": "Arrange the tools",
+    "organize_tools": "Organize the tools",
+    "clean_up": "Clean up",
+    "put_in_order": "Put tools in order",
+    
+    # System
+    "deactivate": "Deactivate",
+    "go_to_sleep": "Go to sleep",
+    "stop": "Stop",
+    "what_time_is_it": "What time is it"
+}
+
+
+def spoken_phrase(phrase):
+    """Convert a folder name to the phrase spoken in its samples"""
+    return SPOKEN_PHRASES.get(phrase, phrase.replace('_', ' '))
@@ -1,18 +1,37 @@
 # guido_fixed.py - Improved version with better speech detection
-import pyaudio
 import json
 import os
 import time
 import wave
+import numpy as np
 from vosk import Model, KaldiRecognizer
+from intent_router import EARLY_INTENTS, IntentRouter, configure_streaming, result_text
+from capture_monitor import CaptureMonitor, AdaptiveChunkSizer
+from audio_utils import peak_level
+from phonetic_index import PhoneticIndex
+from spoken_phrases import SPOKEN_PHRASES
+from shared_audio_pipeline import AudioPipeline
 
 class GuidoFixedAssistant:
     def __init__(self):
         self.model_path = "vosk-model-small-en-us-0.15"
         self.rate = 16000
+        self.chunk = 1024  # stream period; read sizes are chosen by the chunk sizer
+        self.chunk_sizer = AdaptiveChunkSizer(start=1024, rate=self.rate)
+        self.capture_metrics = {}
         self.model = None
         self.recognizer = None
-        self.audio = None
+        self.pipeline = None
+        self.intent_router = IntentRouter()
+        
+        # Misheard command words ("range" for "wrench") are corrected before matching
+        # Every keyword process_command acts on, besides activation
+        self.command_keywords = ['tool'] + [word for words in EARLY_INTENTS.values() for word in words]
+        self.phonetic_index = PhoneticIndex.from_vocabulary(
+            ['hammer', 'wrench', 'screwdriver', 'bolt', 'plier', 'measuring tape'],
+            ['guido wake up', 'hey guido', 'hello guido', 'start'], SPOKEN_PHRASES.values(),
+            routes=lambda word: word in self.command_keywords
+        )
         
         self.setup_vosk()
         self.setup_procedures()
@@ -27,7 +46,10 @@ class GuidoFixedAssistant:
         try:
             self.model = Model(self.model_path)
             self.recognizer = KaldiRecognizer(self.model, self.rate)
-            self.audio = pyaudio.PyAudio()
+            configure_streaming(self.recognizer)
+            # Capture runs in its own process, so decoding here can never make the input overflow
+            self.pipeline = AudioPipeline(self.model_path)
+            self.pipeline.start(recognition=False, tts=False)
             print("✅ Vosk initialized successfully!")
             return True
         except Exception as e:
@@ -74,30 +96,34 @@ class GuidoFixedAssistant:
         if not self.recognizer:
             return None
         
-        stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=4096
-        )
+        stream = self.pipeline.open_stream()
+        
+        n_samples = int(self.rate * duration)
+        filled = 0
+        monitor = CaptureMonitor(stream, self.rate, buffer_frames=self.pipeline.ring.capacity)
         
         print(f"🎤 Listening for {duration} seconds...")
         print("💡 SPEAK NOW! Say: 'Guido wake up'")
         print("📊 Audio level: [", end="")
         
         speech_detected = False
-        frames = []
+        self.intent_router.reset()
         
         # Listen for the specified duration
-        for i in range(int(self.rate / 4096 * duration)):
+        while filled < n_samples:
             try:
-                data = stream.read(4096, exception_on_overflow=False)
-                frames.append(data)
+                # Smallest read size that has stayed overflow-free under the current load
+                chunk = min(self.chunk_sizer.chunk, n_samples - filled)
+                data = monitor.read(chunk)
+                self.chunk_sizer.update(monitor)
+                self.capture_metrics = monitor.metrics()
+                
+                # Only the level meter looks at the samples, so a view of the bytes is enough
+                chunk_audio = np.frombuffer(data, dtype=np.int16)
+                filled += chunk
                 
                 # Simple audio level indicator
-                audio_level = max(abs(int.from_bytes(data[i:i+2], 'little', signed=True)) 
-                                for i in range(0, min(len(data), 100), 2))
+                audio_level = peak_level(chunk_audio)
                 
                 # Visual feedback
                 if audio_level > 1000:
@@ -109,22 +135,35 @@ class GuidoFixedAssistant:
                 # Check for speech recognition
                 if self.recognizer.AcceptWaveform(data):
                     result = json.loads(self.recognizer.Result())
-                    text = result.get('text', '').lower()
+                    text = result_text(result).lower()
                     if text:
                         stream.stop_stream()
                         stream.close()
                         print("] ✅ Speech detected!")
                         return text
+                else:
+                    # Act on unambiguous commands without waiting for the speaker to stop
+                    partial = json.loads(self.recognizer.PartialResult())
+                    text = self.intent_router.feed_partial(partial)
+                    if text:
+                        stream.stop_stream()
+                        stream.close()
+                        self.recognizer.Reset()
+                        print("] ⚡ Command recognized early!")
+                        return text
                         
             except OSError as e:
                 print(f"\n❌ Audio error: {e}")
                 break
         
         print("]")  # End the progress bar
+        if self.capture_metrics.get("overflows") or self.capture_metrics.get("gaps"):
+            print(f"⚠️  Dropped audio: {self.capture_metrics['overflows']} overflows, "
+                  f"{self.capture_metrics['gap_seconds']:.2f}s of gaps")
         
         # Check final result
         result = json.loads(self.recognizer.FinalResult())
-        text = result.get('text', '').lower()
+        text = result_text(result).lower()
         
         stream.stop_stream()
         stream.close()
@@ -147,20 +186,27 @@ class GuidoFixedAssistant:
         if not command:
             return True
         
+        # Only a command nothing below would act on is worth correcting
+        activation_keywords = ['guido', 'wake', 'up', 'hello', 'hey', 'start']
+        if (not any(keyword in command for keyword in self.command_keywords)
+                and sum(keyword in command for keyword in activation_keywords) < 2):
+            command, corrections = self.phonetic_index.correct(command)
+            for heard, word, confidence in corrections:
+                print(f"🔤 Heard '{heard}' as '{word}' ({confidence:.2f})")
         print(f"🔍 Command: '{command}'")
         
         # More flexible activation phrases
-        activation_keywords = ['guido', 'wake', 'up', 'hello', 'hey', 'start']
         if sum(keyword in command for keyword in activation_keywords) >= 2:
             self.speak("Hello! I'm Guido, your car maintenance assistant!")
             self.speak("I can help with tire changes, oil changes, or tool delivery.")
             return True
         
         # Tool commands
-        if any(word in command for word in ['tool', 'hammer', 'wrench', 'screwdriver', 'bolt']):
+        # The same keywords the intent router commits early on
+        if any(word in command for word in ['tool'] + EARLY_INTENTS["tool"]):
             if 'hammer' in command:
                 self.speak("Delivering the hammer to your workstation.")
-            elif 'range' in command or 'spanner' in command:
+            elif 'wrench' in command or 'spanner' in command:
                 self.speak("Here is the wrench.")
             elif 'screwdriver' in command:
                 self.speak("Screwdriver coming right up!")
@@ -169,16 +215,16 @@ class GuidoFixedAssistant:
             return True
         
         # Maintenance procedures
-        if any(word in command for word in ['tire', 'tyre', 'wheel']):
+        if any(word in command for word in EARLY_INTENTS["tire_change"]):
             self.guide_tire_change()
             return True
             
-        if any(word in command for word in ['oil', 'engine']):
+        if any(word in command for word in EARLY_INTENTS["oil_change"]):
             self.guide_oil_change()
             return True
         
         # System commands
-        if any(word in command for word in ['stop', 'sleep', 'deactivate', 'bye']):
+        if any(word in command for word in EARLY_INTENTS["deactivate"]):
             self.speak("Goodbye! Say 'Guido wake up' when you need me.")
             return False
         
@@ -234,8 +280,8 @@ class GuidoFixedAssistant:
     
     def close(self):
         """Clean up"""
-        if self.audio:
-            self.audio.terminate()
+        if self.pipeline:
+            self.pipeline.stop()
 
 # SIMPLE TEST - Run this first!
 def simple_voice_test():
@@ -276,10 +322,14 @@ if __name__ == "__main__":
         print("\n✅ Microphone works! Now testing Vosk...")
         
         assistant = GuidoFixedAssistant()
-        if assistant.model:
-            assistant.run_interactive_test()
-        else:
-            print("❌ Vosk not available")
+        try:
+            if assistant.model:
+                assistant.run_interactive_test()
+            else:
+                print("❌ Vosk not available")
+        finally:
+            # Stops the capture process and frees the shared ring
+            assistant.close()
     else:
         print("\n❌ Microphone issue detected! Please check:")
         print("   • Is microphone connected?")
@@ -0,0 +1,88 @@
+# test_action_dispatcher.py - Utterance parsing, cancellation callbacks and coalescing
+import threading
+
+from action_dispatcher import PRIORITY_ORGANIZE, Action, ActionDispatcher, RobotExecutor, parse_actions
+
+TOOLS = ['hammer', 'wrench', 'screwdriver', 'bolt', 'plier', 'measuring tape']
+
+
+class BlockedArm(RobotExecutor):
+    """Holds the first action until released, so the rest stay queued"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.history = []
+
+    def execute(self, action):
+        self.started.set()
+        self.release.wait(5)
+        self.history.append(action.key)
+
+
+def targets(command):
+    return [action.target for action in parse_actions(command, TOOLS)]
+
+
+def test_parse_keeps_spoken_order():
+    assert targets("give me the wrench and the screwdriver") == ["wrench", "screwdriver"]
+
+
+def test_parse_plurals():
+    assert targets("bring the wrenches") == ["wrench"]
+    assert targets("hand me two bolts and the pliers") == ["bolt", "plier"]
+
+
+def test_parse_needs_word_boundaries():
+    assert targets("the thunderbolt hammered it") == []
+
+
+def test_parse_organize():
+    actions = parse_actions("organize the hammer", TOOLS)
+    assert [(a.kind, a.target) for a in actions] == [("deliver", "hammer"), ("organize", None)]
+    assert actions[1].priority == PRIORITY_ORGANIZE
+
+
+def test_cancel_pending_reports_cancelled_actions():
+    arm = BlockedArm()
+    dispatcher = ActionDispatcher(arm)
+    finished = []
+    done = threading.Event()
+
+    def callback(action):
+        finished.append((action.target, action.status))
+        if action.target == "hammer":
+            done.set()
+
+    dispatcher.submit(Action("deliver", "hammer"), callback)
+    assert arm.started.wait(5)
+    dispatcher.submit_all([Action("deliver", "wrench"), Action("deliver", "bolt")], callback)
+
+    cancelled = dispatcher.cancel_pending()
+    assert [action.target for action in cancelled] == ["wrench", "bolt"]
+    assert finished == [("wrench", "cancelled"), ("bolt", "cancelled")]
+
+    arm.release.set()
+    assert done.wait(5)
+    assert dispatcher.wait_idle(5)
+    assert finished[-1] == ("hammer", "done")
+    assert arm.history == [("deliver", "hammer")]
+    dispatcher.stop()
+
+
+def test_repeat_is_coalesced_with_both_callbacks():
+    arm = BlockedArm()
+    dispatcher = ActionDispatcher(arm)
+    dispatcher.submit(Action("deliver", "hammer"))
+    assert arm.started.wait(5)
+
+    calls = []
+    first = dispatcher.submit(Action("deliver", "wrench"), lambda action: calls.append("first"))
+    second = dispatcher.submit(Action("deliver", "wrench"), lambda action: calls.append("second"))
+    assert first is second
+
+    arm.release.set()
+    assert dispatcher.wait_idle(5)
+    assert calls == ["first", "second"]
+    assert arm.history == [("deliver", "hammer"), ("deliver", "wrench")]
+    dispatcher.stop()
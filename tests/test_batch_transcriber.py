@@ -0,0 +1,39 @@
+# test_batch_transcriber.py - Word error rate between a clip's label and its transcript
+import pytest
+
+from batch_transcriber import normalize, word_error_rate
+
+
+def test_identical_transcript():
+    assert word_error_rate("give me the hammer", "Give me the hammer.") == 0.0
+
+
+def test_substitution():
+    assert word_error_rate("give me the hammer", "give me the wrench") == pytest.approx(0.25)
+
+
+def test_deletion():
+    assert word_error_rate("give me the hammer", "give the hammer") == pytest.approx(0.25)
+
+
+def test_insertion():
+    assert word_error_rate("give me the hammer", "give me the big hammer now") == pytest.approx(0.5)
+
+
+def test_mixed_edits_take_the_cheapest_alignment():
+    # "guido" deleted and "wake" heard as "make": two edits over three words
+    assert word_error_rate("hey guido wake", "hey make") == pytest.approx(2 / 3)
+
+
+def test_empty_reference():
+    assert word_error_rate("", "") == 0.0
+    # Every heard word is an insertion; the length is clamped to one to avoid dividing by zero
+    assert word_error_rate("", "give me") == 2.0
+
+
+def test_empty_transcript():
+    assert word_error_rate("give me the hammer", "") == 1.0
+
+
+def test_normalize_keeps_apostrophes():
+    assert normalize("What's the TIME, Guido?") == ["what's", "the", "time", "guido"]
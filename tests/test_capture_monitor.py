@@ -0,0 +1,40 @@
+# test_capture_monitor.py - Overflows are counted without losing an extra chunk
+import numpy as np
+
+from capture_monitor import CaptureMonitor
+
+
+class FullBufferStream:
+    """Blocking stream whose host buffer is full (overrun) before every other read"""
+
+    def __init__(self, buffer_frames):
+        self.buffer_frames = buffer_frames
+        self.reads = []
+        self.next_sample = 0
+
+    def get_read_available(self):
+        return self.buffer_frames if len(self.reads) % 2 == 0 else 0
+
+    def read(self, frames, exception_on_overflow=True):
+        assert not exception_on_overflow, "PyAudio discards the chunk it raises for"
+        self.reads.append(frames)
+        samples = np.arange(self.next_sample, self.next_sample + frames, dtype=np.int16)
+        self.next_sample += frames
+        return samples.tobytes()
+
+
+def test_overflow_counted_from_full_buffer_with_one_read_per_chunk():
+    stream = FullBufferStream(buffer_frames=2048)
+    monitor = CaptureMonitor(stream, buffer_frames=2048)
+    chunks = [np.frombuffer(monitor.read(1024), dtype=np.int16) for _ in range(4)]
+
+    assert stream.reads == [1024] * 4
+    assert monitor.overflows == 2
+    # Every sample the stream delivered reached the caller, in order
+    assert np.array_equal(np.concatenate(chunks), np.arange(4096, dtype=np.int16))
+
+
+def test_unknown_buffer_size_counts_no_overflows():
+    monitor = CaptureMonitor(FullBufferStream(buffer_frames=2048))
+    monitor.read(1024)
+    assert monitor.overflows == 0
@@ -0,0 +1,182 @@
+# test_cloud_recognizer.py - Pooled, budgeted and streamed uploads against MockSpeechServer
+import time
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from audio_utils import captured_phrase, synthetic_speech
+from cloud_benchmark import MockSpeechServer
+from cloud_recognizer import CloudRecognizer, parse_response
+
+RATE = 16000
+CHUNK = 1024
+
+
+@pytest.fixture
+def phrase():
+    return captured_phrase(synthetic_speech())
+
+
+@pytest.fixture
+def serve():
+    """Start MockSpeechServers and CloudRecognizers for them; both are closed after the test"""
+    opened = []
+
+    def start(budget=5.0, raw=False, **server_options):
+        server_options.setdefault("latency", 0.0)
+        server_options.setdefault("connect_latency", 0.0)
+        server = MockSpeechServer(**server_options)
+        client = CloudRecognizer(server.url, budget=budget)
+        if raw:
+            client.converter = ""  # no FLAC encoder: upload L16 so byte counts are exact
+        opened.append((server, client))
+        return server, client
+
+    yield start
+    for server, client in opened:
+        client.close()
+        server.stop()
+
+
+def stream(client, phrase):
+    upload = client.open_stream(RATE)
+    for i in range(0, len(phrase), CHUNK):
+        upload.feed(phrase[i:i + CHUNK].tobytes())
+    return upload
+
+
+def test_parse_response_takes_the_first_result():
+    text = '{"result":[]}\n{"result":[{"alternative":[{"transcript":"Give Me The Hammer","confidence":0.8}]}]}\n'
+    assert parse_response(text) == ("give me the hammer", 0.8)
+
+
+def test_parse_response_without_confidence():
+    assert parse_response('{"result":[{"alternative":[{"transcript":"hammer"}]}]}') == ("hammer", 0.0)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    '{"result":[]}\n',
+    '{"result":[{"alternative":[]}]}\n',
+    '{"result":[{"alternative":[{"confidence":0.9}]}]}\n',
+])
+def test_parse_response_without_transcript(text):
+    with pytest.raises(sr.UnknownValueError):
+        parse_response(text)
+
+
+def test_stale_pooled_connection_is_replayed_on_a_fresh_one(serve, phrase):
+    server, client = serve(idle_timeout=0.2)
+    audio = sr.AudioData(phrase.tobytes(), RATE, 2)
+    assert client.recognize(audio)[0] == "give me the hammer"
+    time.sleep(0.5)  # the server drops the pooled connection meanwhile
+
+    assert client.recognize(audio)[0] == "give me the hammer"
+    assert client.stats["reused"] == 1
+    assert client.stats["connections"] == 2
+    assert client.stats["failures"] == 0
+    assert server.requests == 2
+
+
+def test_live_pooled_connection_is_reused(serve, phrase):
+    server, client = serve()
+    audio = sr.AudioData(phrase.tobytes(), RATE, 2)
+    for _ in range(3):
+        client.recognize(audio)
+    assert client.stats["connections"] == 1
+    assert server.connections == 1
+
+
+def test_fresh_connection_failure_is_not_retried(serve, phrase):
+    server, client = serve()
+    server.stop()
+    with pytest.raises(sr.RequestError, match="connection failed"):
+        client.recognize(sr.AudioData(phrase.tobytes(), RATE, 2))
+    assert client.stats["failures"] == 1
+    assert client.stats["connections"] == 1
+
+
+def test_budget_expiry_in_exchange(serve, phrase):
+    server, client = serve(budget=0.3, latency=2.0)
+    started = time.monotonic()
+    with pytest.raises(sr.RequestError, match="budget"):
+        client.recognize(sr.AudioData(phrase.tobytes(), RATE, 2))
+    assert time.monotonic() - started < 1.0
+    assert client.stats["timeouts"] == 1
+    assert client.stats["failures"] == 1
+
+
+def test_budget_expiry_in_finish(serve, phrase):
+    server, client = serve(budget=0.3, latency=2.0)
+    upload = stream(client, phrase)
+    started = time.monotonic()
+    with pytest.raises(sr.RequestError, match="budget"):
+        upload.finish()
+    assert time.monotonic() - started < 1.0
+    assert upload.aborted
+    assert client.stats["timeouts"] == 1
+    with pytest.raises(sr.RequestError):
+        upload.future.result(timeout=5)
+    assert client.stats["failures"] == 1
+
+
+def test_aborted_stream_counts_as_a_failure(serve, phrase):
+    server, client = serve()
+    upload = stream(client, phrase)
+    upload.abort()
+    with pytest.raises(sr.RequestError, match="aborted"):
+        upload.future.result(timeout=5)
+    assert client.stats["failures"] == 1
+    assert client.stats["timeouts"] == 0
+
+
+def test_http_error_counts_as_a_failure(serve, phrase):
+    server, client = serve(status=503)
+    with pytest.raises(sr.RequestError, match="503"):
+        client.recognize(sr.AudioData(phrase.tobytes(), RATE, 2))
+    assert client.stats["failures"] == 1
+    assert server.requests == 1
+
+
+def test_exchange_timeout_kills_the_encoder(serve, phrase):
+    server, client = serve(budget=5.0)
+    upload = client.open_stream(RATE)
+    loud = phrase[int(RATE * 0.5):int(RATE * 1.5)].tobytes()
+    upload.feed(loud)
+    assert upload.encoder is not None
+    # Capture is still running when the sender runs out of time
+    upload.deadline = time.monotonic() - 1
+    upload.emit(loud)
+
+    with pytest.raises(sr.RequestError, match="budget"):
+        upload.future.result(timeout=5)
+    assert upload.aborted
+    assert upload.encoder.poll() is not None
+    assert client.stats["timeouts"] == 1
+
+
+def test_chunked_framing_delivers_every_byte(serve, phrase):
+    server, client = serve(raw=True)
+    upload = stream(client, phrase)
+    assert upload.finish()[0] == "give me the hammer"
+    assert upload.length is None
+    assert server.bytes_received == client.stats["sent_bytes"] == client.stats["sent_raw_bytes"]
+    # Only the speech and its padding leave the machine
+    assert 0 < server.bytes_received < phrase.nbytes
+
+
+def test_chunked_flac_stream_is_received_whole(serve, phrase):
+    server, client = serve()
+    upload = stream(client, phrase)
+    assert upload.finish()[0] == "give me the hammer"
+    assert upload.content_type.startswith("audio/x-flac")
+    assert server.bytes_received == client.stats["sent_bytes"] > 0
+
+
+def test_quiet_stream_sends_nothing(serve):
+    server, client = serve()
+    upload = stream(client, np.zeros(RATE, dtype=np.int16))
+    with pytest.raises(sr.UnknownValueError):
+        upload.finish()
+    assert server.requests == 0
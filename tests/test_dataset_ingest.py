@@ -0,0 +1,58 @@
+# test_dataset_ingest.py - Converted clips land as <phrase>_NNN.wav after the existing takes
+import os
+import wave
+
+import numpy as np
+
+from audio_utils import synthetic_speech
+from dataset_ingest import ingest
+from sample_trimmer import read_clip, write_clip
+
+
+def recording(path, rate, phrases=1):
+    """Stereo WAV at `rate` with `phrases` spoken phrases separated by a second of silence"""
+    speech = synthetic_speech(rate=rate, seconds=0.8)
+    silence = np.zeros(rate)
+    mono = np.concatenate([silence] + [np.concatenate((speech, silence)) for _ in range(phrases)])
+    stereo = np.repeat(np.clip(mono, -32768, 32767).astype(np.int16)[:, np.newaxis], 2, axis=1)
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(stereo.tobytes())
+    return str(path)
+
+
+def test_outputs_follow_existing_takes(tmp_path):
+    folder = tmp_path / "tool_delivery" / "give_me_wrench"
+    folder.mkdir(parents=True)
+    write_clip(str(folder / "give_me_wrench_004.wav"), np.zeros(160, dtype=np.int16))
+    sources = [recording(tmp_path / "take.wav", 44100), recording(tmp_path / "take2.wav", 48000)]
+
+    reports = ingest(sources, "tool_delivery", "give_me_wrench", data_dir=str(tmp_path), workers=2)
+
+    assert [os.path.basename(f) for r in reports for f in r["outputs"]] == \
+        ["give_me_wrench_005.wav", "give_me_wrench_006.wav"]
+    assert sorted(os.listdir(folder)) == ["give_me_wrench_004.wav", "give_me_wrench_005.wav",
+                                          "give_me_wrench_006.wav"]
+    audio, rate = read_clip(str(folder / "give_me_wrench_006.wav"))
+    assert rate == 16000
+    assert abs(len(audio) - 16000 * 2.8) < 16
+
+
+def test_split_numbers_every_utterance(tmp_path):
+    sources = [recording(tmp_path / "session.wav", 16000, phrases=3)]
+    reports = ingest(sources, "tool_delivery", "give_me_hammer", data_dir=str(tmp_path), split=True, workers=1)
+    folder = tmp_path / "tool_delivery" / "give_me_hammer"
+    names = [os.path.basename(f) for f in reports[0]["outputs"]]
+    assert names == [f"give_me_hammer_{i:03d}.wav" for i in range(1, len(names) + 1)]
+    assert len(names) == 3
+    assert sorted(os.listdir(folder)) == names
+
+
+def test_failed_file_leaves_no_staging(tmp_path):
+    bad = tmp_path / "broken.wav"
+    bad.write_bytes(b"not a wav")
+    reports = ingest([str(bad)], "tool_delivery", "give_me_bolt", data_dir=str(tmp_path), workers=1)
+    assert reports == []
+    assert os.listdir(tmp_path / "tool_delivery" / "give_me_bolt") == []
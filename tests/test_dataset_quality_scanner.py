@@ -0,0 +1,63 @@
+# test_dataset_quality_scanner.py - SNR against the stored noise profile, and degenerate clips
+import numpy as np
+import pytest
+
+from audio_utils import synthetic_speech
+from dataset_quality_scanner import analyze_batch, band_power, scan_folder
+from sample_trimmer import write_clip
+
+RATE = 16000
+
+
+@pytest.fixture(scope="module")
+def noise():
+    return np.random.default_rng(0).normal(0, 100, RATE * 2)
+
+
+def continuous_take(seed):
+    """Speech with no pauses at all, so only the noise profile can give its SNR"""
+    t = np.arange(RATE) / RATE
+    voiced = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 8)) * 1000
+    return voiced + np.random.default_rng(seed).normal(0, 100, RATE)
+
+
+def raw_snr_db(noise):
+    speech = continuous_take(1) - np.random.default_rng(1).normal(0, 100, RATE)
+    return 10 * np.log10(band_power(speech[np.newaxis]).mean() / band_power(noise[np.newaxis]).mean())
+
+
+def normalized(take):
+    """As VoiceDataCollector.apply_audio_enhancement scales it; returns (int16 clip, gain)"""
+    gain = 0.9 * 32767 / np.abs(take).max()
+    return np.clip(take * gain, -32768, 32767).astype(np.int16), gain
+
+
+def test_noise_profile_is_scaled_like_the_clips(tmp_path, noise):
+    noise_power = float(band_power(noise[np.newaxis]).mean())
+    clip, gain = normalized(continuous_take(1))
+    write_clip(str(tmp_path / "give_me_wrench_001.wav"), clip)
+
+    [report] = scan_folder(str(tmp_path), noise_power, gains={"give_me_wrench_001.wav": gain})
+    # Within a dB or so of the SNR the take had at the microphone
+    assert report["snr_db"] == pytest.approx(raw_snr_db(noise), abs=1.5)
+
+
+def test_unscaled_noise_profile_is_not_used(tmp_path, noise):
+    noise_power = float(band_power(noise[np.newaxis]).mean())
+    clip, gain = normalized(continuous_take(1))
+    write_clip(str(tmp_path / "give_me_wrench_001.wav"), clip)
+
+    [report] = scan_folder(str(tmp_path), noise_power)
+    # Comparing normalized speech with raw noise would add 20*log10(gain) dB
+    assert report["snr_db"] < raw_snr_db(noise) + 20 * np.log10(gain) - 10
+
+
+def test_zero_length_clip():
+    captured = np.clip(np.concatenate((np.zeros(4000), synthetic_speech(), np.zeros(4000))),
+                       -32768, 32767).astype(np.int16)
+    metrics = analyze_batch([np.zeros(0, dtype=np.int16), captured])
+    for values in metrics.values():
+        assert np.all(np.isfinite(values))
+    assert metrics["clipping_ratio"][0] == 0.0
+    assert metrics["speech_duration"][0] == 0.0
+    assert metrics["speech_duration"][1] > 0.5
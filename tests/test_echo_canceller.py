@@ -0,0 +1,71 @@
+# test_echo_canceller.py - Echo removal and talker preservation on a simulated speaker-to-mic path
+import numpy as np
+import pytest
+
+from audio_utils import synthetic_speech
+from echo_canceller import RATE, EchoReference, EchoSuppressor, evaluate
+
+SPEECH_AT = int(2.5 * RATE)
+
+
+@pytest.fixture(scope="module")
+def tts():
+    return synthetic_speech(seconds=4.0, seed=1)
+
+
+@pytest.fixture(scope="module")
+def talker():
+    return synthetic_speech(seconds=1.0, seed=2) * 0.8
+
+
+@pytest.mark.parametrize("delay_ms, echo_gain", [(5, 0.3), (20, 0.6), (40, 0.9)])
+def test_erle_above_floor(tts, talker, delay_ms, echo_gain):
+    result = evaluate(tts, talker, delay_ms, echo_gain, speech_at=SPEECH_AT)
+    assert result["erle_db"] > 8.0
+    assert result["self_speech_out"] < result["self_speech_in"] / 2
+
+
+@pytest.mark.parametrize("delay_ms, echo_gain", [(5, 0.3), (20, 0.6), (40, 0.9)])
+def test_near_end_speech_is_kept(tts, talker, delay_ms, echo_gain):
+    result = evaluate(tts, talker, delay_ms, echo_gain, speech_at=SPEECH_AT)
+    talk = result["cleaned"][SPEECH_AT:SPEECH_AT + len(talker)].astype(np.float32)
+    kept_db = 10 * np.log10(np.mean(talk ** 2) / np.mean(talker ** 2))
+    assert abs(kept_db) < 1.0
+    assert result["talker_kept"] == result["talker_frames"]
+    assert result["snr_out"] > result["snr_in"] + 10
+
+
+def test_converges_on_echo_alone(tts):
+    suppressor = EchoSuppressor()
+    echo = np.concatenate((np.zeros(160), 0.6 * tts))[:len(tts)].astype(np.int16)
+    assert not suppressor.converged
+    for i in range(0, len(echo), 1024):
+        suppressor.process(echo[i:i + 1024], tts[i:i + 1024])
+    assert suppressor.converged
+    assert suppressor.gated_blocks > 0
+
+
+def test_silent_reference_passes_the_mic_through(talker):
+    mic = talker.astype(np.int16)
+    out = np.concatenate([EchoSuppressor().process(mic[i:i + 1024], np.zeros(len(mic[i:i + 1024])))
+                          for i in range(0, len(mic), 1024)])
+    assert np.array_equal(out, mic)
+
+
+def test_odd_chunks_keep_their_length(talker):
+    suppressor = EchoSuppressor()
+    mic = talker.astype(np.int16)
+    sizes = [len(suppressor.process(mic[i:i + 1000], mic[i:i + 1000])) for i in range(0, len(mic), 1000)]
+    assert sizes == [len(mic[i:i + 1000]) for i in range(0, len(mic), 1000)]
+
+
+def test_reference_window_follows_playback():
+    reference = EchoReference()
+    reference.begin(np.arange(1, RATE + 1, dtype=np.float32), start_time=10.0)
+    window = reference.window(10.0 + 512 / RATE, 1024)
+    assert np.array_equal(window[:512], np.zeros(512))
+    assert np.array_equal(window[512:], np.arange(1, 513))
+    assert reference.active(10.5)
+    assert not reference.active(12.0)
+    reference.end(10.25)
+    assert not reference.active(10.5 + reference.tail_seconds + 0.01)
@@ -0,0 +1,296 @@
+# test_guido_voice_system.py - Guido does not act on its own voice unless the echo canceller removes it
+import asyncio
+import threading
+import time
+import types
+
+import numpy as np
+
+from action_dispatcher import ActionDispatcher, RobotExecutor
+from audio_utils import UtteranceSegmenter
+from echo_canceller import EchoSuppressor
+from guido_voice_system import GuidoVoiceSystem
+
+
+class FakeEngine:
+    def __init__(self, guido, seen):
+        self.guido = guido
+        self.seen = seen
+
+    def say(self, text):
+        pass
+
+    def runAndWait(self):
+        # What the capture side sees while the line is playing
+        self.seen.append(self.guido.heard_own_voice(time.time()))
+
+
+def make_guido(speaker=None, converged=False):
+    guido = GuidoVoiceSystem.__new__(GuidoVoiceSystem)
+    guido.speaker = speaker
+    guido.echo_suppressor = EchoSuppressor()
+    guido.echo_suppressor.erle = guido.echo_suppressor.min_erle * (2 if converged else 0.5)
+    guido.playback_idle = threading.Event()
+    guido.playback_idle.set()
+    guido.playback_ended = 0.0
+    return guido
+
+
+def test_capture_during_plain_tts_is_dropped():
+    guido = make_guido()
+    seen = []
+    guido.tts_engine = FakeEngine(guido, seen)
+    started = time.time()
+    guido.speak("I will bring you the hammer")
+    assert seen == [True]
+    assert guido.heard_own_voice(started)
+    # A capture that starts once Guido is quiet is the user's
+    assert not guido.heard_own_voice(time.time() + 1)
+
+
+def test_unconverged_canceller_does_not_guard():
+    guido = make_guido(speaker=object(), converged=False)
+    guido.playback_idle.clear()
+    assert guido.heard_own_voice(time.time())
+
+
+def test_converged_canceller_allows_barge_in():
+    guido = make_guido(speaker=object(), converged=True)
+    guido.playback_idle.clear()
+    assert not guido.heard_own_voice(time.time())
+
+
+def test_tts_engine_is_created_on_the_speaking_thread(monkeypatch):
+    import guido_voice_system
+
+    guido = make_guido()
+    guido.tts_engine = None
+    created = []
+
+    def init():
+        created.append(threading.current_thread().name)
+        return FakeEngine(guido, [])
+
+    monkeypatch.setattr(guido_voice_system.pyttsx3, "init", init)
+    monkeypatch.setattr(GuidoVoiceSystem, "create_speaker", lambda system: None)
+    monkeypatch.setattr(GuidoVoiceSystem, "setup_tts", lambda system: None)
+    speech = threading.Thread(target=guido.speak, args=("hello",), name="speech_0")
+    speech.start()
+    speech.join()
+    assert created == ["speech_0"]
+
+
+class ScriptedStream:
+    """Microphone stream that plays a fixed signal, then silence, and notes reads during recognition"""
+
+    def __init__(self, signal, recognizing):
+        self.signal = signal
+        self.position = 0
+        self.recognizing = recognizing
+        self.reads_while_recognizing = 0
+
+    def read(self, size):
+        chunk = np.zeros(size, dtype=np.int16)
+        part = self.signal[self.position:self.position + size]
+        chunk[:len(part)] = part
+        self.position += size
+        self.reads_while_recognizing += self.recognizing.is_set()
+        time.sleep(size / 16000 / 20)  # 20x real time
+        return chunk.tobytes()
+
+
+class ScriptedMicrophone:
+    SAMPLE_RATE = 16000
+    SAMPLE_WIDTH = 2
+    CHUNK = 1024
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FiringDetector:
+    """Stage 1 that accepts every segment, with the real detector's segmenter settings"""
+
+    def __init__(self):
+        self.segmenter = UtteranceSegmenter(16000, 300, min_silence_ms=300, pad_ms=200)
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+        self.segmenter.reset()
+
+    def set_energy_threshold(self, threshold):
+        self.segmenter.threshold = threshold
+
+    def feed(self, chunk):
+        return self.segmenter.feed(chunk)
+
+
+class LengthRecognizer:
+    """Hears the whole command only if it got more than the wake phrase"""
+
+    def __init__(self, recognizing):
+        self.recognizing = recognizing
+
+    def recognize(self, audio):
+        self.recognizing.set()
+        time.sleep(0.2)
+        self.recognizing.clear()
+        seconds = len(audio.frame_data) / audio.sample_width / audio.sample_rate
+        return ("hey guido give me the hammer" if seconds > 2 else "hey guido"), 0.9, "scripted"
+
+
+def tone(seconds, amplitude=3000):
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def test_wake_phrase_keeps_the_command_after_a_pause():
+    from concurrent.futures import ThreadPoolExecutor
+    import speech_recognition as sr
+
+    guido = make_guido()
+    guido.setup_vocabulary()
+    guido.utterance_log = None
+    guido.wake_phrase_time_limit = 6
+    guido.recognizer = sr.Recognizer()
+    guido.recognizer.energy_threshold = 300
+    guido.recognizer.pause_threshold = 0.8
+    guido.recognize_executor = ThreadPoolExecutor(max_workers=1)
+    recognizing = threading.Event()
+    guido.racing_recognizer = LengthRecognizer(recognizing)
+    guido.wake_detector = FiringDetector()
+
+    # "hey guido", a normal half-second pause, then the command
+    silence = np.zeros(8000, dtype=np.int16)
+    stream = ScriptedStream(np.concatenate((silence, tone(0.7), silence, tone(1.2))), recognizing)
+    guido.microphone = ScriptedMicrophone(stream)
+
+    assert guido.listen_for_wake(timeout=10) == "hey guido give me the hammer"
+    assert guido.wake_detector.resets >= 1
+    # The stream was still being drained while the hit was recognized
+    assert stream.reads_while_recognizing > 0
+    guido.recognize_executor.shutdown()
+
+
+class HeldArm(RobotExecutor):
+    """Holds the first action until released, so the rest stay queued"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.history = []
+
+    def execute(self, action):
+        self.started.set()
+        self.release.wait(5)
+        self.history.append(action.key)
+
+
+async def run_commands(guido, commands):
+    """Feed commands through process_command on a live loop and let the handlers finish"""
+    guido.loop = asyncio.get_running_loop()
+    guido.tasks = set()
+    guido.current_task = None
+    said = []
+
+    async def say(text):
+        said.append(text)
+
+    guido.say = say
+    for command in commands:
+        guido.process_command(command)
+        await guido.wait_until_quiet()
+    return said
+
+
+def test_deactivate_cancels_queued_deliveries():
+    arm = HeldArm()
+    guido = make_guido()
+    guido.setup_vocabulary()
+    guido.action_dispatcher = ActionDispatcher(arm)
+    guido.is_activated = True
+    cancelled = []
+    guido.on_action_complete = lambda action: cancelled.append((action.target, action.status))
+
+    said = asyncio.run(run_commands(guido, ["give me the hammer and the wrench and the bolt"]))
+    assert arm.started.wait(5)
+    asyncio.run(run_commands(guido, ["stop"]))
+
+    assert not guido.is_activated
+    assert cancelled == [("wrench", "cancelled"), ("bolt", "cancelled")]
+    arm.release.set()
+    assert guido.action_dispatcher.wait_idle(5)
+    # The delivery already in the arm's hand finishes; nothing queued behind it runs
+    assert arm.history == [("deliver", "hammer")]
+    assert said == ["I will bring you the hammer, wrench and the bolt. Please show me your hand."]
+    guido.action_dispatcher.stop()
+
+
+def test_tool_request_keeps_the_organize_action():
+    arm = HeldArm()
+    arm.release.set()
+    guido = make_guido()
+    guido.setup_vocabulary()
+    guido.action_dispatcher = ActionDispatcher(arm)
+    guido.is_activated = True
+    guido.on_action_complete = lambda action: None
+
+    said = asyncio.run(run_commands(guido, ["bring the hammer and organize the tools"]))
+    assert guido.action_dispatcher.wait_idle(5)
+    # "organize the tools" on its own has its own handler rather than falling through to unknown
+    said += asyncio.run(run_commands(guido, ["organize the tools"]))
+    assert guido.action_dispatcher.wait_idle(5)
+    assert arm.history == [("deliver", "hammer"), ("organize", None), ("organize", None)]
+    assert said == ["I will bring you the hammer. Please show me your hand.",
+                    "Then I'll organize the tools according to their classes.",
+                    "I'm organizing the tools according to their classes."]
+    guido.action_dispatcher.stop()
+
+
+class RecordingSpeaker:
+    def __init__(self):
+        self.calls = []
+
+    def stop(self):
+        self.calls.append("stop")
+
+    def close(self):
+        self.calls.append("close")
+
+
+def test_shutdown_closes_the_speaker():
+    from concurrent.futures import ThreadPoolExecutor
+
+    speaker = RecordingSpeaker()
+    guido = make_guido(speaker=speaker)
+    guido.setup_vocabulary()
+    guido.is_activated = False
+    guido.check_interval = 60
+    guido.recognize_executor = ThreadPoolExecutor(max_workers=1)
+    arm = HeldArm()
+    arm.release.set()
+    guido.action_dispatcher = ActionDispatcher(arm)
+    guido.racing_recognizer = types.SimpleNamespace(close=lambda: None)
+    guido.cloud_recognizer = None
+    guido.utterance_log = None
+    said = []
+    guido.calibrate_microphone = lambda: None
+    guido.speak = said.append
+    guido.listen_for_state = lambda: time.sleep(0.05)
+
+    async def run_then_interrupt():
+        running = asyncio.create_task(guido.run_async())
+        await asyncio.sleep(0.2)
+        running.cancel()
+        await running
+
+    asyncio.run(run_then_interrupt())
+    assert said[-1] == "Shutting down Guido system. Goodbye!"
+    assert speaker.calls[-2:] == ["stop", "close"]
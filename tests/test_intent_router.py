@@ -0,0 +1,128 @@
+# test_intent_router.py - Early commits from streaming partials and the latency replay
+import json
+import sys
+import types
+
+import numpy as np
+
+from intent_router import EARLY_INTENTS, IntentRouter, replay_latency_report
+from sample_trimmer import write_clip
+
+CHUNK = 1600
+
+
+def partial(text, conf=None):
+    result = {"partial": text}
+    if conf is not None:
+        result["partial_result"] = [{"word": word, "conf": conf} for word in text.split()]
+    return result
+
+
+def test_match_intent():
+    router = IntentRouter()
+    assert router.match_intent("give me the spanner") == "tool"
+    assert router.match_intent("how do i change a tyre") == "tire_change"
+    assert router.match_intent("give me the") is None
+    # Two intents at once is not clear yet
+    assert router.match_intent("stop the engine") is None
+
+
+def test_only_keywords_the_handler_knows_commit_early():
+    router = IntentRouter()
+    # test_speech has no branch for these, so they wait for the full utterance
+    assert router.match_intent("hand me the pliers") is None
+    assert router.match_intent("pass the measuring tape") is None
+    assert "range" not in EARLY_INTENTS["tool"]
+
+
+def test_commits_after_stable_partials():
+    router = IntentRouter()
+    assert router.feed_partial(partial("give me")) is None
+    assert router.feed_partial(partial("give me the hammer")) is None
+    assert router.feed_partial(partial("give me the hammer please")) == "give me the hammer please"
+    # One commit per utterance until reset
+    assert router.feed_partial(partial("give me the hammer please now")) is None
+    router.reset()
+    assert router.feed_partial(partial("what time")) is None
+    assert router.feed_partial(partial("what time is")) == "what time is"
+
+
+def test_changed_intent_restarts_the_count():
+    router = IntentRouter()
+    router.feed_partial(partial("the wheel"))
+    assert router.feed_partial(partial("the wheel oil")) is None
+    assert router.feed_partial(partial("the oil")) is None
+    assert router.feed_partial(partial("the oil please")) == "the oil please"
+
+
+def test_low_confidence_keyword_does_not_commit():
+    router = IntentRouter(min_confidence=0.85)
+    for _ in range(3):
+        assert router.feed_partial(partial("give me the wrench", conf=0.6)) is None
+    assert router.feed_partial(partial("give me the wrench", conf=0.95)) is None
+    assert router.feed_partial(partial("give me the wrench", conf=0.95)) == "give me the wrench"
+
+
+class ScriptedRecognizer:
+    """Stand-in for KaldiRecognizer: one more word per chunk of speech, final after two silent chunks"""
+
+    def __init__(self, model, rate):
+        self.words = model.transcript.split()
+        self.heard = 0
+        self.silent = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def SetPartialWords(self, enabled):
+        pass
+
+    def SetMaxAlternatives(self, count):
+        pass
+
+    def AcceptWaveform(self, data):
+        if any(data):
+            self.heard += 1
+            return False
+        self.silent += 1
+        return self.silent >= 2
+
+    def PartialResult(self):
+        return json.dumps({"partial": " ".join(self.words[:self.heard])})
+
+    def Result(self):
+        return json.dumps({"text": " ".join(self.words)})
+
+
+def fake_vosk(monkeypatch, transcript):
+    model = types.SimpleNamespace(transcript=transcript)
+    vosk = types.ModuleType("vosk")
+    vosk.Model = lambda path: model
+    vosk.KaldiRecognizer = ScriptedRecognizer
+    monkeypatch.setitem(sys.modules, "vosk", vosk)
+
+
+def speech(chunks):
+    return np.full(chunks * CHUNK, 1000, dtype=np.int16)
+
+
+def test_replay_measures_the_commit_against_the_final_result(tmp_path, monkeypatch):
+    fake_vosk(monkeypatch, "give me the hammer")
+    folder = tmp_path / "give_me_hammer"
+    folder.mkdir()
+    write_clip(str(folder / "give_me_hammer_001.wav"), speech(4))
+
+    savings = replay_latency_report(str(tmp_path), chunk=CHUNK, tail_s=0.5)
+    # "hammer" shows up in the 4th partial and holds in the 5th (silent) one; Vosk finalizes one chunk later
+    assert list(savings) == ["give_me_hammer"]
+    assert np.allclose(savings["give_me_hammer"], [CHUNK / 16000])
+
+
+def test_replay_skips_commands_without_an_early_intent(tmp_path, monkeypatch, capsys):
+    fake_vosk(monkeypatch, "hand me the pliers")
+    folder = tmp_path / "hand_me_pliers"
+    folder.mkdir()
+    write_clip(str(folder / "hand_me_pliers_001.wav"), speech(4))
+
+    assert replay_latency_report(str(tmp_path), chunk=CHUNK, tail_s=0.5) == {}
+    assert "0/1 clips committed" in capsys.readouterr().out
@@ -0,0 +1,56 @@
+# test_phonetic_index.py - Near-miss correction fixes misheard commands and leaves ordinary speech alone
+import pytest
+
+from guido_voice_system import GuidoVoiceSystem
+from phonetic_index import COMMON_WORDS
+
+
+@pytest.fixture(scope="module")
+def guido():
+    # Only the vocabulary is needed, not the microphone or TTS
+    instance = GuidoVoiceSystem.__new__(GuidoVoiceSystem)
+    instance.setup_vocabulary()
+    return instance
+
+
+@pytest.mark.parametrize("heard, active, expected", [
+    ("give me the range", True, "give me the wrench"),
+    ("give me the rench", True, "give me the wrench"),
+    ("give me the screw driver", True, "give me the screwdriver"),
+    ("a spanner please", True, "a wrench please"),
+    ("hey guida", False, "hey guido"),
+    ("hey guido give me the rench", False, "hey guido give me the wrench"),
+])
+def test_misheard_commands_are_corrected(guido, heard, active, expected):
+    assert guido.correct_transcript(heard, active, quiet=True) == expected
+
+
+@pytest.mark.parametrize("sentence", [
+    "what is the next step",
+    "good morning",
+    "hello there good day",
+    "the team is here",
+    "put it on the bench",
+    "that was a steep slope",
+    "the kid took the stock",
+    "see you next week",
+    "from the top",
+    "it is only a dime",
+    "we dug a trench",
+    "arrange the tools",
+    "how to change a tire",
+])
+@pytest.mark.parametrize("active", [True, False])
+def test_ordinary_sentences_pass_through(guido, sentence, active):
+    assert guido.correct_transcript(sentence, active, quiet=True) == sentence
+
+
+def test_common_words_never_become_commands(guido):
+    for word in COMMON_WORDS:
+        match = guido.phonetic_index.lookup(word)
+        assert match is None or match[0] == word, word
+
+
+def test_routed_utterance_is_not_rewritten(guido):
+    # "stop" already routes, so "bench" must not be turned into a second command
+    assert guido.correct_transcript("stop at the bench", True, quiet=True) == "stop at the bench"
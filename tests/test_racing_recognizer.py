@@ -0,0 +1,123 @@
+# test_racing_recognizer.py - The race against a stub speech endpoint: winners, deadline and tie-break
+import time
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from audio_utils import captured_phrase, synthetic_speech
+from cloud_benchmark import MockSpeechServer
+from cloud_recognizer import CloudRecognizer
+from racing_recognizer import RacingRecognizer, cloud_backend
+
+
+def local_backend(text, confidence, delay=0.0, name="local"):
+    def recognize(audio):
+        time.sleep(delay)
+        return text, confidence
+    recognize.name = name
+    return recognize
+
+
+@pytest.fixture
+def audio():
+    return sr.AudioData(captured_phrase(synthetic_speech()).tobytes(), 16000, 2)
+
+
+@pytest.fixture
+def endpoint():
+    """Stub endpoint answering "give me the hammer" with confidence 0.92, and a client for it"""
+    servers, clients = [], []
+
+    def start(latency):
+        server = MockSpeechServer(latency=latency, connect_latency=0.0)
+        client = CloudRecognizer(server.url, budget=5.0)
+        servers.append(server)
+        clients.append(client)
+        return server, cloud_backend(client)
+
+    yield start
+    for client in clients:
+        client.close()
+    for server in servers:
+        server.stop()
+
+
+def test_cloud_answer_from_stub_server(endpoint, audio):
+    server, cloud = endpoint(latency=0.0)
+    racer = RacingRecognizer([cloud])
+    assert racer.recognize(audio) == ("give me the hammer", 0.92, "google")
+    assert server.requests == 1
+    racer.close()
+
+
+def test_slow_cloud_loses_to_confident_local(endpoint, audio):
+    server, cloud = endpoint(latency=1.0)
+    racer = RacingRecognizer([cloud, local_backend("give me the wrench", 0.9, delay=0.05)])
+    started = time.monotonic()
+    assert racer.recognize(audio) == ("give me the wrench", 0.9, "local")
+    assert time.monotonic() - started < 0.5
+    racer.close()
+
+
+def test_slow_local_loses_to_cloud(endpoint, audio):
+    server, cloud = endpoint(latency=0.0)
+    racer = RacingRecognizer([cloud, local_backend("give me the wrench", 0.9, delay=1.0)])
+    assert racer.recognize(audio)[2] == "google"
+    racer.close()
+
+
+def test_unconfident_answer_waits_for_a_confident_one(audio):
+    racer = RacingRecognizer([local_backend("give me the hammock", 0.3, delay=0.0, name="fast"),
+                              local_backend("give me the hammer", 0.8, delay=0.1, name="slow")])
+    assert racer.recognize(audio) == ("give me the hammer", 0.8, "slow")
+    racer.close()
+
+
+def test_deadline_returns_best_unconfident_answer(endpoint, audio):
+    server, cloud = endpoint(latency=2.0)
+    racer = RacingRecognizer([cloud, local_backend("give me the hammer", 0.4)], deadline=0.3)
+    started = time.monotonic()
+    assert racer.recognize(audio) == ("give me the hammer", 0.4, "local")
+    assert time.monotonic() - started < 1.0
+    racer.close()
+
+
+def test_deadline_without_any_answer_is_a_request_error(endpoint, audio):
+    server, cloud = endpoint(latency=2.0)
+    racer = RacingRecognizer([cloud], deadline=0.3)
+    started = time.monotonic()
+    with pytest.raises(sr.RequestError, match="deadline"):
+        racer.recognize(audio)
+    assert time.monotonic() - started < 1.0
+    racer.close()
+
+
+def test_confidence_tie_break_prefers_the_higher_score(audio):
+    racer = RacingRecognizer([local_backend("give me the bold", 0.5, name="first"),
+                              local_backend("give me the bolt", 0.6, delay=0.05, name="second"),
+                              local_backend("give me the boat", 0.2, delay=0.1, name="third")])
+    assert racer.recognize(audio) == ("give me the bolt", 0.6, "second")
+    racer.close()
+
+
+def test_equal_confidence_keeps_the_first_answer(audio):
+    racer = RacingRecognizer([local_backend("give me the bold", 0.5, name="first"),
+                              local_backend("give me the bolt", 0.5, delay=0.05, name="second")])
+    assert racer.recognize(audio)[2] == "first"
+    racer.close()
+
+
+def test_no_backend_understood(audio):
+    def silent(audio):
+        raise sr.UnknownValueError()
+    silent.name = "silent"
+    racer = RacingRecognizer([silent])
+    with pytest.raises(sr.UnknownValueError):
+        racer.recognize(audio)
+    racer.close()
+
+
+def test_needs_a_backend():
+    with pytest.raises(ValueError, match="at least one backend"):
+        RacingRecognizer([])
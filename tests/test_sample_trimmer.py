@@ -0,0 +1,129 @@
+# test_sample_trimmer.py - Speech endpoints, trimming and alignment, the manifest and sample numbering
+import numpy as np
+
+from audio_utils import speech_bounds
+from sample_trimmer import RATE, load_manifest, next_sample_number, read_clip, trim_audio, trim_dataset, write_clip
+
+
+def recording(seconds=3.0, speech_at=1.0, speech_seconds=0.5, fricative_seconds=0.0, seed=0):
+    """Room noise with a voiced burst, optionally followed by a quiet hiss like the s in stop"""
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 20, int(RATE * seconds))
+    start, end = int(RATE * speech_at), int(RATE * (speech_at + speech_seconds))
+    audio[start:end] += 3000 * np.sin(2 * np.pi * 200 * np.arange(end - start) / RATE)
+    hiss = int(RATE * fricative_seconds)
+    # Below the energy thresholds, so only the zero-crossing rate can claim it
+    audio[end:end + hiss] += rng.normal(0, 80, hiss)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def touch(folder, *names):
+    for name in names:
+        (folder / name).write_bytes(b"")
+
+
+def test_missing_folder_starts_at_one(tmp_path):
+    assert next_sample_number(str(tmp_path / "give_me_wrench")) == 1
+
+
+def test_follows_the_highest_number(tmp_path):
+    touch(tmp_path, "give_me_wrench_001.wav", "give_me_wrench_002.wav", "give_me_wrench_005.wav")
+    assert next_sample_number(str(tmp_path)) == 6
+
+
+def test_deleted_take_is_not_overwritten(tmp_path):
+    # 001 was rejected and deleted; counting files would hand out 002 again
+    touch(tmp_path, "give_me_wrench_002.wav")
+    assert next_sample_number(str(tmp_path)) == 3
+
+
+def test_ignores_unnumbered_files(tmp_path):
+    touch(tmp_path, "give_me_wrench_003.wav", "notes.txt", "give_me_wrench.wav", "give_me_wrench_004.wav.bak")
+    assert next_sample_number(str(tmp_path)) == 4
+
+
+def test_speech_bounds_follow_the_energy():
+    assert speech_bounds(recording(), RATE) == (16000, 24000)
+
+
+def test_speech_bounds_extend_over_a_trailing_fricative():
+    audio = recording(fricative_seconds=0.15)
+    assert speech_bounds(audio, RATE) == (16000, 26400)
+    assert speech_bounds(audio, RATE, zcr_extend_ms=0) == (16000, 24000)
+
+
+def test_speech_bounds_of_silence():
+    assert speech_bounds(np.zeros(RATE, dtype=np.int16), RATE) is None
+    assert speech_bounds(np.zeros(0, dtype=np.int16), RATE) is None
+
+
+def test_trim_keeps_padding_around_the_speech():
+    audio = recording()
+    clip, info = trim_audio(audio, RATE, pad_ms=150)
+    pad = int(RATE * 0.15)
+    assert (info["start"], info["end"]) == (16000, 24000)
+    assert info["offset"] == 16000 - pad
+    assert info["samples"] == len(clip) == 8000 + 2 * pad
+    assert np.array_equal(clip, audio[16000 - pad:24000 + pad])
+    assert not info["truncated"]
+
+
+def test_trim_without_speech_keeps_the_clip():
+    audio = np.zeros(RATE, dtype=np.int16)
+    clip, info = trim_audio(audio, RATE)
+    assert np.array_equal(clip, audio)
+    assert not info["truncated"]
+
+
+def test_align_centres_short_speech_in_silence():
+    audio = recording()
+    clip, info = trim_audio(audio, RATE, pad_ms=0, align_seconds=1.0)
+    assert len(clip) == RATE
+    # 8000 samples of speech with 4000 of silence either side
+    assert info["offset"] == 16000 - 4000
+    assert not clip[:4000].any() and not clip[12000:].any()
+    assert np.array_equal(clip[4000:12000], audio[16000:24000])
+    assert not info["truncated"]
+
+
+def test_align_cuts_long_speech_around_its_middle():
+    audio = recording(speech_at=0.5, speech_seconds=2.0)
+    clip, info = trim_audio(audio, RATE, pad_ms=0, align_seconds=1.0)
+    assert len(clip) == RATE
+    centre = (8000 + 40000) // 2
+    assert info["offset"] == centre - RATE // 2
+    assert np.array_equal(clip, audio[info["offset"]:info["offset"] + RATE])
+    assert info["truncated"]
+
+
+def test_speech_at_the_edges_is_flagged_truncated():
+    assert trim_audio(recording(speech_at=0.0), RATE)[1]["truncated"]
+    assert trim_audio(recording(seconds=1.5, speech_at=1.0), RATE)[1]["truncated"]
+    assert not trim_audio(recording(seconds=1.6, speech_at=1.0), RATE)[1]["truncated"]
+
+
+def test_trim_dataset_writes_the_manifest_and_skips_trimmed_clips(tmp_path, capsys):
+    folder = tmp_path / "give_me_wrench"
+    folder.mkdir()
+    write_clip(str(folder / "give_me_wrench_001.wav"), recording())
+    write_clip(str(folder / "give_me_wrench_002.wav"), recording(speech_at=0.0, seed=1))
+
+    # A dry run reports but leaves the files and manifest alone
+    assert len(trim_dataset(str(tmp_path), dry_run=True)) == 2
+    assert load_manifest(str(tmp_path)) == {}
+    assert len(read_clip(str(folder / "give_me_wrench_001.wav"))[0]) == 3 * RATE
+
+    trimmed = dict(trim_dataset(str(tmp_path)))
+    key = "give_me_wrench/give_me_wrench_001.wav"
+    rows = load_manifest(str(tmp_path))
+    assert sorted(rows) == sorted(trimmed)
+    assert rows[key]["start"] == str(trimmed[key]["start"]) == "16000"
+    assert rows[key]["offset"] == str(trimmed[key]["offset"])
+    assert rows["give_me_wrench/give_me_wrench_002.wav"]["truncated"] == "True"
+    clip, rate = read_clip(str(folder / "give_me_wrench_001.wav"))
+    assert len(clip) == trimmed[key]["samples"]
+
+    # Clips already in the manifest are not trimmed a second time
+    assert trim_dataset(str(tmp_path)) == []
+    assert "Nothing to trim" in capsys.readouterr().out
+    assert len(read_clip(str(folder / "give_me_wrench_001.wav"))[0]) == len(clip)
@@ -0,0 +1,95 @@
+# test_shared_audio_pipeline.py - Shared-memory ring: wraparound, lapped readers and the blocking stream
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from capture_monitor import CaptureMonitor
+from shared_audio_pipeline import WRITE_CLAIM, RingInputStream, SharedRingBuffer
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRingBuffer(capacity=1000)
+    yield ring
+    ring.close()
+
+
+def test_read_wraps_around(ring):
+    ring.write(np.arange(900, dtype=np.int16))
+    views, read_pos, lost = ring.read(0)
+    assert read_pos == 900 and lost == 0
+
+    ring.write(np.arange(900, 1300, dtype=np.int16))
+    views, read_pos, lost = ring.read(900)
+    assert len(views) == 2
+    assert np.array_equal(np.concatenate(views), np.arange(900, 1300))
+    assert read_pos == 1300 and lost == 0
+
+
+def test_reader_a_whole_buffer_behind_skips_ahead(ring):
+    for start in range(0, 2500, 500):
+        ring.write(np.arange(start, start + 500, dtype=np.int16))
+    data, read_pos, lost = ring.copy(0)
+    assert lost == 1500
+    assert np.array_equal(np.frombuffer(data, dtype=np.int16), np.arange(1500, 2500))
+    assert read_pos == 2500
+
+
+def test_copy_drops_samples_overwritten_while_copying(ring):
+    ring.write(np.arange(1000, dtype=np.int16))
+    read = ring.read
+
+    def lapped_read(read_pos, max_samples=None):
+        result = read(read_pos, max_samples)
+        # The writer runs while the reader still holds its views
+        ring.write(np.arange(1000, 1300, dtype=np.int16))
+        return result
+
+    ring.read = lapped_read
+    data, read_pos, lost = ring.copy(0)
+    samples = np.frombuffer(data, dtype=np.int16)
+    assert lost == 300
+    assert np.array_equal(samples, np.arange(300, 1000))
+    assert read_pos == 1000
+
+
+def test_claim_covers_a_write_in_progress(ring):
+    ring.write(np.arange(1000, dtype=np.int16))
+    # Published position still 1000, but the writer has claimed up to 1200
+    ring.header[WRITE_CLAIM] = 1200
+    assert ring.overwritten(0) == 200
+    assert ring.overwritten(500) == 0
+
+
+def test_stream_delivers_every_sample_in_order(ring):
+    stream = RingInputStream(ring)
+    chunks = [np.arange(i, i + 160, dtype=np.int16) for i in range(0, 3200, 160)]
+
+    def capture():
+        for chunk in chunks:
+            ring.write(chunk)
+            time.sleep(160 / 16000)  # real time
+
+    writer = threading.Thread(target=capture)
+    writer.start()
+    monitor = CaptureMonitor(stream, buffer_frames=ring.capacity)
+    received = np.concatenate([np.frombuffer(monitor.read(256), dtype=np.int16) for _ in range(12)])
+    writer.join()
+    assert np.array_equal(received, np.arange(3072))
+    assert stream.lost == 0
+    assert monitor.overflows == 0
+
+
+def test_stream_starts_at_the_newest_sample(ring):
+    ring.write(np.arange(500, dtype=np.int16))
+    stream = RingInputStream(ring)
+    ring.write(np.arange(500, 600, dtype=np.int16))
+    assert np.array_equal(np.frombuffer(stream.read(100), dtype=np.int16), np.arange(500, 600))
+
+
+def test_stream_without_capture_times_out(ring):
+    stream = RingInputStream(ring, timeout=0.1)
+    with pytest.raises(OSError):
+        stream.read(256)
@@ -0,0 +1,138 @@
+# test_utterance_log.py - Segment format, rotation, the size cap, flushing on close and replay
+import glob
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+import racing_recognizer
+from utterance_log import UtteranceLog, iter_records, replay
+
+
+def pcm(seconds, seed=0):
+    return np.random.default_rng(seed).integers(-3000, 3000, int(16000 * seconds), dtype=np.int16)
+
+
+def segments(directory):
+    return sorted(glob.glob(os.path.join(directory, "utterances-*.seg")))
+
+
+def test_records_round_trip(tmp_path):
+    log = UtteranceLog(str(tmp_path))
+    clips = [pcm(0.1, seed=i) for i in range(3)]
+    for i, clip in enumerate(clips):
+        log.log({"time": float(i), "transcript": f"take {i}", "timings": {"recognize_s": 0.2}}, clip)
+    log.log({"time": 3.0, "transcript": None})
+    log.close()
+
+    records = list(iter_records(str(tmp_path)))
+    assert [header["transcript"] for header, audio in records] == ["take 0", "take 1", "take 2", None]
+    for (header, audio), clip in zip(records, clips):
+        assert audio == clip.tobytes()
+        assert header["session"] == log.session
+        assert (header["rate"], header["sample_width"]) == (16000, 2)
+        assert header["timings"] == {"recognize_s": 0.2}
+    assert records[-1][1] == b""
+    assert list(iter_records(str(tmp_path), session="19990101-000000")) == []
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    log = UtteranceLog(str(tmp_path))
+    for i in range(2):
+        log.log({"time": float(i)}, pcm(0.1, seed=i))
+    log.close()
+    path = segments(str(tmp_path))[0]
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 10)
+    assert [header["time"] for header, audio in iter_records(str(tmp_path))] == [0.0]
+
+
+def test_segments_rotate_at_the_size_limit(tmp_path):
+    # Each entry is a little over 3.2 kB, so two of them never share a 5 kB segment
+    log = UtteranceLog(str(tmp_path), segment_bytes=5000)
+    for i in range(4):
+        log.log({"time": float(i)}, pcm(0.1, seed=i))
+    log.close()
+
+    paths = segments(str(tmp_path))
+    assert len(paths) == 4
+    assert all(os.path.getsize(path) <= 5000 for path in paths)
+    assert [header["time"] for header, audio in iter_records(str(tmp_path))] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_size_cap_deletes_the_oldest_segments(tmp_path):
+    log = UtteranceLog(str(tmp_path), segment_bytes=5000, max_bytes=10000)
+    for i in range(8):
+        log.log({"time": float(i)}, pcm(0.1, seed=i))
+    log.close()
+
+    paths = segments(str(tmp_path))
+    names = [os.path.basename(path) for path in paths]
+    assert f"utterances-{log.session}-0001.seg" not in names
+    assert names[-1] == f"utterances-{log.session}-0008.seg"
+    # At rotation the older segments fit the cap; the new one then fills up to a segment
+    assert sum(os.path.getsize(path) for path in paths) <= 10000 + 5000
+    times = [header["time"] for header, audio in iter_records(str(tmp_path))]
+    assert times == [float(i) for i in range(8 - len(times), 8)]
+
+
+def test_close_flushes_everything_queued(tmp_path, monkeypatch):
+    write = UtteranceLog.write
+
+    def slow_write(self, *item):
+        time.sleep(0.01)
+        write(self, *item)
+
+    monkeypatch.setattr(UtteranceLog, "write", slow_write)
+    log = UtteranceLog(str(tmp_path))
+    for i in range(30):
+        log.log({"time": float(i)}, pcm(0.05, seed=i))
+    # Most entries are still queued when close() is called
+    assert log.written < 30
+    log.close()
+
+    assert not log.writer.is_alive()
+    assert log.written == 30 and log.dropped == 0
+    assert len(list(iter_records(str(tmp_path)))) == 30
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+    monkeypatch.setattr(UtteranceLog, "write", lambda self, *item: time.sleep(0.05))
+    log = UtteranceLog(str(tmp_path), queue_size=2)
+    started = time.perf_counter()
+    for i in range(10):
+        log.log({"time": float(i)}, pcm(0.05))
+    assert time.perf_counter() - started < 0.2
+    assert log.dropped >= 7
+    log.close()
+
+
+def test_replay_reruns_recognition_and_routing(tmp_path, monkeypatch, capsys):
+    heard = {1600: "give me the hammer", 3200: "what time is it"}
+
+    def scripted(audio):
+        return heard[len(audio.frame_data) // 2], 0.9
+    scripted.name = "scripted"
+
+    # Replay looks for the Vosk model in the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "vosk-model-small-en-us-0.15").mkdir()
+    monkeypatch.setitem(sys.modules, "vosk", types.SimpleNamespace(Model=lambda path: None))
+    monkeypatch.setattr(racing_recognizer, "vosk_backend", lambda model: scripted)
+
+    log = UtteranceLog("logs")
+    log.log({"time": time.time(), "state": "active", "transcript": "give me the hammer", "intent": "tool",
+             "timings": {"recognize_s": 0.4}}, pcm(0.1))
+    log.log({"time": time.time(), "state": "active", "transcript": None, "intent": None}, pcm(0.2))
+    log.close()
+
+    results = replay("logs", offline=True)
+    assert [(r["replayed"], r["replayed_intent"], r["backend"]) for r in results] == [
+        ("give me the hammer", "tool", "scripted"), ("what time is it", "time", "scripted")]
+    assert "1/2 utterances reproduced exactly" in capsys.readouterr().out
+
+    # Only what was not understood the first time
+    failures = replay("logs", failures_only=True, offline=True)
+    assert [r["logged"] for r in failures] == [None]
@@ -0,0 +1,222 @@
+# utterance_log.py - Record every utterance's audio and outcome off the hot path, and replay them later
+import argparse
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Each entry: header length and audio length, then the JSON header, then raw PCM
+ENTRY = struct.Struct("<II")
+
+
+class UtteranceLog:
+    """Background writer for utterance records in size-capped, rotating segment files"""
+
+    def __init__(self, directory="utterance_logs", segment_bytes=32 * 1024 * 1024,
+                 max_bytes=512 * 1024 * 1024, queue_size=256):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.session = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.segment_index = 0
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+        self.writer = threading.Thread(target=self.run, daemon=True)
+        self.writer.start()
+
+    def log(self, record, audio=None, rate=16000, sample_width=2):
+        """Hand a record and a reference to its PCM buffer to the writer; never blocks"""
+        try:
+            self.queue.put_nowait((record, audio, rate, sample_width))
+        except queue.Full:
+            # Losing a log entry is better than stalling the listen loop
+            self.dropped += 1
+
+    def run(self):
+        """Writer thread: serialize queued records until close()"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self.write(*item)
+            except Exception as e:
+                print(f"⚠️  Utterance log write failed: {e}")
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def write(self, record, audio, rate, sample_width):
+        header = dict(record, session=self.session, rate=rate, sample_width=sample_width)
+        header_bytes = json.dumps(header).encode('utf-8')
+        audio = memoryview(audio if audio is not None else b"")
+
+        size = ENTRY.size + len(header_bytes) + audio.nbytes
+        if self.file is None or self.file.tell() + size > self.segment_bytes:
+            self.rotate()
+
+        self.file.write(ENTRY.pack(len(header_bytes), audio.nbytes))
+        self.file.write(header_bytes)
+        self.file.write(audio)
+        self.file.flush()
+        self.written += 1
+
+    def rotate(self):
+        """Start a new segment and delete the oldest ones beyond the size cap"""
+        if self.file:
+            self.file.close()
+        self.segment_index += 1
+        path = os.path.join(self.directory, f"utterances-{self.session}-{self.segment_index:04d}.seg")
+        self.file = open(path, 'wb')
+
+        segments = sorted(glob.glob(os.path.join(self.directory, "utterances-*.seg")))
+        total = sum(os.path.getsize(segment) for segment in segments)
+        for segment in segments:
+            if total <= self.max_bytes or segment == path:
+                break
+            total -= os.path.getsize(segment)
+            os.remove(segment)
+
+    def close(self, timeout=5):
+        """Flush everything queued so far and stop the writer"""
+        self.queue.put(None)
+        self.writer.join(timeout)
+
+
+def read_segment(path):
+    """Yield (header, pcm_bytes) for each entry in a segment file, stopping at a torn tail"""
+    with open(path, 'rb') as f:
+        while True:
+            prefix = f.read(ENTRY.size)
+            if len(prefix) < ENTRY.size:
+                return
+            header_len, audio_len = ENTRY.unpack(prefix)
+            header = f.read(header_len)
+            audio = f.read(audio_len)
+            if len(header) < header_len or len(audio) < audio_len:
+                return
+            yield json.loads(header), audio
+
+
+def iter_records(directory="utterance_logs", session=None):
+    """All logged entries in order, optionally for one session"""
+    pattern = f"utterances-{session}-*.seg" if session else "utterances-*.seg"
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        yield from read_segment(path)
+
+
+def list_sessions(directory="utterance_logs"):
+    """Print a per-session summary of what was logged"""
+    sessions = {}
+    for header, audio in iter_records(directory):
+        stats = sessions.setdefault(header['session'], {"utterances": 0, "failed": 0, "seconds": 0.0})
+        stats["utterances"] += 1
+        stats["failed"] += header.get('transcript') is None
+        stats["seconds"] += len(audio) / (header['rate'] * header['sample_width'])
+
+    for session, stats in sorted(sessions.items()):
+        print(f"📁 {session}: {stats['utterances']} utterances, {stats['failed']} not understood, "
+              f"{stats['seconds']:.0f}s of audio")
+    return sessions
+
+
+def replay(directory="utterance_logs", session=None, failures_only=False, offline=False):
+    """Feed logged audio back through recognition and intent routing; report differences and timing"""
+    import speech_recognition as sr
+    from guido_voice_system import GuidoVoiceSystem
+    from cloud_recognizer import CloudRecognizer
+    from racing_recognizer import RacingRecognizer, cloud_backend, vosk_backend
+    from phonetic_index import UNROUTED
+
+    # Only the vocabulary is needed, not the microphone or TTS
+    guido = GuidoVoiceSystem.__new__(GuidoVoiceSystem)
+    guido.setup_vocabulary()
+
+    cloud = None if offline else CloudRecognizer()
+    backends = [cloud_backend(cloud)] if cloud else []
+    model_path = "vosk-model-small-en-us-0.15"
+    if os.path.exists(model_path):
+        from vosk import Model
+        backends.append(vosk_backend(Model(model_path)))
+    if not backends:
+        print("❌ No recognition backend available for replay")
+        return []
+    recognizer = RacingRecognizer(backends)
+
+    results = []
+    for header, pcm in iter_records(directory, session):
+        if failures_only and header.get('transcript') is not None and header.get('intent') not in UNROUTED:
+            continue
+        audio = sr.AudioData(pcm, header['rate'], header['sample_width'])
+
+        start = time.perf_counter()
+        try:
+            text, confidence, backend = recognizer.recognize(audio)
+        except (sr.UnknownValueError, sr.RequestError):
+            text, confidence, backend = None, None, None
+        elapsed = time.perf_counter() - start
+
+        active = header.get('state') == "active"
+        corrected = guido.correct_transcript(text, active, quiet=True) if text else None
+        intent = guido.utterance_intent(corrected, active) if text else None
+        results.append({
+            "time": header['time'],
+            "logged": header.get('transcript'),
+            "replayed": text,
+            "corrected": corrected,
+            "logged_intent": header.get('intent'),
+            "replayed_intent": intent,
+            "backend": backend,
+            "confidence": confidence,
+            "logged_recognize_s": header.get('timings', {}).get('recognize_s'),
+            "replayed_recognize_s": elapsed,
+        })
+    recognizer.close()
+    if cloud:
+        cloud.close()
+
+    if not results:
+        print("❌ No matching utterances in the log")
+        return results
+
+    print("\n=== REPLAY REPORT ===")
+    changed = [r for r in results if r['replayed'] != r['logged'] or r['replayed_intent'] != r['logged_intent']]
+    for r in changed[:20]:
+        stamp = datetime.fromtimestamp(r['time']).strftime("%H:%M:%S")
+        print(f"   🔁 {stamp} '{r['logged']}' ({r['logged_intent']}) -> '{r['replayed']}' ({r['replayed_intent']})")
+    if len(changed) > 20:
+        print(f"   ... and {len(changed) - 20} more")
+
+    replayed = np.array([r['replayed_recognize_s'] for r in results]) * 1000
+    logged = np.array([r['logged_recognize_s'] for r in results if r['logged_recognize_s'] is not None]) * 1000
+    print(f"\n📊 {len(results) - len(changed)}/{len(results)} utterances reproduced exactly")
+    print(f"⏱️  Recognition now: median {np.median(replayed):.0f} ms, p95 {np.percentile(replayed, 95):.0f} ms")
+    if len(logged):
+        print(f"⏱️  Recognition when logged: median {np.median(logged):.0f} ms, "
+              f"p95 {np.percentile(logged, 95):.0f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and replay logged utterances")
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument("--dir", default="utterance_logs")
+    parser.add_argument("--session", help="session id as shown by 'list'")
+    parser.add_argument("--failures", action="store_true",
+                        help="only replay utterances that were not understood")
+    parser.add_argument("--offline", action="store_true", help="skip the cloud backend")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_sessions(args.dir)
+    else:
+        replay(args.dir, args.session, args.failures, args.offline)
@@ -1,28 +1,60 @@
-import pyaudio
 import wave
 import os
 import time
+import threading
+import queue
 import numpy as np
 from scipy import signal
-import noisereduce as nr
+from audio_utils import UtteranceSegmenter, noise_threshold
+from capture_monitor import CaptureMonitor
+from beamformer import Beamformer, BeamformedStream, input_channels
+from sample_trimmer import trim_audio, record_trim, next_sample_number
+from spoken_phrases import spoken_phrase
+
 
 class VoiceDataCollector:
     def __init__(self, data_dir="voice_dataset"):
+        # Imported here so the DSP methods can be used (and benchmarked) without audio hardware
+        import pyaudio
+        
         self.data_dir = data_dir
         self.create_folder_structure()
         
         # Audio settings
         self.chunk = 1024
         self.format = pyaudio.paInt16
-        self.channels = 1
+        self.channels = 1  # saved samples; an array is beamformed down to this
         self.rate = 16000
-        self.record_seconds = 3
+        self.record_seconds = 4  # generous window; trimming removes the unused silence
+        
+        # Saved samples are cut to their speech plus this padding, optionally to a fixed length
+        self.trim_pad_ms = 150
+        self.align_seconds = None
         
         self.audio = pyaudio.PyAudio()
         
+        # Open every mic of an array and combine them into one enhanced channel
+        self.input_channels = input_channels(self.audio)
+        self.beamformer = Beamformer(self.input_channels, self.rate) if self.input_channels > 1 else None
+        if self.beamformer:
+            print(f"🎙️  {self.input_channels}-channel input - beamforming to mono")
+        
+        # Capture buffer reused for every sample, sized for a full recording
+        self.chunks_per_sample = int(self.rate / self.chunk * self.record_seconds)
+        self.capture_buffer = np.empty(self.chunks_per_sample * self.chunk, dtype=np.int16)
+        
         # Noise reduction settings
         self.noise_profile = None
         self.is_noise_profile_captured = False
+        
+        # Amplitude gain of the most recent enhancement, kept so the raw noise profile can be scaled to match
+        self.enhancement_gain = 1.0
+        
+        # Drop statistics from the most recent capture
+        self.capture_metrics = {}
+        
+        # Keypress queue for rejecting takes in hands-free sessions
+        self.rejections = None
     
     def create_folder_structure(self):
         """Create organized folder structure with enhanced guide commands"""
@@ -102,19 +134,15 @@ class VoiceDataCollector:
         print("    🎤 Recording NOW... Speak clearly!")
         print(f"    Say: '{self.get_spoken_phrase(phrase)}'")
         
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
+        stream = self.open_input_stream()
         
-        frames = []
+        # Copy each chunk straight into the preallocated buffer
+        audio_array = self.capture_buffer
+        monitor = CaptureMonitor(stream, self.rate, buffer_frames=self.chunk)
         print("    [", end="")
-        for i in range(0, int(self.rate / self.chunk * self.record_seconds)):
-            data = stream.read(self.chunk)
-            frames.append(data)
+        for i in range(self.chunks_per_sample):
+            data = monitor.read(self.chunk)
+            audio_array[i * self.chunk:(i + 1) * self.chunk] = np.frombuffer(data, dtype=np.int16)
             print("█", end="", flush=True)  # Progress indicator
         
         print("]")
@@ -122,103 +150,154 @@ class VoiceDataCollector:
         
         stream.stop_stream()
         stream.close()
+        self.check_capture(monitor)
         
-        # Process audio
-        raw_audio = b''.join(frames)
-        audio_array = np.frombuffer(raw_audio, dtype=np.int16)
-        
-        # Apply noise reduction and enhancement
+        return self.save_processed_sample(audio_array, filename)
+    
+    def open_input_stream(self):
+        """Input stream that always reads mono, beamformed when the device is an array"""
+        stream = self.audio.open(
+            format=self.format,
+            channels=self.input_channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk
+        )
+        return BeamformedStream(stream, self.beamformer) if self.beamformer else stream
+    
+    def save_processed_sample(self, audio_array, filename):
+        """Apply noise reduction and enhancement, then save as WAV"""
         print("    🔊 Processing audio (noise reduction)...")
         clean_audio = self.apply_noise_reduction(audio_array)
         enhanced_audio = self.apply_audio_enhancement(clean_audio)
+        trimmed_audio, trim_info = trim_audio(enhanced_audio, self.rate, self.trim_pad_ms, self.align_seconds)
         
         # Save processed recording
         wf = wave.open(filename, 'wb')
         wf.setnchannels(self.channels)
         wf.setsampwidth(self.audio.get_sample_size(self.format))
         wf.setframerate(self.rate)
-        wf.writeframes(enhanced_audio.tobytes())
+        wf.writeframes(memoryview(trimmed_audio))  # no intermediate bytes copy
         wf.close()
         
-        print(f"    💾 Saved: {filename}")
+        # Keep the original offsets so the untrimmed timing can be reconstructed
+        trim_info["gain"] = self.enhancement_gain
+        record_trim(self.data_dir, filename, trim_info)
+        
+        print(f"    💾 Saved: {filename} ({trim_info['samples'] / self.rate:.1f}s)")
+        if trim_info["truncated"]:
+            print("    ⚠️  Speech reached the edge of the recording and may be cut off - consider re-recording")
         return filename
     
+    def next_sample_number(self, category, subfolder):
+        """Next free sample number so sessions never overwrite earlier takes"""
+        return next_sample_number(f"{self.data_dir}/{category}/{subfolder}")
+    
+    def start_rejection_reader(self):
+        """Background reader so a keypress never blocks recording"""
+        if self.rejections is None:
+            self.rejections = queue.Queue()
+            def read_rejections():
+                while True:
+                    input()
+                    self.rejections.put(True)
+            threading.Thread(target=read_rejections, daemon=True).start()
+        return self.rejections
+    
+    def collect_session(self, category, phrases, samples_per_phrase=5):
+        """Hands-free collection: record continuously and file each utterance automatically"""
+        print(f"\n=== HANDS-FREE SESSION: {category.upper()} ===")
+        print("Just speak each prompt - recording never stops.")
+        print("Press Enter at any time to reject the last saved take.\n")
+        
+        rejections = self.start_rejection_reader()
+        while not rejections.empty():
+            rejections.get()
+        
+        segmenter = UtteranceSegmenter(self.rate, noise_threshold(self.noise_profile))
+        takes = [(folder, i) for folder in phrases for i in range(samples_per_phrase)]
+        saved = []
+        position = 0
+        start_time = time.time()
+        
+        stream = self.open_input_stream()
+        
+        monitor = CaptureMonitor(stream, self.rate, buffer_frames=self.chunk)
+        try:
+            print(f"🎤 Say: '{self.get_spoken_phrase(takes[0][0])}'")
+            while position < len(takes):
+                data = monitor.read(self.chunk)
+                utterances = segmenter.feed(np.frombuffer(data, dtype=np.int16))
+                
+                # Step back one prompt for every rejected take
+                while not rejections.empty():
+                    rejections.get()
+                    if saved:
+                        rejected = saved.pop()
+                        os.remove(rejected)
+                        position -= 1
+                        segmenter.reset()
+                        utterances = []
+                        print(f"    🗑️  Rejected: {rejected}")
+                        print(f"🎤 Say again: '{self.get_spoken_phrase(takes[position][0])}'")
+                
+                for utterance in utterances:
+                    folder, _ = takes[position]
+                    number = self.next_sample_number(category, folder)
+                    filename = f"{self.data_dir}/{category}/{folder}/{folder}_{number:03d}.wav"
+                    saved.append(self.save_processed_sample(utterance, filename))
+                    position += 1
+                    
+                    if position >= len(takes):
+                        break
+                    print(f"🎤 Say: '{self.get_spoken_phrase(takes[position][0])}'")
+        finally:
+            stream.stop_stream()
+            stream.close()
+            self.check_capture(monitor)
+        
+        minutes = (time.time() - start_time) / 60
+        print(f"\n✅ Session complete: {len(saved)} samples in {minutes:.1f} min "
+              f"({len(saved) / max(minutes, 1e-6):.1f} samples/min)")
+        return saved
+    
+    def check_capture(self, monitor):
+        """Keep drop statistics from the last capture and warn if audio was lost"""
+        self.capture_metrics = monitor.metrics()
+        if self.capture_metrics["overflows"] or self.capture_metrics["gaps"]:
+            print(f"    ⚠️  Dropped audio: {self.capture_metrics['overflows']} overflows, "
+                  f"{self.capture_metrics['gap_seconds']:.2f}s of gaps - consider re-recording")
+        return self.capture_metrics
+    
     def get_spoken_phrase(self, phrase):
         """Convert folder names to spoken phrases"""
-        phrase_map = {
-            # Activation
-            "guido_wake_up": "Guido wake up",
-            "guido_activate": "Guido activate",
-            "hey_guido": "Hey Guido",
-            "wake_up_guido": "Wake up Guido",
-            "hello_guido": "Hello Guido",
-            
-            # Tool Delivery
-            "give_me_bolt": "Give me the bolt",
-            "give_me_hammer": "Give me the hammer",
-            "give_me_measuring_tape": "Give me the measuring tape",
-            "give_me_plier": "Give me the plier",
-            "give_me_screwdriver": "Give me the screwdriver",
-            "give_me_wrench": "Give me the wrench",
-            
-            # Enhanced Manual Reading
-            "read_manual": "Read the manual",
-            "guide_me": "Guide me",
-            "help_me": "Help me",
-            "show_procedure": "Show the procedure",
-            "how_to_change_tire": "How to change a tire",
-            "how_to_replace_tire": "How to replace a tire",
-            "tire_change_guide": "Tire change guide",
-            "change_car_tire": "Change car tire",
-            "how_to_change_engine_oil": "How to change engine oil",
-            "engine_oil_change": "Engine oil change",
-            "oil_change_guide": "Oil change guide",
-            "change_oil": "Change oil",
-            "car_maintenance": "Car maintenance",
-            "repair_instructions": "Repair instructions",
-            
-            # Rearrangement
-            "arrange_tools": "Arrange the tools",
-            "organize_tools": "Organize the tools",
-            "clean_up": "Clean up",
-            "put_in_order": "Put tools in order",
-            
-            # System
-            "deactivate": "Deactivate",
-            "go_to_sleep": "Go to sleep",
-            "stop": "Stop",
-            "what_time_is_it": "What time is it"
-        }
-        
-        return phrase_map.get(phrase, phrase.replace('_', ' '))
+        return spoken_phrase(phrase)
     
     def capture_noise_profile(self, duration=2):
         """Capture ambient noise profile for noise reduction"""
         print("\n🔊 Capturing ambient noise profile...")
         print("Please stay silent for 2 seconds...")
         
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
+        stream = self.open_input_stream()
         
-        noise_frames = []
-        for i in range(0, int(self.rate / self.chunk * duration)):
-            data = stream.read(self.chunk)
-            noise_frames.append(data)
+        # Noise reduction works on float32, so capture straight into a float32 array
+        n_chunks = int(self.rate / self.chunk * duration)
+        noise_profile = np.empty(n_chunks * self.chunk, dtype=np.float32)
+        monitor = CaptureMonitor(stream, self.rate, buffer_frames=self.chunk)
+        for i in range(n_chunks):
+            data = monitor.read(self.chunk)
+            noise_profile[i * self.chunk:(i + 1) * self.chunk] = np.frombuffer(data, dtype=np.int16)
         
         stream.stop_stream()
         stream.close()
+        self.check_capture(monitor)
         
-        # Convert to numpy array for noise reduction
-        noise_audio = b''.join(noise_frames)
-        noise_array = np.frombuffer(noise_audio, dtype=np.int16)
-        self.noise_profile = noise_array.astype(np.float32)
+        self.noise_profile = noise_profile
         self.is_noise_profile_captured = True
         
+        # Keep the profile with the dataset so quality checks can use it later
+        np.save(f"{self.data_dir}/noise_profile.npy", self.noise_profile)
+        
         print("✅ Noise profile captured!")
         return self.noise_profile
     
@@ -226,6 +305,7 @@ class VoiceDataCollector:
         """Apply noise reduction to recorded audio"""
         if not self.is_noise_profile_captured:
             return audio_data
+        import noisereduce as nr
         
         try:
             # Convert to float32 for processing
@@ -249,19 +329,25 @@ class VoiceDataCollector:
     
     def apply_audio_enhancement(self, audio_data):
         """Apply basic audio enhancement"""
+        self.enhancement_gain = 1.0
         try:
             # Normalize audio
             audio_float = audio_data.astype(np.float32)
-            max_val = np.max(np.abs(audio_float))
+            max_val = max(float(audio_float.max()), -float(audio_float.min()))
+            gain = 1.0
             if max_val > 0:
-                audio_float = audio_float / max_val * 0.9  # Normalize to 90% of max
+                gain = 0.9 / max_val
+                audio_float *= gain  # Normalize to 90% of max
             
             # Apply high-pass filter to remove low-frequency noise
-            sos = signal.butter(4, 100, 'hp', fs=self.rate, output='sos')
+            # (float32 coefficients keep sosfilt from promoting to float64)
+            sos = signal.butter(4, 100, 'hp', fs=self.rate, output='sos').astype(np.float32)
             filtered_audio = signal.sosfilt(sos, audio_float)
             
             # Convert back to int16
-            enhanced_audio = (filtered_audio * 32767).astype(np.int16)
+            filtered_audio *= 32767
+            enhanced_audio = filtered_audio.astype(np.int16)
+            self.enhancement_gain = gain * 32767
             return enhanced_audio
             
         except Exception as e:
@@ -329,8 +415,8 @@ class VoiceDataCollector:
         }
         
         print("=== COLLECTING ACTIVATION PHRASES ===")
-        for folder_name, spoken_phrase in phrases.items():
-            print(f"\n📁 Now recording: '{spoken_phrase}'")
+        for folder_name, activation_phrase in phrases.items():
+            print(f"\n📁 Now recording: '{activation_phrase}'")
             input("Press Enter to start recording this phrase category...")
             
             for i in range(samples_per_phrase):
@@ -340,7 +426,7 @@ class VoiceDataCollector:
                 if i < samples_per_phrase - 1:
                     print("    ⏸️  Ready for next sample...")
             
-            print(f"✅ Completed {samples_per_phrase} samples for '{spoken_phrase}'\n")
+            print(f"✅ Completed {samples_per_phrase} samples for '{activation_phrase}'\n")
 
     def collect_tool_delivery_commands(self, samples_per_command=5):
         commands = {
@@ -503,8 +589,9 @@ if __name__ == "__main__":
     print("4. Rearrangement Commands (Organize tools)")
     print("5. System Commands (Deactivate, time, etc.)")
     print("6. COLLECT ALL (Recommended)")
+    print("7. Hands-free session (records continuously, no keypress per sample)")
     
-    choice = input("\nEnter your choice (1-6): ").strip()
+    choice = input("\nEnter your choice (1-7): ").strip()
     
     if choice == '1':
         collector.collect_activation_phrases(8)
@@ -524,6 +611,10 @@ if __name__ == "__main__":
         collector.collect_tool_delivery_commands(5)
         collector.collect_manual_reading_commands(4)
         # Add other methods
+    elif choice == '7':
+        for category in ['activation', 'tool_delivery', 'manual_reading']:
+            folders = sorted(os.listdir(f"{collector.data_dir}/{category}"))
+            collector.collect_session(category, folders, 5)
     else:
         collector.collect_activation_phrases(5)
     
@@ -0,0 +1,236 @@
+# wake_detector.py - Cheap always-on first stage that decides when full recognition is worth running
+import argparse
+import os
+import time
+import wave
+
+import numpy as np
+from scipy.fft import dct
+
+from audio_utils import UtteranceSegmenter
+
+RATE = 16000
+FRAME = 400       # 25 ms analysis window
+HOP = 160         # 10 ms hop
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+SEGMENTS = 8      # fixed-length embedding: mean MFCC over this many slices
+EDGE_MARGIN = 5.8 # log-energy drop (25 dB) that counts as silence at the edges
+
+
+def mel_filterbank(rate=RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Triangular mel filters as a (n_mels, n_fft // 2 + 1) matrix"""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    edges = to_hz(np.linspace(to_mel(0), to_mel(rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1 / rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+
+MEL_FILTERS = mel_filterbank()
+WINDOW = np.hamming(FRAME).astype(np.float32)
+
+
+def mfcc(audio):
+    """MFCCs for int16 audio as a (frames, N_MFCC) array, with c0 replaced by frame log energy"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FRAME:
+        return np.zeros((0, N_MFCC), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME)[::HOP] * WINDOW
+    power = np.abs(np.fft.rfft(frames, N_FFT)) ** 2
+    mel = np.log(power @ MEL_FILTERS.T + 1e-6)
+    features = dct(mel, type=2, norm='ortho', axis=1)[:, :N_MFCC]
+    features[:, 0] = np.log(power.sum(axis=1) + 1e-6)
+    return features
+
+
+def embed(features):
+    """Fixed-length, loudness-independent vector for a variable-length MFCC sequence"""
+    if len(features) < SEGMENTS:
+        return None
+    # Trim quiet edges so padding differences do not shift the slices
+    loud = np.nonzero(features[:, 0] > features[:, 0].max() - EDGE_MARGIN)[0]
+    features = features[loud[0]:loud[-1] + 1]
+    if len(features) < SEGMENTS:
+        return None
+    # Drop the energy column (loudness) and remove the channel with cepstral mean normalization
+    features = features[:, 1:] - features[:, 1:].mean(axis=0)
+    slices = np.array_split(features, SEGMENTS)
+    vector = np.concatenate([s.mean(axis=0) for s in slices])
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def load_wav(path):
+    """Read a 16-bit WAV as mono int16"""
+    with wave.open(path, 'rb') as wf:
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        channels = wf.getnchannels()
+    return audio.reshape(-1, channels)[:, 0] if channels > 1 else audio
+
+
+class WakeDetector:
+    """Energy VAD on every frame, MFCC template match only at the end of each voiced segment"""
+
+    def __init__(self, templates, threshold=None, energy_threshold=300, rate=RATE):
+        self.rate = rate
+        self.templates = [(vector, n_frames) for vector, n_frames in templates if vector is not None]
+        self.matrix = np.array([vector for vector, _ in self.templates])
+        self.lengths = np.array([n_frames for _, n_frames in self.templates])
+        self.threshold = threshold if threshold is not None else self.calibrate()
+        self.segmenter = UtteranceSegmenter(rate, energy_threshold, min_silence_ms=300, pad_ms=200)
+        self.stage1_fires = 0
+
+    @classmethod
+    def from_dataset(cls, data_dir="voice_dataset", **kwargs):
+        """Build templates from voice_dataset/activation/*; returns None if there are no samples"""
+        templates = []
+        activation_dir = os.path.join(data_dir, "activation")
+        for root, dirs, files in os.walk(activation_dir):
+            for name in sorted(files):
+                if name.endswith('.wav'):
+                    templates.append(cls.template_from_audio(load_wav(os.path.join(root, name))))
+        templates = [t for t in templates if t[0] is not None]
+        return cls(templates, **kwargs) if len(templates) >= 2 else None
+
+    @staticmethod
+    def template_from_audio(audio, energy_threshold=300):
+        """Trim a recorded sample to its speech and embed it"""
+        segmenter = UtteranceSegmenter(RATE, energy_threshold, pad_ms=50)
+        segments = segmenter.feed(audio)
+        tail = segmenter.flush()
+        if tail is not None:
+            segments.append(tail)
+        speech = max(segments, key=len) if segments else audio
+        features = mfcc(speech)
+        return embed(features), len(features)
+
+    def calibrate(self, percentile=95, margin=1.5, floor=0.1):
+        """Threshold from leave-one-out distances between the templates themselves"""
+        similarity = self.matrix @ self.matrix.T
+        np.fill_diagonal(similarity, -1)
+        nearest = 1 - similarity.max(axis=1)
+        # Very consistent templates would otherwise give a threshold nobody can hit
+        return max(float(np.percentile(nearest, percentile) * margin), floor)
+
+    def reset(self):
+        """Forget audio from an earlier listen, so it cannot join the next one's first segment"""
+        self.segmenter.reset()
+
+    def set_energy_threshold(self, energy_threshold):
+        """Follow the recognizer's calibrated ambient level"""
+        self.segmenter.threshold = energy_threshold
+
+    def distance(self, segment):
+        """Cosine distance to the nearest template; long segments are matched on their prefix"""
+        features = mfcc(segment)
+        n = len(features)
+        best = 1.0
+        for length in np.unique(self.lengths):
+            if n < 0.6 * length:
+                continue
+            # "Guido, give me the hammer": compare only the wake-phrase-length start
+            vector = embed(features if n <= 1.5 * length else features[:length])
+            if vector is None:
+                continue
+            rows = self.matrix[self.lengths == length]
+            best = min(best, 1 - float((rows @ vector).max()))
+        return best
+
+    def feed(self, chunk):
+        """Feed int16 samples; returns buffered segments that passed the first stage"""
+        candidates = []
+        for segment in self.segmenter.feed(chunk):
+            if self.distance(segment) <= self.threshold:
+                self.stage1_fires += 1
+                candidates.append(segment)
+        return candidates
+
+
+def evaluate(detector, noise, positives, recognize=None, chunk=1024):
+    """Replay shop noise with wake phrases mixed in; measure CPU, false accepts and latency"""
+    rng = np.random.default_rng(0)
+
+    # Idle: pure noise through stage 1 only
+    start = time.process_time()
+    false_accepts = 0
+    for i in range(0, len(noise), chunk):
+        false_accepts += len(detector.feed(noise[i:i + chunk]))
+    stage1_cpu = time.process_time() - start
+    noise_hours = len(noise) / RATE / 3600
+
+    # Baseline: every noise burst through the full recognizer, as run() did before
+    full_cpu = None
+    if recognize is not None:
+        start = time.process_time()
+        for i in range(0, len(noise), RATE * 3):
+            recognize(noise[i:i + RATE * 3])
+        full_cpu = time.process_time() - start
+
+    # Wake latency: audio time from the end of the phrase until stage 1 fires
+    latencies = []
+    detected = 0
+    for clip in positives:
+        offset = rng.integers(0, max(1, len(noise) - len(clip) - RATE * 2))
+        stream = noise[offset:offset + len(clip) + RATE * 2].astype(np.float32)
+        stream[:len(clip)] += clip
+        stream = np.clip(stream, -32768, 32767).astype(np.int16)
+        detector.reset()
+        for i in range(0, len(stream), chunk):
+            started = time.perf_counter()
+            if detector.feed(stream[i:i + chunk]):
+                compute = time.perf_counter() - started
+                latencies.append((i + chunk - len(clip)) / RATE + compute)
+                detected += 1
+                break
+
+    audio_seconds = len(noise) / RATE
+    print("\n=== WAKE DETECTOR REPORT ===")
+    print(f"🔇 Idle CPU (stage 1): {stage1_cpu / audio_seconds * 100:.2f}% of one core")
+    if full_cpu is not None:
+        print(f"🔇 Idle CPU (full recognition on every burst): {full_cpu / audio_seconds * 100:.2f}% of one core")
+    print(f"🚨 Stage-1 false accepts: {false_accepts} in {noise_hours:.2f} h "
+          f"({false_accepts / max(noise_hours, 1e-9):.1f} per hour)")
+    print(f"✅ Detected {detected}/{len(positives)} wake phrases")
+    if latencies:
+        print(f"⚡ Wake latency: median {np.median(latencies) * 1000:.0f} ms, "
+              f"max {np.max(latencies) * 1000:.0f} ms after the phrase ends")
+    return {"stage1_cpu": stage1_cpu, "full_cpu": full_cpu, "false_accepts": false_accepts,
+            "noise_hours": noise_hours, "detected": detected, "latencies": latencies}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the two-stage wake detector on replayed shop noise")
+    parser.add_argument("noise", nargs="+", help="16 kHz WAV recordings of shop noise")
+    parser.add_argument("--data-dir", default="voice_dataset")
+    parser.add_argument("--vosk", action="store_true", help="also time full Vosk recognition as the baseline")
+    args = parser.parse_args()
+
+    detector = WakeDetector.from_dataset(args.data_dir)
+    if detector is None:
+        raise SystemExit("❌ Need at least two samples in voice_dataset/activation")
+
+    noise = np.concatenate([load_wav(path) for path in args.noise])
+    positives = []
+    for root, dirs, files in os.walk(os.path.join(args.data_dir, "activation")):
+        positives += [load_wav(os.path.join(root, f)) for f in sorted(files) if f.endswith('.wav')]
+
+    recognize = None
+    if args.vosk:
+        from vosk import Model, KaldiRecognizer
+        model = Model("vosk-model-small-en-us-0.15")
+
+        def recognize(audio):
+            recognizer = KaldiRecognizer(model, RATE)
+            recognizer.AcceptWaveform(audio.tobytes())
+            return recognizer.FinalResult()
+
+    evaluate(detector, noise, positives, recognize)